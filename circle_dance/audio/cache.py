@@ -0,0 +1,203 @@
+# persistent on-disk cache of the notes extracted from audio files
+# content-addressed, such that a song is only analyzed once per extractor and parameters, regardless of its path
+
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Callable
+
+import numpy as np
+import numpy.typing as npt
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2  # bump when the extractors change their results, to invalidate existing entries
+MAX_BYTES = 256 * 2**20
+HASH_BLOCK_SIZE = 2**20
+
+
+def default_cache_dir() -> str:
+    "The note cache directory: `$CIRCLE_DANCE_CACHE_DIR`, else `circle_dance/notes` in the user's cache directory."
+    if "CIRCLE_DANCE_CACHE_DIR" in os.environ:
+        return os.environ["CIRCLE_DANCE_CACHE_DIR"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "circle_dance", "notes")
+
+
+def file_digest(fn: str) -> str:
+    "The SHA-256 hex digest of the content of a file, read block by block."
+    digest = hashlib.sha256()
+    with open(fn, "rb") as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class NoteCache:
+    def __init__(self, directory: str | None = None, max_bytes: int = MAX_BYTES):
+        """Persistent cache of extracted notes, stored as one `.npy` file per song and extraction setting.
+
+        Entries are addressed by the hash of the audio file's content, the extractor, and its parameters, hence a
+        renamed or copied song is still a hit, and an edited one a miss. The total size of the entries is bounded by
+        `max_bytes`; once exceeded, the least recently used entries are evicted. Recency is tracked by the entries'
+        modification times, which are updated on every hit, hence it persists across runs.
+
+        Usage:
+            ```
+            cache = NoteCache()
+            notes = cache.get_or_extract("song.mp3", "durations", 0.75, lambda: extract(...))
+            ```
+
+        Args:
+            directory: where to store the entries; see `default_cache_dir` if None
+            max_bytes: maximum total size of all entries in bytes
+        """
+        assert max_bytes > 0, "max_bytes must be greater than 0"
+
+        self.directory = default_cache_dir() if directory is None else directory
+        self.max_bytes = max_bytes
+
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def key(self, fn: str, extractor: str, threshold: float, slide_length: int = 512) -> str:
+        """The cache key of the notes of a file.
+
+        Args:
+            fn: the audio file
+            extractor: name of the extraction method, e.g. "durations"; must be usable in a file name
+            threshold: the chroma energy threshold of the extraction
+            slide_length: the slide length of the extraction's chromagram
+        """
+        assert extractor.replace("_", "").replace("-", "").isalnum(), f"invalid extractor name {extractor}"
+        return f"{file_digest(fn)[:32]}-{extractor}-thr{float(threshold)!r}-sl{slide_length}-v{CACHE_VERSION}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key: str) -> npt.NDArray | None:
+        """The cached notes, or None on a miss.
+
+        Returns:
+            the notes; shape=(N, 4)
+        """
+        path = self._path(key)
+        try:
+            notes = np.load(path, allow_pickle=False)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            self.n_misses += 1
+            return None
+        except (OSError, ValueError) as e:  # unreadable or corrupt entry
+            logger.warning("dropping unreadable note cache entry %s: %s", path, e)
+            self._remove(path)
+            self.n_misses += 1
+            return None
+
+        self.n_hits += 1
+        return notes
+
+    def put(self, key: str, notes: npt.NDArray) -> None:
+        """Store notes, evicting the least recently used entries if the cache grows too large.
+
+        Failing to write the cache is logged, but not raised, as the notes are still usable.
+
+        Args:
+            notes: the notes; shape=(N, 4)
+        """
+        tmp_path: str | None = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first, such that concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(notes, dtype=np.float64), allow_pickle=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("could not write to the note cache %s: %s", self.directory, e)
+            if tmp_path is not None:  # not counted by the eviction, hence never removed otherwise
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+            return
+        self.evict()
+
+    def get_or_extract(
+        self,
+        fn: str,
+        extractor: str,
+        threshold: float,
+        extract: Callable[[], npt.NDArray],
+        slide_length: int = 512,
+    ) -> npt.NDArray:
+        """The cached notes of a file, extracting and storing them on a miss.
+
+        Args:
+            fn: the audio file
+            extractor: name of the extraction method, see `key`
+            threshold: the chroma energy threshold of the extraction
+            extract: returns the notes of the file on a miss
+            slide_length: the slide length of the extraction's chromagram
+
+        Returns:
+            the notes; shape=(N, 4)
+        """
+        key = self.key(fn, extractor, threshold, slide_length=slide_length)
+        notes = self.get(key)
+        if notes is None:
+            notes = extract()
+            self.put(key, notes)
+        return notes
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        "The (last use, size, path) of all entries, least recently used first."
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".npy"):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:  # evicted concurrently
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return []
+        return sorted(entries)
+
+    @property
+    def n_bytes(self) -> int:
+        "Total size of all entries in bytes."
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Remove the least recently used entries until the total size is within `max_bytes`.
+
+        Returns:
+            the number of removed entries
+        """
+        entries = self._entries()
+        n_bytes = sum(size for _, size, _ in entries)
+        n_evicted = 0
+        for _, size, path in entries:
+            if n_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            n_bytes -= size
+            n_evicted += 1
+        if n_evicted:
+            logger.debug("evicted %d note cache entries", n_evicted)
+        return n_evicted
+
+    def clear(self) -> None:
+        "Remove all entries."
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
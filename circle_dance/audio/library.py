@@ -0,0 +1,245 @@
+# batch indexing of a music library into note tracks
+# songs are analyzed in a process pool, one note track per song and kind of notes; unchanged songs are skipped
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import librosa
+import numpy.typing as npt
+
+from circle_dance.audio.cache import file_digest
+from circle_dance.audio.process import (
+    chromagram_to_note_durations,
+    chromagram_to_note_onsets,
+    get_cqt_plan,
+)
+from circle_dance.audio.track import NoteTrack
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".opus", ".m4a", ".aac", ".aif", ".aiff")
+MANIFEST = ".circle_dance_index.json"
+NOTES = ("durations", "onsets")
+STAGES = ("decode", "chroma", "onset_envelope", "morphology", "write")
+
+
+class IndexStats:
+    def __init__(self) -> None:
+        "Counters and timings of a library indexing run."
+        self.n_songs = 0  # songs found
+        self.n_indexed = 0  # songs analyzed in this run
+        self.n_unchanged = 0  # songs skipped, as their note tracks are up to date
+        self.n_failed = 0  # songs that could not be analyzed
+        self.audio_sec = 0.0  # duration of the indexed songs
+        self.wall_sec = 0.0  # wall time of the run
+        self.stage_sec = {stage: 0.0 for stage in STAGES}  # time per stage, summed over all songs and processes
+
+    def __repr__(self) -> str:
+        return ", ".join(f"{k}={v}" for k, v in vars(self).items())
+
+    @property
+    def songs_per_minute(self) -> float:
+        return self.n_indexed / self.wall_sec * 60 if self.wall_sec > 0 else 0.0
+
+    def report(self) -> str:
+        "Human readable summary, with the throughput and the time per stage."
+        lines = [
+            f"indexed {self.n_indexed} of {self.n_songs} songs ({self.n_unchanged} unchanged, {self.n_failed} failed) "
+            f"in {self.wall_sec:.1f}s: {self.songs_per_minute:.1f} songs/min, "
+            f"{self.audio_sec / self.wall_sec if self.wall_sec > 0 else 0.0:.1f}x real time"
+        ]
+        for stage, sec in self.stage_sec.items():
+            per_song = sec / self.n_indexed if self.n_indexed else 0.0
+            lines.append(f"  {stage:<15}{sec:9.2f}s  {per_song:7.3f}s/song")
+        return "\n".join(lines)
+
+
+def track_path(fn: str, directory: str, output_dir: str | None, notes: str) -> str:
+    """The note track file of a song: next to the song, or at the same relative path in the output directory.
+
+    Args:
+        fn: the song file
+        directory: the library directory the song is in
+        output_dir: where to mirror the library's directory tree; next to the songs if None
+        notes: the kind of notes, see `NOTES`
+    """
+    stem = os.path.splitext(fn if output_dir is None else os.path.join(output_dir, os.path.relpath(fn, directory)))[0]
+    return f"{stem}.{notes}.notes"
+
+
+def find_songs(directory: str) -> list[str]:
+    "All audio files in the directory and its subdirectories, by extension, sorted."
+    songs = []
+    for root, _, files in os.walk(directory):
+        songs.extend(os.path.join(root, f) for f in files if f.lower().endswith(AUDIO_EXTENSIONS))
+    return sorted(songs)
+
+
+def index_song(fn: str, tracks: dict[str, str], threshold: float = 0.75) -> tuple[float, dict[str, float]]:
+    """Extract the notes of a song and write them as note tracks, timing each stage.
+
+    Follows `extract_note_durations` and `extract_note_onsets`, but computes the chromagram only once for both.
+
+    Args:
+        fn: the song file
+        tracks: the note track file to write per kind of notes, see `NOTES`
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+
+    Returns:
+        the duration of the song in seconds, and the seconds spent per stage
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    t = time.perf_counter()
+    y, sr = librosa.load(fn, sr=None)
+    timings["decode"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    chroma = get_cqt_plan(sr, slide_length=512).chroma(y)
+    timings["chroma"] = time.perf_counter() - t
+
+    if "onsets" in tracks:
+        t = time.perf_counter()
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        timings["onset_envelope"] = time.perf_counter() - t
+
+    for notes, path in tracks.items():
+        t = time.perf_counter()
+        extracted: npt.NDArray
+        if notes == "durations":
+            extracted = chromagram_to_note_durations(chroma, sr, thr=threshold)
+        else:
+            onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, normalize=True, backtrack=True)
+            extracted = chromagram_to_note_onsets(chroma, onset_frames, sr, threshold=threshold)
+        timings["morphology"] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        metadata = {"notes": notes, "extractor": notes, "threshold": threshold, "source": os.path.basename(fn)}
+        NoteTrack.write(path, extracted, metadata)
+        timings["write"] += time.perf_counter() - t
+
+    return len(y) / sr, timings
+
+
+def _index_song(args: tuple) -> tuple[str, str | None, float, dict[str, float], str | None]:
+    "Process pool entry point of `index_song`; returns the song, its digest, duration, timings, and error if any."
+    fn, tracks, threshold = args
+    try:
+        digest = file_digest(fn)
+        duration, timings = index_song(fn, tracks, threshold)
+        return fn, digest, duration, timings, None
+    except Exception as e:  # a broken file must not stop the whole batch
+        return fn, None, 0.0, {}, f"{type(e).__name__}: {e}"
+
+
+def _load_manifest(path: str) -> dict[str, dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("ignoring unreadable index manifest %s: %s", path, e)
+        return {}
+
+
+def _save_manifest(path: str, manifest: dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def index_library(
+    directory: str,
+    output_dir: str | None = None,
+    notes: tuple[str, ...] = NOTES,
+    threshold: float = 0.75,
+    n_jobs: int | None = None,
+    force: bool = False,
+    stats: IndexStats | None = None,
+) -> IndexStats:
+    """Write the note tracks of all songs in a directory, analyzing the songs in a pool of processes.
+
+    The state of each indexed song is kept in a manifest in the output directory. A song is skipped if its size and
+    modification time are unchanged, or else its content hash, and if its note tracks exist and were extracted with
+    the same parameters. The manifest is saved periodically, hence an interrupted run resumes where it stopped.
+
+    Args:
+        directory: the library directory, searched recursively for audio files (see `AUDIO_EXTENSIONS`)
+        output_dir: where to write the note tracks, mirroring the library's directory tree; next to the songs if None
+        notes: the kinds of notes to extract, each into its own note track, see `NOTES`
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        n_jobs: number of processes; the number of CPUs if None; indexes in this process if 1
+        force: re-index all songs, even unchanged ones
+        stats: counters and timings to update; a new instance if not given
+
+    Returns:
+        the counters and timings of the run
+    """
+    assert all(n in NOTES for n in notes), f"notes must be any of {NOTES}"
+    n_jobs = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+    assert n_jobs > 0, "n_jobs must be greater than 0"
+    stats = IndexStats() if stats is None else stats
+    t_start = time.perf_counter()
+
+    manifest_path = os.path.join(directory if output_dir is None else output_dir, MANIFEST)
+    manifest = _load_manifest(manifest_path)
+    params = {"notes": sorted(notes), "threshold": threshold}
+
+    # find the songs whose note tracks are missing or outdated
+    songs = find_songs(directory)
+    stats.n_songs = len(songs)
+    tasks = []
+    for fn in songs:
+        rel = os.path.relpath(fn, directory)
+        st = os.stat(fn)
+        tracks = {n: track_path(fn, directory, output_dir, n) for n in notes}
+        entry = manifest.get(rel)
+
+        if not force and entry is not None and entry["params"] == params and all(map(os.path.exists, tracks.values())):
+            if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                stats.n_unchanged += 1
+                continue
+            if entry["size"] == st.st_size and entry["sha256"] == file_digest(fn):  # touched, but not modified
+                entry["mtime_ns"] = st.st_mtime_ns
+                stats.n_unchanged += 1
+                continue
+        tasks.append((fn, tracks, threshold))
+
+    # forget songs that are gone
+    rels = {os.path.relpath(fn, directory) for fn in songs}
+    manifest = {rel: entry for rel, entry in manifest.items() if rel in rels}
+    logger.info("indexing %d of %d songs with %d processes", len(tasks), len(songs), n_jobs)
+
+    pool = multiprocessing.Pool(min(n_jobs, len(tasks))) if n_jobs > 1 and len(tasks) > 1 else None
+    try:
+        results = pool.imap_unordered(_index_song, tasks) if pool is not None else map(_index_song, tasks)
+        for i, (fn, digest, duration, timings, error) in enumerate(results):
+            if error is not None:
+                logger.warning("failed to index %s: %s", fn, error)
+                stats.n_failed += 1
+                continue
+
+            st = os.stat(fn)
+            rel = os.path.relpath(fn, directory)
+            manifest[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest, "params": params}
+            stats.n_indexed += 1
+            stats.audio_sec += duration
+            for stage, sec in timings.items():
+                stats.stage_sec[stage] += sec
+            logger.info("indexed %s (%d/%d)", rel, i + 1, len(tasks))
+
+            if stats.n_indexed % 10 == 0:
+                _save_manifest(manifest_path, manifest)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _save_manifest(manifest_path, manifest)
+        stats.wall_sec = time.perf_counter() - t_start
+
+    return stats
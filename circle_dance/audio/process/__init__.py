@@ -1,7 +1,68 @@
 # audio data processing
 # functionality to extract notes and note attributes form audio data
 
-from circle_dance.audio.process.note_durations import extract_note_durations
-from circle_dance.audio.process.note_onsets import extract_note_onsets
+from circle_dance.audio.process.chroma import (
+    ChromaPlan,
+    CQTPlan,
+    FilterbankPlan,
+    LibrosaCQTPlan,
+    StreamingCQT,
+    clear_cqt_plans,
+    fastest_chroma_backend,
+    fold_chroma,
+    get_cqt_plan,
+    register_chroma_backend,
+    resolve_chroma_backend,
+    set_max_cqt_plans,
+    warm_up_cqt_plans,
+)
+from circle_dance.audio.process.multi import (
+    deduplicate_signals,
+    extract_notes,
+    extract_notes_multi,
+)
+from circle_dance.audio.process.note_durations import (
+    chromagram_to_note_durations,
+    extract_note_durations,
+)
+from circle_dance.audio.process.note_onsets import (
+    StreamingOnsetDetector,
+    chromagram_to_note_onsets,
+    extract_note_onsets,
+)
+from circle_dance.audio.process.parallel import (
+    extract_features_parallel,
+    extract_note_durations_parallel,
+    extract_note_onsets_parallel,
+    segment_signal,
+)
+from circle_dance.audio.process.resample import StreamingResampler
 
-__all__ = ["extract_note_onsets", "extract_note_durations"]
+__all__ = [
+    "extract_note_onsets",
+    "chromagram_to_note_onsets",
+    "StreamingOnsetDetector",
+    "extract_note_durations",
+    "chromagram_to_note_durations",
+    "ChromaPlan",
+    "CQTPlan",
+    "LibrosaCQTPlan",
+    "FilterbankPlan",
+    "register_chroma_backend",
+    "fastest_chroma_backend",
+    "resolve_chroma_backend",
+    "StreamingCQT",
+    "get_cqt_plan",
+    "warm_up_cqt_plans",
+    "set_max_cqt_plans",
+    "clear_cqt_plans",
+    "fold_chroma",
+    "segment_signal",
+    "extract_features_parallel",
+    "extract_note_durations_parallel",
+    "extract_note_onsets_parallel",
+    "extract_notes",
+    "deduplicate_signals",
+    "extract_notes_multi",
+    "StreamingResampler",
+]
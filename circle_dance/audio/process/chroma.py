@@ -0,0 +1,498 @@
+# process-wide cache of prepared CQT plans, one per chroma backend
+# the CQT kernels only depend on the transform parameters, hence we build them once and reuse them for every buffer
+
+import inspect
+import logging
+import threading
+import time
+import warnings
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import TypeAlias
+
+import audioflux as af
+import librosa
+import numpy as np
+import numpy.typing as npt
+import scipy
+
+logger = logging.getLogger(__name__)
+
+# (sample rate, slide_length, number of bins, lowest frequency, chroma backend)
+T_PLAN_KEY: TypeAlias = tuple[int, int, int, float, str]
+
+N_BINS = 12 * 7  # 7 octaves of 12 semitones each
+N_CHROMA = 12
+LOW_FRE = float(af.utils.note_to_hz("C1"))
+SLIDE_LENGTH = 512
+
+MAX_PLANS = 8  # default number of plans kept before the least recently used one is evicted
+MIN_PLAN_SAMPLES = 4096  # shorter inputs are transformed by a throwaway object, see `CQTPlan`
+MAX_BENCHMARK_SAMPLES = 2**18  # longer inputs are benchmarked on this many samples, see `fastest_chroma_backend`
+
+DEFAULT_BACKEND = "audioflux"
+AUTO_BACKEND = "auto"  # the fastest backend on this machine, see `resolve_chroma_backend`
+
+
+class ChromaPlan(ABC):
+    backend = ""  # the name in `BACKENDS`
+
+    def __init__(self, sr: int, slide_length: int, n_bins: int, low_fre: float):
+        """Base class of the prepared transforms of the chroma backends, safe to share between threads.
+
+        A backend transforms audio into a spectrogram of `n_bins` semitone bins, 12 per octave starting at `low_fre`,
+        with frame `k` centered on sample `k * slide_length`, i.e. `1 + len(y) // slide_length` frames. Hence the
+        backends are interchangeable for `fold_chroma`, `StreamingCQT`, and the octave bands.
+
+        Args:
+            sr: sampling rate of the audio data
+            slide_length: the slide length used to compute the CQT
+            n_bins: number of CQT bins, starting at `low_fre` with 12 bins per octave
+            low_fre: frequency of the lowest CQT bin
+        """
+        self.sr = sr
+        self.slide_length = slide_length
+        self.n_bins = n_bins
+        self.low_fre = low_fre
+
+    @property
+    def key(self) -> T_PLAN_KEY:
+        return (self.sr, self.slide_length, self.n_bins, self.low_fre, self.backend)
+
+    @abstractmethod
+    def cqt(self, y: npt.NDArray) -> npt.NDArray:
+        "Compute the CQT of `y`, or the backend's semitone spectrogram; shape=(n_bins, n_frames)."
+        pass
+
+    def chroma(self, y: npt.NDArray, chroma_num: int = N_CHROMA) -> npt.NDArray[np.float32]:
+        "Compute the (frame-wise max normalized) chromagram of `y`; shape=(chroma_num, n_frames)."
+        return fold_chroma(self.cqt(y), chroma_num=chroma_num)
+
+
+class CQTPlan(ChromaPlan):
+    backend = "audioflux"
+
+    def __init__(self, sr: int, slide_length: int, n_bins: int, low_fre: float):
+        """A prepared audioflux CQT transform with its kernels, safe to share between threads.
+
+        Note:
+            The underlying audioflux object keeps internal state while transforming, hence all calls are serialized by
+            a per-plan lock.
+
+        Note:
+            audioflux corrupts its heap when a reused object transforms a short input (about 1024 samples or less)
+            after a longer one. Inputs shorter than `MIN_PLAN_SAMPLES`, e.g. at the start of a stream, are therefore
+            transformed by a new object, which costs about 0.6ms extra.
+
+        Args:
+            sr: sampling rate of the audio data
+            slide_length: the slide length used to compute the CQT
+            n_bins: number of CQT bins, starting at `low_fre` with 12 bins per octave
+            low_fre: frequency of the lowest CQT bin
+        """
+        super().__init__(sr, slide_length, n_bins, low_fre)
+        self.lock = threading.Lock()
+        self.obj = self._new_obj()
+
+    def _new_obj(self) -> af.CQT:
+        return af.CQT(
+            num=self.n_bins,
+            samplate=self.sr,
+            low_fre=self.low_fre,
+            bin_per_octave=12,
+            slide_length=self.slide_length,
+        )
+
+    def cqt(self, y: npt.NDArray) -> npt.NDArray[np.complex64]:
+        "Compute the CQT of `y`; shape=(n_bins, n_frames)."
+        if len(y) < MIN_PLAN_SAMPLES:
+            return self._new_obj().cqt(y)
+        with self.lock:
+            return self.obj.cqt(y)
+
+
+class LibrosaCQTPlan(ChromaPlan):
+    backend = "librosa"
+
+    def __init__(self, sr: int, slide_length: int, n_bins: int, low_fre: float):
+        """The CQT of librosa, which caches its kernels itself; the reference, but several times slower than audioflux.
+
+        Note:
+            The slide length must be a multiple of `2 ** (n_octaves - 1)`, e.g. of 64 for 7 octaves.
+
+        Args:
+            sr: sampling rate of the audio data
+            slide_length: the slide length used to compute the CQT
+            n_bins: number of CQT bins, starting at `low_fre` with 12 bins per octave
+            low_fre: frequency of the lowest CQT bin
+        """
+        super().__init__(sr, slide_length, n_bins, low_fre)
+
+    def cqt(self, y: npt.NDArray) -> npt.NDArray[np.complex64]:
+        "Compute the CQT of `y`; shape=(n_bins, n_frames)."
+        with warnings.catch_warnings():  # librosa warns about inputs shorter than the lowest bins' kernels
+            warnings.simplefilter("ignore", UserWarning)
+            return librosa.cqt(
+                y,
+                sr=self.sr,
+                hop_length=self.slide_length,
+                fmin=self.low_fre,
+                n_bins=self.n_bins,
+                bins_per_octave=12,
+            )
+
+
+class FilterbankPlan(ChromaPlan):
+    backend = "fft"
+
+    def __init__(self, sr: int, slide_length: int, n_bins: int, low_fre: float):
+        """A lightweight semitone spectrogram: the power spectrum of an rFFT, mapped to the bins by a sparse filterbank.
+
+        Each bin sums the power of the FFT bins within a triangle of one semitone around its frequency, or of the
+        FFT resolution where that is coarser. With a window of about 0.1 seconds (e.g. 4096 samples at 44.1kHz), the
+        semitones are resolved from about C3 up, while the lower octaves blur into their neighbor bins. The chroma
+        follows the CQT's closely, at a fraction of its cost, especially for the short buffers of a live stream.
+
+        Args:
+            sr: sampling rate of the audio data
+            slide_length: the slide length used to compute the spectrogram
+            n_bins: number of bins, starting at `low_fre` with 12 bins per octave
+            low_fre: frequency of the lowest bin
+        """
+        super().__init__(sr, slide_length, n_bins, low_fre)
+        self.n_fft = int(2 ** round(np.log2(sr / 10)))
+        self.window = scipy.signal.get_window("hann", self.n_fft, fftbins=True).astype(np.float32)
+
+        # triangular weights in semitones around each bin, at least as wide as the FFT resolution at the bin
+        freqs = np.fft.rfftfreq(self.n_fft, 1 / sr)
+        semitones = 12 * np.log2(np.maximum(freqs, low_fre / 2) / low_fre)  # of the FFT bins, relative to low_fre
+        bin_freqs = low_fre * 2 ** (np.arange(n_bins) / 12)
+        widths = np.maximum(1.0, 12 * np.log2(1 + sr / self.n_fft / bin_freqs))
+        weights = np.maximum(0, 1 - np.abs(semitones[None, :] - np.arange(n_bins)[:, None]) / widths[:, None])
+        self.filterbank = scipy.sparse.csr_array(weights.astype(np.float32))  # shape=(n_bins, 1 + n_fft // 2)
+
+    def cqt(self, y: npt.NDArray) -> npt.NDArray[np.float32]:
+        "Compute the magnitudes of the semitone bins of `y`; shape=(n_bins, n_frames)."
+        n_frames = 1 + len(y) // self.slide_length
+        padded = np.pad(np.asarray(y, dtype=np.float32), self.n_fft // 2)
+        frames = np.lib.stride_tricks.sliding_window_view(padded, self.n_fft)[:: self.slide_length][:n_frames]
+        spectrum = scipy.fft.rfft(frames * self.window, axis=1)
+        power = np.square(spectrum.real) + np.square(spectrum.imag)
+        return np.sqrt(self.filterbank @ power.T)
+
+
+BACKENDS: dict[str, type[ChromaPlan]] = {plan.backend: plan for plan in (CQTPlan, LibrosaCQTPlan, FilterbankPlan)}
+
+
+def register_chroma_backend(plan: type[ChromaPlan]) -> None:
+    "Register a chroma backend under its name, `plan.backend`, replacing a backend of the same name."
+    assert plan.backend and plan.backend != AUTO_BACKEND, f"the backend name must not be empty or {AUTO_BACKEND}"
+    assert not inspect.isabstract(
+        plan
+    ), f"the backend {plan.backend} must implement {sorted(plan.__abstractmethods__)}"
+    BACKENDS[plan.backend] = plan
+
+
+def fold_chroma(cqt: npt.NDArray, chroma_num: int = N_CHROMA) -> npt.NDArray[np.float32]:
+    """Fold a CQT into a chromagram by summing the power over all octaves and max normalizing each frame.
+
+    Note:
+        Equivalent to `af.CQT.chroma()` with its defaults. We don't use the latter with cached plans, as audioflux
+        sizes its internal chroma buffers on the first call and crashes once a longer CQT is passed.
+
+    Args:
+        cqt: the CQT; shape=(n_bins, n_frames), with n_bins a multiple of `chroma_num`
+        chroma_num: number of chroma bins to produce
+
+    Returns:
+        the chromagram; shape=(chroma_num, n_frames)
+    """
+    power = np.square(np.abs(cqt), dtype=np.float32)
+    chroma = power.reshape(-1, chroma_num, power.shape[-1]).sum(axis=0)
+    frame_max = chroma.max(axis=0, initial=0)
+    return np.divide(chroma, frame_max, out=np.zeros_like(chroma), where=frame_max > 0)
+
+
+_plans: OrderedDict[T_PLAN_KEY, ChromaPlan] = OrderedDict()
+_plans_lock = threading.Lock()
+_max_plans = MAX_PLANS
+
+
+def get_cqt_plan(
+    sr: float,
+    slide_length: int = SLIDE_LENGTH,
+    n_bins: int = N_BINS,
+    low_fre: float = LOW_FRE,
+    backend: str = DEFAULT_BACKEND,
+) -> ChromaPlan:
+    """Get the prepared CQT plan of a chroma backend for the given parameters, creating it on a cache miss.
+
+    The cache is process-wide and keeps at most `MAX_PLANS` plans (see `set_max_cqt_plans`), evicting the least
+    recently used plan.
+
+    Args:
+        sr: sampling rate of the audio data
+        slide_length: the slide length used to compute the CQT
+        n_bins: number of CQT bins
+        low_fre: frequency of the lowest CQT bin
+        backend: the chroma backend, see `BACKENDS`; "auto" for the fastest one on one second of audio
+
+    Returns:
+        the shared plan
+    """
+    backend = resolve_chroma_backend(backend, sr, int(sr), slide_length=slide_length, n_bins=n_bins, low_fre=low_fre)
+    assert backend in BACKENDS, f"backend must be one of {tuple(BACKENDS)} or {AUTO_BACKEND}"
+    key: T_PLAN_KEY = (int(sr), int(slide_length), int(n_bins), float(low_fre), backend)
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan
+
+        logger.debug("creating CQT plan for %s", key)
+        plan = BACKENDS[backend](*key[:4])
+        _plans[key] = plan
+        while len(_plans) > _max_plans:
+            evicted_key, _ = _plans.popitem(last=False)
+            logger.debug("evicted CQT plan for %s", evicted_key)
+        return plan
+
+
+def warm_up_cqt_plans(
+    sr: float,
+    n_samples: int | None = None,
+    slide_length: int = SLIDE_LENGTH,
+    n_bins: int = N_BINS,
+    low_fre: float = LOW_FRE,
+    backend: str = DEFAULT_BACKEND,
+) -> ChromaPlan:
+    """Prepare a CQT plan ahead of time, e.g. before the game clock starts.
+
+    Besides creating the kernels, runs one transform on silence so that all lazy allocations happen now and not on
+    the first real buffer.
+
+    Args:
+        sr: sampling rate of the audio data
+        n_samples: length of the buffers that will be processed; defaults to one second of audio
+        slide_length: the slide length used to compute the CQT
+        n_bins: number of CQT bins
+        low_fre: frequency of the lowest CQT bin
+        backend: the chroma backend, see `get_cqt_plan`; "auto" picks the fastest one for `n_samples`
+
+    Returns:
+        the prepared plan
+    """
+    n_samples = int(sr) if n_samples is None else n_samples
+    backend = resolve_chroma_backend(backend, sr, n_samples, slide_length=slide_length, n_bins=n_bins, low_fre=low_fre)
+    plan = get_cqt_plan(sr, slide_length=slide_length, n_bins=n_bins, low_fre=low_fre, backend=backend)
+    plan.chroma(np.zeros(n_samples, dtype=np.float32))
+    return plan
+
+
+def set_max_cqt_plans(n: int) -> None:
+    "Set the eviction limit of the plan cache, evicting the least recently used plans if required."
+    global _max_plans
+    assert n > 0, "at least one plan must be cacheable"
+    with _plans_lock:
+        _max_plans = n
+        while len(_plans) > _max_plans:
+            _plans.popitem(last=False)
+
+
+def clear_cqt_plans() -> None:
+    "Drop all cached plans."
+    with _plans_lock:
+        _plans.clear()
+
+
+_fastest: dict[tuple, str] = {}  # the fastest backend per benchmark, see `fastest_chroma_backend`
+_fastest_lock = threading.Lock()
+
+
+def fastest_chroma_backend(
+    sr: float,
+    n_samples: int,
+    slide_length: int = SLIDE_LENGTH,
+    n_bins: int = N_BINS,
+    low_fre: float = LOW_FRE,
+    backends: tuple[str, ...] | None = None,
+    repeats: int = 3,
+) -> str:
+    """Benchmark the chroma backends on this machine and return the fastest one.
+
+    Each backend transforms `n_samples` of noise once to warm up, then `repeats` times; the best time counts. Inputs
+    longer than `MAX_BENCHMARK_SAMPLES` are benchmarked on that many samples, as the cost of long inputs grows
+    linearly. The result is cached per process, hence the benchmark runs once per set of parameters.
+
+    Args:
+        sr: sampling rate of the audio data
+        n_samples: length of the buffers that will be transformed
+        slide_length: the slide length used to compute the CQT
+        n_bins: number of CQT bins
+        low_fre: frequency of the lowest CQT bin
+        backends: the candidate backends; all backends in `BACKENDS` if None
+        repeats: number of timed transforms per backend
+
+    Returns:
+        the name of the fastest backend
+    """
+    backends = tuple(BACKENDS) if backends is None else backends
+    n_samples = min(int(n_samples), MAX_BENCHMARK_SAMPLES)
+    key = (int(sr), n_samples, int(slide_length), int(n_bins), float(low_fre), backends)
+    with _fastest_lock:
+        if key in _fastest:
+            return _fastest[key]
+
+        y = np.random.default_rng(0).standard_normal(n_samples).astype(np.float32) * 0.1
+        runtimes = {}
+        for backend in backends:
+            plan = get_cqt_plan(sr, slide_length=slide_length, n_bins=n_bins, low_fre=low_fre, backend=backend)
+            plan.chroma(y)
+            runtime = float("inf")
+            for _ in range(repeats):
+                t = time.perf_counter()
+                plan.chroma(y)
+                runtime = min(runtime, time.perf_counter() - t)
+            runtimes[backend] = runtime
+
+        fastest = min(runtimes, key=runtimes.__getitem__)
+        logger.info(
+            "fastest chroma backend for %d samples at %dHz: %s (%s)",
+            n_samples,
+            sr,
+            fastest,
+            ", ".join(f"{backend} {1000 * runtime:.2f}ms" for backend, runtime in runtimes.items()),
+        )
+        _fastest[key] = fastest
+        return fastest
+
+
+def resolve_chroma_backend(
+    backend: str,
+    sr: float,
+    n_samples: int,
+    slide_length: int = SLIDE_LENGTH,
+    n_bins: int = N_BINS,
+    low_fre: float = LOW_FRE,
+) -> str:
+    "The backend, or for `AUTO_BACKEND` the fastest backend for buffers of `n_samples`, see `fastest_chroma_backend`."
+    if backend != AUTO_BACKEND:
+        return backend
+    return fastest_chroma_backend(sr, n_samples, slide_length=slide_length, n_bins=n_bins, low_fre=low_fre)
+
+
+class StreamingCQT:
+    def __init__(
+        self,
+        sr: float,
+        window_frames: int,
+        context_samples: int = 8192,
+        lookahead_samples: int = 4096,
+        slide_length: int = SLIDE_LENGTH,
+        n_bins: int = N_BINS,
+        low_fre: float = LOW_FRE,
+        backend: str = DEFAULT_BACKEND,
+    ):
+        """Incremental CQT of an audio stream that only computes the frames affected by new samples.
+
+        Keeps the last `window_frames` CQT frames in a rolling window. A frame is provisional until `lookahead_samples`
+        of audio following its center have arrived, and final afterwards. On each update, only the provisional and
+        the new frames are computed, over a segment of the new samples plus `context_samples` of past audio before
+        the first provisional frame. The final frames are never recomputed.
+
+        Note:
+            The lowest CQT bins see about 16384 samples to each side, the highest only a few hundred. With the
+            defaults, the frames deviate from those computed over a long stream buffer by about 1% of the chroma
+            energy, at about half the cost for a buffer of 25 chunks.
+
+        Args:
+            sr: sampling rate of the audio data
+            window_frames: number of past frames to keep
+            context_samples: number of past samples to include before the first provisional frame
+            lookahead_samples: number of samples after a frame's center required for the frame to be final
+            slide_length: the slide length used to compute the CQT
+            n_bins: number of CQT bins
+            low_fre: frequency of the lowest CQT bin
+            backend: the chroma backend, see `get_cqt_plan`; "auto" picks the fastest one for the segments of the
+                updates, of about `context_samples + lookahead_samples` samples
+        """
+        assert window_frames > 0, "window must hold at least one frame"
+
+        n_segment_samples = context_samples + lookahead_samples
+        backend = resolve_chroma_backend(
+            backend, sr, n_segment_samples, slide_length=slide_length, n_bins=n_bins, low_fre=low_fre
+        )
+        self.plan = get_cqt_plan(sr, slide_length=slide_length, n_bins=n_bins, low_fre=low_fre, backend=backend)
+        self.sr = sr
+        self.slide_length = slide_length
+        self.window_frames = window_frames
+        self.context_samples = context_samples
+        self.lookahead_samples = lookahead_samples
+
+        self.history = np.zeros(0, dtype=np.float32)  # past samples required to recompute the provisional frames
+        self.frames = np.zeros((n_bins, window_frames), dtype=np.complex64)
+        self.n_frames = 0  # number of valid frames in the window
+        self.n_samples_total = 0  # number of samples seen since the start of the stream
+
+    @property
+    def cqt(self) -> npt.NDArray[np.complex64]:
+        "The CQT frames in the window, oldest first; shape=(n_bins, n_frames)."
+        return self.frames[:, self.window_frames - self.n_frames :]
+
+    @property
+    def first_frame_sample(self) -> int:
+        "Stream position, in samples, on which the oldest frame in the window is centered."
+        return (self.n_samples_total // self.slide_length - self.n_frames + 1) * self.slide_length
+
+    def chroma(self, chroma_num: int = N_CHROMA) -> npt.NDArray[np.float32]:
+        "The chromagram of the frames in the window, oldest first; shape=(chroma_num, n_frames)."
+        return fold_chroma(self.cqt, chroma_num=chroma_num)
+
+    def update(self, y: npt.NDArray) -> int:
+        """Add new samples to the stream and compute the frames they affect.
+
+        Args:
+            y: the new audio samples
+
+        Returns:
+            the number of frames added to the window
+        """
+        if len(y) == 0:
+            return 0
+
+        # frames to compute: from the first provisional one to the one on the new last sample
+        n_samples_total = self.n_samples_total + len(y)
+        first_frame = max(0, -(-(self.n_samples_total - self.lookahead_samples) // self.slide_length))
+        last_frame = n_samples_total // self.slide_length
+        n_new = last_frame - (self.n_samples_total // self.slide_length if self.n_samples_total > 0 else -1)
+
+        # segment of past and new samples to transform; starts on a frame center
+        segment_start = max(0, first_frame * self.slide_length - self.context_samples)
+        n_past = self.n_samples_total - segment_start
+        segment = np.concatenate([self.history[len(self.history) - n_past :], np.asarray(y, dtype=np.float32)])
+
+        offset = (first_frame * self.slide_length - segment_start) // self.slide_length
+        frames = self.plan.cqt(segment)[:, offset : offset + last_frame - first_frame + 1]
+
+        # roll the window by the new frames, then overwrite the tail with the computed ones
+        if n_new >= self.window_frames:
+            self.frames.fill(0)
+        elif n_new > 0:
+            self.frames[:, :-n_new] = self.frames[:, n_new:]
+        n_computed = min(frames.shape[1], self.window_frames)
+        self.frames[:, -n_computed:] = frames[:, -n_computed:]
+        self.n_frames = min(self.window_frames, self.n_frames + n_new)
+
+        # keep the samples required to recompute the provisional frames with full context next time
+        n_history = self.context_samples + self.lookahead_samples + self.slide_length
+        self.history = segment[max(0, len(segment) - n_history) :]
+        self.n_samples_total = n_samples_total
+
+        return n_new
+
+    def reset(self) -> None:
+        "Forget all past samples and frames, e.g. after a gap in the stream."
+        self.history = np.zeros(0, dtype=np.float32)
+        self.frames.fill(0)
+        self.n_frames = 0
+        self.n_samples_total = 0
@@ -0,0 +1,136 @@
+# extraction of the notes of several signals at once, e.g. of the sheets of a multi-sheet layout
+# identical signals are analyzed only once and distinct ones in a process pool; the notes are routed back per signal
+
+import hashlib
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+import numpy.typing as npt
+
+from circle_dance.audio.process.chroma import DEFAULT_BACKEND, resolve_chroma_backend
+from circle_dance.audio.process.note_durations import extract_note_durations
+from circle_dance.audio.process.note_onsets import extract_note_onsets
+from circle_dance.audio.process.parallel import (
+    extract_note_durations_parallel,
+    extract_note_onsets_parallel,
+)
+
+logger = logging.getLogger(__name__)
+
+NOTES = ("durations", "onsets")
+
+
+def extract_notes(
+    y: npt.NDArray,
+    sr: float,
+    notes: str = "durations",
+    threshold: float = 0.9,
+    n_jobs: int | None = 1,
+    backend: str = DEFAULT_BACKEND,
+) -> npt.NDArray:
+    """Extract the note durations or onsets of a signal, segment by segment in parallel unless `n_jobs` is 1.
+
+    Args:
+        y: audio data
+        sr: sampling rate of the audio data
+        notes: the kind of notes to extract, see `NOTES`
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        n_jobs: number of processes, see `extract_features_parallel`; the number of CPUs if None
+        backend: the chroma backend, see `get_cqt_plan`
+
+    Returns:
+        the detected notes; shape=(N, 4), see `extract_note_durations` and `extract_note_onsets`
+    """
+    assert notes in NOTES, f"notes must be one of {NOTES}"
+    if notes == "onsets":
+        if n_jobs == 1:
+            return extract_note_onsets(y, sr, threshold=threshold, backend=backend)
+        return extract_note_onsets_parallel(y, sr, threshold=threshold, n_jobs=n_jobs, backend=backend)
+    if n_jobs == 1:
+        return extract_note_durations(y, sr, thr=threshold, backend=backend)
+    return extract_note_durations_parallel(y, sr, thr=threshold, n_jobs=n_jobs, backend=backend)
+
+
+def _extract_notes(args: tuple) -> npt.NDArray:
+    "Process pool entry point of `extract_notes`."
+    return extract_notes(*args)
+
+
+def deduplicate_signals(ys: list[npt.NDArray]) -> tuple[list[npt.NDArray], list[int]]:
+    """Find the distinct signals of a list.
+
+    Signals are identical if they are the same array, or have the same shape, dtype, and content. Contents are only
+    hashed if there is more than one array, hence a list of clones of one signal is deduplicated in constant time.
+
+    Args:
+        ys: the signals
+
+    Returns:
+        the distinct signals, in order of first occurrence, and for each signal the index of its distinct signal
+    """
+    by_id: dict[int, int] = {}  # the signals are referenced by `ys`, hence their ids are unique
+    arrays = []
+    for y in ys:
+        if id(y) not in by_id:
+            by_id[id(y)] = len(arrays)
+            arrays.append(y)
+    if len(arrays) == 1:
+        return arrays, [0] * len(ys)
+
+    distinct: list[npt.NDArray] = []
+    by_content: dict[tuple, int] = {}
+    array_routes = []
+    for y in arrays:
+        key = (y.shape, y.dtype.str, hashlib.blake2b(np.ascontiguousarray(y).data).digest())
+        if key not in by_content:
+            by_content[key] = len(distinct)
+            distinct.append(y)
+        array_routes.append(by_content[key])
+    return distinct, [array_routes[by_id[id(y)]] for y in ys]
+
+
+def extract_notes_multi(
+    ys: list[npt.NDArray],
+    sr: float,
+    notes: str = "durations",
+    threshold: float = 0.9,
+    n_jobs: int | None = None,
+    backend: str = DEFAULT_BACKEND,
+) -> list[npt.NDArray]:
+    """Extract the notes of several signals, e.g. one per sheet, analyzing each distinct signal only once.
+
+    Identical signals (see `deduplicate_signals`) share the notes of a single analysis. Distinct signals are analyzed
+    by a pool of `n_jobs` processes, one signal per task. A single distinct signal is analyzed segment by segment
+    instead, see `extract_notes`. Hence sheets of clones cost as much as one sheet.
+
+    Note:
+        Identical signals are routed the same notes array, which must hence not be modified in place.
+
+    Args:
+        ys: the signals, all with the same sampling rate
+        sr: sampling rate of the audio data
+        notes: the kind of notes to extract, see `NOTES`
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        n_jobs: number of processes; the number of CPUs if None; analyzes in this process if 1
+        backend: the chroma backend, see `get_cqt_plan`
+
+    Returns:
+        the detected notes of each signal, in the order of `ys`; shape=(N, 4), see `extract_notes`
+    """
+    assert len(ys) > 0, "at least one signal is required"
+    n_jobs = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+    assert n_jobs > 0, "n_jobs must be greater than 0"
+
+    distinct, routes = deduplicate_signals(ys)
+    logger.debug("extracting the %s of %d distinct of %d signals", notes, len(distinct), len(ys))
+    if len(distinct) == 1:
+        results = [extract_notes(distinct[0], sr, notes=notes, threshold=threshold, n_jobs=n_jobs, backend=backend)]
+    elif n_jobs == 1:
+        results = [extract_notes(y, sr, notes=notes, threshold=threshold, backend=backend) for y in distinct]
+    else:
+        backend = resolve_chroma_backend(backend, sr, len(distinct[0]))  # once, instead of in each process
+        with multiprocessing.Pool(min(n_jobs, len(distinct))) as pool:
+            results = pool.map(_extract_notes, [(y, sr, notes, threshold, 1, backend) for y in distinct])
+    return [results[i] for i in routes]
@@ -1,10 +1,14 @@
-import audioflux as af
-import librosa
 import numpy as np
-import scipy
+import numpy.typing as npt
 
+from circle_dance.audio.process.chroma import (
+    DEFAULT_BACKEND,
+    get_cqt_plan,
+    resolve_chroma_backend,
+)
 
-def extract_note_durations(y, sr: float, thr: float = 0.9, slide_length: int = 512):
+
+def extract_note_durations(y, sr: float, thr: float = 0.9, slide_length: int = 512, backend: str = DEFAULT_BACKEND):
     """Extract from an audio chunk all notes/sounds with chroma energy above the threshold and returns their duration
     and energy.
 
@@ -19,64 +23,60 @@ def extract_note_durations(y, sr: float, thr: float = 0.9, slide_length: int = 5
         sr: sampling rate of the audio data
         thr: the chroma energy threshold for considering a note as active; between 0 and 1
         slide_length: the slide length used to compute the chromagram
+        backend: the chroma backend, see `get_cqt_plan`; "auto" picks the fastest one for the length of `y`
 
     Returns:
         the detect N notes and their duration; shape=(N, 4),
             with columns=(note_id, onset(sec), conclusion(sec), mean_chroma_energy[0,1])
     """
-    # calculate chromagram
-    obj = af.CQT(
-        num=12 * 7,
-        samplate=int(sr),
-        low_fre=af.utils.note_to_hz("C1"),
-        bin_per_octave=12,
-        slide_length=slide_length,
-        # is_scale=False,
-        # thresh=0.5,
-    )
-    chromagram = obj.chroma(obj.cqt(y), chroma_num=12)  # , norm_type=af.type.ChromaDataNormalType.NONE)
+    # calculate chromagram, reusing the cached CQT kernels
+    backend = resolve_chroma_backend(backend, sr, len(y), slide_length=slide_length)
+    chromagram = get_cqt_plan(sr, slide_length=slide_length, backend=backend).chroma(y)
 
-    # prepare
-    chrom_bin_time_delta = slide_length / sr
-    structure_element = np.asarray([[False, False, False], [True, True, True], [False, False, False]])
+    return chromagram_to_note_durations(chromagram, sr, thr=thr, slide_length=slide_length)
+
+
+def chromagram_to_note_durations(
+    chromagram: npt.NDArray, sr: float, thr: float = 0.9, slide_length: int = 512
+) -> npt.NDArray[np.float32]:
+    """Extract the duration and energy of all runs of chroma energy above the threshold from a chromagram.
+
+    Each run of consecutive chroma bins above the threshold in a row of the chromagram is one note. The runs are
+    found with a run-length encoding of the whole thresholded chromagram at once, and their mean energies from a
+    cumulative sum over each row, hence the runtime is linear in the chromagram size, independent of the note count.
+
+    Args:
+        chromagram: the chromagram; shape=(n_chroma, n_bins)
+        sr: sampling rate of the audio data the chromagram was computed from
+        thr: the chroma energy threshold for considering a note as active; between 0 and 1
+        slide_length: the slide length used to compute the chromagram
+
+    Returns:
+        the detect N notes and their duration, ordered by note id and onset; shape=(N, 4),
+            with columns=(note_id, onset(sec), conclusion(sec), mean_chroma_energy[0,1])
+    """
     n_chromas, n_chroma_bins = chromagram.shape
+    chrom_bin_time_delta = slide_length / sr
+
+    # run-length encode the thresholded rows; padding ensures runs touching the borders are closed
+    chroma_thr = np.zeros((n_chromas, n_chroma_bins + 2), dtype=np.int8)
+    chroma_thr[:, 1:-1] = chromagram > thr
+    edges = np.diff(chroma_thr, axis=1)
+    note_ids, starts = np.nonzero(edges == 1)  # row-major, hence ordered by note and onset
+    _, ends = np.nonzero(edges == -1)  # exclusive; each row holds as many ends as starts, in the same order
 
-    # convert chroma bins to their start times (in sec)
-    chroms_bin_start_times = librosa.frames_to_time(range(n_chroma_bins), sr=sr, hop_length=slide_length)
-
-    # binary morphology magic, applied on each row separately, due to 1D structure element
-    chroma_thr = chromagram > thr
-    start_and_end = chroma_thr ^ scipy.ndimage.binary_erosion(chroma_thr, structure=structure_element)
-    labels, label_count = scipy.ndimage.label(chroma_thr, structure=structure_element)
-
-    if label_count == 0:
-        return np.empty((0, 4))
-
-    # extract start and end of each detected stucture
-    labels_start_end = labels[start_and_end]
-    times_start_end = np.tile(chroms_bin_start_times, (n_chromas, 1))[start_and_end]
-
-    # pair and deal with fact that we can have single-element structures in the buffer
-    # can work on whole chroma array at once, as each row has unique labels
-    i = 0
-    durations = []
-    while i < len(labels_start_end):
-        if i + 1 < len(labels_start_end) and labels_start_end[i] == labels_start_end[i + 1]:  # double label
-            durations.append((times_start_end[i], times_start_end[i + 1]))
-            i += 2
-        else:  # single label
-            durations.append((times_start_end[i], times_start_end[i]))
-            i += 1
-    durations_arr = np.asarray(durations)
-    durations_arr[:, 1] += chrom_bin_time_delta  # add chroma bin time to end, as bin time denotes bin start
-
-    # extract node id's and mean chroma energies
-    note_ids = []
-    chroma_energies = []
-    for lid in range(label_count):
-        lmask = labels == (lid + 1)
-        note_ids.append(np.where(lmask)[0][0])
-        chroma_energies.append(chromagram[lmask].mean())
+    if len(starts) == 0:
+        return np.empty((0, 4), dtype=np.float32)
+
+    # mean chroma energy of each run from the row-wise cumulative sum
+    energy_cumsum = np.zeros((n_chromas, n_chroma_bins + 1), dtype=np.float64)
+    np.cumsum(chromagram, axis=1, out=energy_cumsum[:, 1:])
+    energies = (energy_cumsum[note_ids, ends] - energy_cumsum[note_ids, starts]) / (ends - starts)
 
     # note that time ranges for entries of the same note never overlap
-    return np.hstack([np.asarray(note_ids).reshape(-1, 1), durations_arr, np.asarray(chroma_energies).reshape(-1, 1)])
+    # conclusion is the end of the last bin, as bin time denotes bin start
+    return np.stack(
+        [note_ids, starts * chrom_bin_time_delta, ends * chrom_bin_time_delta, energies],
+        axis=1,
+        dtype=np.float32,
+    )
@@ -1,25 +1,32 @@
-import audioflux as af
 import librosa
 import numpy as np
+import numpy.typing as npt
+import scipy
 
+from circle_dance.audio.process.chroma import (
+    DEFAULT_BACKEND,
+    get_cqt_plan,
+    resolve_chroma_backend,
+)
 
-def extract_note_onsets(y, sr: float, threshold: float = 0.9):
+
+def extract_note_onsets(y, sr: float, threshold: float = 0.9, backend: str = DEFAULT_BACKEND):
     """Extract the note onset from each frame of audio data.
 
     Args:
         y: audio data
         sr: sampling rate of the audio data
         threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        backend: the chroma backend, see `get_cqt_plan`; "auto" picks the fastest one for the length of `y`
 
     Returns:
         the detect N note onsets and their onset time; shape=(N, 4),
             with columns=(note_id, onset(sec), np.nan, chroma_energy[0,1])
     """
     # Compute the chromagram
-    # note: audioflux is 10x faster than librosa
-    obj = af.CQT(num=12 * 7, samplate=int(sr), low_fre=af.utils.note_to_hz("C1"), bin_per_octave=12, slide_length=512)
-    chroma = obj.chroma(obj.cqt(y), chroma_num=12)
-    # chroma = librosa.feature.chroma_cqt(y=y, sr=sr, n_chroma=12)
+    # note: the CQT kernels are cached across calls; see `fastest_chroma_backend` for the backends' speed
+    backend = resolve_chroma_backend(backend, sr, len(y), slide_length=512)
+    chroma = get_cqt_plan(sr, slide_length=512, backend=backend).chroma(y)
 
     # Compute onset strength
     onset_env = librosa.onset.onset_strength(y=y, sr=sr)
@@ -27,22 +34,193 @@ def extract_note_onsets(y, sr: float, threshold: float = 0.9):
     # Detect note onsets
     onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, normalize=True, backtrack=True)
 
-    # Extract notes at onset frames
-    notes_with_onsets = []
-    for frame in onset_frames:
-        chroma_frame = chroma[:, frame]
-        frame_time = librosa.frames_to_time(frame, sr=sr)
-
-        # Find all notes above the threshold
-        active_note_found = False
-        for i, magnitude in enumerate(chroma_frame):
-            if magnitude > threshold:
-                notes_with_onsets.append((i % 12, frame_time, np.nan, magnitude))
-                active_note_found = True
-
-        # If no notes are above threshold, take the highest one
-        if not active_note_found:
-            max_index = int(np.argmax(chroma_frame))
-            notes_with_onsets.append((max_index % 12, frame_time, np.nan, chroma_frame[max_index]))
-
-    return np.asarray(notes_with_onsets)
+    return chromagram_to_note_onsets(chroma, onset_frames, sr, threshold=threshold)
+
+
+def chromagram_to_note_onsets(
+    chroma: npt.NDArray, onset_frames: npt.NDArray, sr: float, threshold: float = 0.9, hop_length: int = 512
+) -> npt.NDArray[np.float32]:
+    """Extract the notes at the onset frames of a chromagram.
+
+    At each onset frame, all chroma above the threshold are notes. If none is, the strongest chroma is taken.
+
+    Args:
+        chroma: the chromagram; shape=(12, n_frames)
+        onset_frames: the indices of the onset frames
+        sr: sampling rate of the audio data the chromagram was computed from
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        hop_length: the hop length used to compute the chromagram and the onsets
+
+    Returns:
+        the detect N note onsets and their onset time, ordered by onset and note id; shape=(N, 4),
+            with columns=(note_id, onset(sec), np.nan, chroma_energy[0,1])
+    """
+    onset_frames = np.asarray(onset_frames, dtype=int)
+    onset_chroma = chroma[:, onset_frames]  # shape=(12, n_onsets)
+
+    # notes above the threshold; if no notes are above threshold, take the highest one
+    active = onset_chroma > threshold
+    active[np.argmax(onset_chroma, axis=0), np.arange(len(onset_frames))] |= ~active.any(axis=0)
+    onset_ids, note_ids = np.nonzero(active.T)  # row-major, hence ordered by onset, then note
+
+    notes_with_onsets = np.empty((len(note_ids), 4), dtype=np.float32)
+    notes_with_onsets[:, 0] = note_ids % 12
+    notes_with_onsets[:, 1] = librosa.frames_to_time(onset_frames, sr=sr, hop_length=hop_length)[onset_ids]
+    notes_with_onsets[:, 2] = np.nan
+    notes_with_onsets[:, 3] = onset_chroma[note_ids, onset_ids]
+
+    return notes_with_onsets
+
+
+class StreamingOnsetDetector:
+    def __init__(
+        self,
+        sr: float,
+        hop_length: int = 512,
+        n_fft: int = 2048,
+        n_mels: int = 128,
+        history_frames: int = 50,
+        top_db: float = 80.0,
+        delta: float = 0.07,
+    ):
+        """Incremental onset detector for an audio stream that reports every onset exactly once.
+
+        Follows `librosa.onset.onset_detect(normalize=True, backtrack=True)` with `librosa.onset.onset_strength`
+        defaults, but keeps the spectral flux and peak picking state across updates, hence only the new samples are
+        processed. The dB clipping of the mel spectrogram and the normalization of the onset envelope, which librosa
+        computes over the whole signal, are computed over the last `history_frames`, which corresponds to the
+        buffer used by the stream reader.
+
+        Note:
+            The peak picking requires the onset envelope of 100ms after a peak, hence an onset is reported with a
+            bounded lookahead of about `0.1 * sr // hop_length` frames. Onsets are backtracked to the preceding
+            minimum of the onset envelope in the history.
+
+        Args:
+            sr: sampling rate of the audio data
+            hop_length: the hop length of the frames; frame `k` is centered on the stream sample `k * hop_length`
+            n_fft: length of the FFT window of the mel spectrogram
+            n_mels: number of mel bands of the mel spectrogram
+            history_frames: number of past frames used for dB clipping, normalization, and backtracking
+            top_db: the threshold below the maximum at which the mel spectrogram is clipped, in dB
+            delta: the threshold above the local average of the normalized onset envelope to be an onset
+        """
+        self.sr = sr
+        self.hop_length = hop_length
+        self.n_fft = n_fft
+        self.history_frames = history_frames
+        self.top_db = top_db
+        self.delta = delta
+
+        # librosa's peak picking parameters
+        self.pre_max = int(np.ceil(0.03 * sr // hop_length))
+        self.post_max = 1
+        self.pre_avg = int(np.ceil(0.10 * sr // hop_length))
+        self.post_avg = int(np.ceil(0.10 * sr // hop_length + 1))
+        self.wait = int(np.ceil(0.03 * sr // hop_length))
+
+        # the onset envelope at frame t is the flux between the mel frames t-3 and t-2
+        self.env_shift = 1 + n_fft // (2 * hop_length)
+
+        self.window = scipy.signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels, fmax=0.5 * sr)
+
+        self.reset()
+
+    def reset(self) -> None:
+        "Forget all past samples and frames, e.g. after a gap in the stream."
+        self.samples = np.zeros(self.n_fft // 2, dtype=np.float32)  # pending samples, incl. the centering padding
+        self.n_samples_total = 0
+        self.n_mel_frames = 0  # number of mel frames computed since the start of the stream
+        self.last_mel_db: npt.NDArray | None = None
+        self.mel_db_max = np.full(self.history_frames, -np.inf, dtype=np.float32)  # rolling maxima for dB clipping
+
+        self.env = np.zeros(0, dtype=np.float32)  # rolling onset envelope
+        self.env_start = 0  # stream frame of the first envelope value
+        self.next_candidate = 0  # next stream frame to be considered a peak
+        self.last_onset = -1  # stream frame of the last reported onset
+
+    @property
+    def n_env_frames(self) -> int:
+        "Number of stream frames for which the onset envelope is known."
+        return self.env_start + len(self.env)
+
+    def update(self, y: npt.NDArray) -> npt.NDArray[np.int64]:
+        """Add new samples to the stream and detect the onsets that have become certain.
+
+        Args:
+            y: the new audio samples
+
+        Returns:
+            the stream frames of the new onsets, each onset is only reported once
+        """
+        self.n_samples_total += len(y)
+        self.samples = np.concatenate([self.samples, np.asarray(y, dtype=np.float32)])
+        self._update_envelope()
+        return self._pick_peaks()
+
+    def _update_envelope(self) -> None:
+        "Compute the mel frames that have become complete and extend the onset envelope accordingly."
+        n_frames = (len(self.samples) - self.n_fft) // self.hop_length + 1
+        if n_frames <= 0:
+            return
+
+        # mel spectrogram in dB of the new frames
+        frames = np.lib.stride_tricks.sliding_window_view(self.samples, self.n_fft)[:: self.hop_length][:n_frames]
+        power = np.square(np.abs(scipy.fft.rfft(frames * self.window, axis=1)))
+        mel_db = librosa.power_to_db(self.mel_basis @ power.T, top_db=None)  # shape=(n_mels, n_frames)
+        self.samples = self.samples[n_frames * self.hop_length :]
+
+        # clip to top_db below the maximum of the recent frames
+        self.mel_db_max = np.concatenate([self.mel_db_max, mel_db.max(axis=0)])[-self.history_frames :]
+        mel_db = np.maximum(mel_db, self.mel_db_max.max() - self.top_db)
+
+        # spectral flux to the previous frame, aggregated over the mel bands
+        previous = mel_db[:, :1] if self.last_mel_db is None else self.last_mel_db
+        flux = np.maximum(0.0, np.diff(mel_db, axis=1, prepend=previous)).mean(axis=0)
+        if self.n_mel_frames == 0:
+            flux = np.concatenate([np.zeros(self.env_shift, dtype=np.float32), flux[1:]])  # zero padding at the start
+        self.last_mel_db = mel_db[:, -1:]
+        self.n_mel_frames += n_frames
+
+        # append to the rolling envelope, keeping enough history for normalization, averaging and backtracking
+        self.env = np.concatenate([self.env, flux])
+        n_drop = max(0, len(self.env) - self.history_frames - self.post_avg)
+        self.env = self.env[n_drop:]
+        self.env_start += n_drop
+
+    def _pick_peaks(self) -> npt.NDArray[np.int64]:
+        "Evaluate all candidate frames with enough lookahead and report the backtracked onsets."
+        onsets = []
+        env_range = np.ptp(self.env[-self.history_frames :]) if len(self.env) else 0.0
+        while self.next_candidate + self.post_avg <= self.n_env_frames:
+            n = self.next_candidate
+            i = n - self.env_start  # index in the rolling envelope
+
+            # local max and sufficiently above the local average, in terms of the normalized envelope
+            is_peak = (
+                i >= 0
+                and env_range > 0
+                and self.env[i] == self.env[max(0, i - self.pre_max) : i + self.post_max].max()
+                and self.env[i] - self.env[max(0, i - self.pre_avg) : i + self.post_avg].mean()
+                >= self.delta * env_range
+            )
+            if not is_peak:
+                self.next_candidate += 1
+                continue
+            self.next_candidate += self.wait + 1
+
+            # backtrack to the preceding local minimum of the envelope
+            onset = self._backtrack(i) + self.env_start
+            if onset > self.last_onset:  # distinct peaks can backtrack to the same minimum
+                onsets.append(onset)
+                self.last_onset = onset
+
+        return np.asarray(onsets, dtype=np.int64)
+
+    def _backtrack(self, i: int) -> int:
+        "Index of the last local minimum of the rolling envelope at or before index `i`; 0 if there is none."
+        env = self.env[: i + 2]
+        minima = np.flatnonzero((env[1:-1] <= env[:-2]) & (env[1:-1] < env[2:])) + 1
+        minima = minima[minima <= i]
+        return int(minima[-1]) if len(minima) else 0
@@ -0,0 +1,227 @@
+# parallel analysis of long audio signals
+# the signal is split into overlapping segments whose frame-wise features are computed in a process pool; the features
+# of the segments are stitched at the seams, then turned into notes as if the whole signal had been analyzed at once
+
+import logging
+import multiprocessing
+import os
+
+import librosa
+import numpy as np
+import numpy.typing as npt
+
+from circle_dance.audio.process.chroma import (
+    DEFAULT_BACKEND,
+    get_cqt_plan,
+    resolve_chroma_backend,
+)
+from circle_dance.audio.process.note_durations import chromagram_to_note_durations
+from circle_dance.audio.process.note_onsets import chromagram_to_note_onsets
+
+logger = logging.getLogger(__name__)
+
+T_SEGMENT = tuple[int, int, int, int]  # (context start sample, context stop sample, core start frame, core stop frame)
+
+
+def segment_signal(
+    n_samples: int, hop_length: int = 512, segment_sec: float = 30.0, overlap_sec: float = 1.0, sr: float = 44100
+) -> list[T_SEGMENT]:
+    """Split a signal into segments of whole frames, with overlapping context on both sides.
+
+    The frame `k` of a signal is centered on its sample `k * hop_length`, and a signal of `n` samples has
+    `n // hop_length + 1` frames. The cores of the segments partition these frames. The context of a segment extends
+    its core by `overlap_sec` on each side and starts at a multiple of `hop_length`, such that the frames of the context
+    lie on the frame grid of the whole signal. The frames of the core are hence the same as if the whole signal was
+    analyzed, as long as the overlap covers the analysis window (e.g. the longest CQT kernel) and the padding at the
+    context borders.
+
+    Args:
+        n_samples: number of samples of the signal
+        hop_length: the hop length of the frames
+        segment_sec: seconds of signal per segment core
+        overlap_sec: seconds of context on each side of a core
+        sr: sampling rate of the signal
+
+    Returns:
+        the segments, ordered by time, as (context start sample, context stop sample, core start frame, core stop
+            frame) with frames relative to the whole signal
+    """
+    n_frames = n_samples // hop_length + 1
+    segment_frames = max(1, int(segment_sec * sr / hop_length))
+    overlap_frames = int(np.ceil(overlap_sec * sr / hop_length))
+
+    segments = []
+    for core_start in range(0, n_frames, segment_frames):
+        core_stop = min(core_start + segment_frames, n_frames)
+        context_start = max(0, core_start - overlap_frames) * hop_length
+        context_stop = min(n_samples, (core_stop + overlap_frames) * hop_length)
+        segments.append((context_start, context_stop, core_start, core_stop))
+    return segments
+
+
+def segment_features(
+    y: npt.NDArray,
+    sr: float,
+    segment: T_SEGMENT,
+    hop_length: int = 512,
+    onset_envelope: bool = False,
+    backend: str = DEFAULT_BACKEND,
+) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32] | None]:
+    """Compute the chromagram, and optionally the onset envelope, of the core frames of a segment.
+
+    Args:
+        y: the context samples of the segment, i.e. `signal[context_start:context_stop]`
+        sr: sampling rate of the audio data
+        segment: the segment, see `segment_signal`
+        hop_length: the hop length of the frames
+        onset_envelope: whether to compute the onset envelope as well
+        backend: the chroma backend, see `get_cqt_plan`
+
+    Returns:
+        the chromagram of the core frames; shape=(12, n_core_frames), and the onset envelope of the core frames if
+            requested, else None; shape=(n_core_frames,)
+    """
+    context_start, _, core_start, core_stop = segment
+    first = core_start - context_start // hop_length  # index of the first core frame within the context
+    core = slice(first, first + core_stop - core_start)
+
+    chroma = get_cqt_plan(sr, slide_length=hop_length, backend=backend).chroma(y)[:, core]
+    env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=hop_length)[core] if onset_envelope else None
+    return chroma, env
+
+
+def _segment_features(args: tuple) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32] | None]:
+    "Process pool entry point of `segment_features`."
+    return segment_features(*args)
+
+
+def extract_features_parallel(
+    y: npt.NDArray,
+    sr: float,
+    hop_length: int = 512,
+    onset_envelope: bool = False,
+    n_jobs: int | None = None,
+    segment_sec: float = 30.0,
+    overlap_sec: float = 1.0,
+    backend: str = DEFAULT_BACKEND,
+) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32] | None]:
+    """Compute the chromagram, and optionally the onset envelope, of a whole signal segment by segment in parallel.
+
+    The segments (see `segment_signal`) are analyzed by a pool of `n_jobs` processes, and their core frames stitched
+    into the features of the whole signal. The chromagram matches the one of the whole signal. The onset envelope
+    differs slightly from `librosa.onset.onset_strength`, as the dB clipping of the mel spectrogram is relative to the
+    maximum of each segment instead of the whole signal.
+
+    Args:
+        y: audio data
+        sr: sampling rate of the audio data
+        hop_length: the hop length of the frames
+        onset_envelope: whether to compute the onset envelope as well
+        n_jobs: number of processes; the number of CPUs if None; analyzes in this process if 1
+        segment_sec: seconds of signal per segment, see `segment_signal`
+        overlap_sec: seconds of context on each side of a segment, see `segment_signal`
+        backend: the chroma backend, see `get_cqt_plan`; "auto" picks the fastest one for the segments, before they
+            are dispatched
+
+    Returns:
+        the chromagram; shape=(12, n_frames), and the onset envelope if requested, else None; shape=(n_frames,)
+    """
+    n_jobs = (os.cpu_count() or 1) if n_jobs is None else n_jobs
+    assert n_jobs > 0, "n_jobs must be greater than 0"
+
+    segments = segment_signal(len(y), hop_length=hop_length, segment_sec=segment_sec, overlap_sec=overlap_sec, sr=sr)
+    backend = resolve_chroma_backend(backend, sr, segments[0][1] - segments[0][0], slide_length=hop_length)
+    tasks = [(y[segment[0] : segment[1]], sr, segment, hop_length, onset_envelope, backend) for segment in segments]
+    if n_jobs == 1 or len(segments) == 1:
+        features = list(map(_segment_features, tasks))
+    else:
+        with multiprocessing.Pool(min(n_jobs, len(segments))) as pool:
+            features = pool.map(_segment_features, tasks)
+    logger.debug("analyzed %d segments with %d processes", len(segments), n_jobs)
+
+    chroma = np.concatenate([c for c, _ in features], axis=1)
+    env = np.concatenate([e for _, e in features]) if onset_envelope else None
+    return chroma, env
+
+
+def extract_note_durations_parallel(
+    y,
+    sr: float,
+    thr: float = 0.9,
+    slide_length: int = 512,
+    n_jobs: int | None = None,
+    segment_sec: float = 30.0,
+    overlap_sec: float = 1.0,
+    backend: str = DEFAULT_BACKEND,
+):
+    """Parallel version of `extract_note_durations` for long signals, see `extract_features_parallel`.
+
+    Note:
+        As the chromagram is stitched before the notes are extracted, notes crossing a seam are one note, with the
+        onset, conclusion, and energy of the single-process result.
+
+    Args:
+        y: audio data
+        sr: sampling rate of the audio data
+        thr: the chroma energy threshold for considering a note as active; between 0 and 1
+        slide_length: the slide length used to compute the chromagram
+        n_jobs: number of processes; the number of CPUs if None
+        segment_sec: seconds of signal per segment
+        overlap_sec: seconds of context on each side of a segment
+        backend: the chroma backend, see `extract_features_parallel`
+
+    Returns:
+        the detect N notes and their duration; shape=(N, 4),
+            with columns=(note_id, onset(sec), conclusion(sec), mean_chroma_energy[0,1])
+    """
+    chromagram, _ = extract_features_parallel(
+        y,
+        sr,
+        hop_length=slide_length,
+        n_jobs=n_jobs,
+        segment_sec=segment_sec,
+        overlap_sec=overlap_sec,
+        backend=backend,
+    )
+    return chromagram_to_note_durations(chromagram, sr, thr=thr, slide_length=slide_length)
+
+
+def extract_note_onsets_parallel(
+    y,
+    sr: float,
+    threshold: float = 0.9,
+    n_jobs: int | None = None,
+    segment_sec: float = 30.0,
+    overlap_sec: float = 1.0,
+    backend: str = DEFAULT_BACKEND,
+):
+    """Parallel version of `extract_note_onsets` for long signals, see `extract_features_parallel`.
+
+    Note:
+        The peak picking runs on the stitched onset envelope, hence it's normalized over the whole signal and onsets
+        at a seam are detected once. The onsets match the single-process result within one hop.
+
+    Args:
+        y: audio data
+        sr: sampling rate of the audio data
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        n_jobs: number of processes; the number of CPUs if None
+        segment_sec: seconds of signal per segment
+        overlap_sec: seconds of context on each side of a segment
+        backend: the chroma backend, see `extract_features_parallel`
+
+    Returns:
+        the detect N note onsets and their onset time; shape=(N, 4),
+            with columns=(note_id, onset(sec), np.nan, chroma_energy[0,1])
+    """
+    chroma, onset_env = extract_features_parallel(
+        y,
+        sr,
+        onset_envelope=True,
+        n_jobs=n_jobs,
+        segment_sec=segment_sec,
+        overlap_sec=overlap_sec,
+        backend=backend,
+    )
+    onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, normalize=True, backtrack=True)
+    return chromagram_to_note_onsets(chroma, onset_frames, sr, threshold=threshold)
@@ -0,0 +1,89 @@
+# sampling rate conversion for the analysis
+# the chroma tops out far below the Nyquist frequency of 44.1kHz audio, hence analyzing at a lower rate saves time
+
+import math
+
+import numpy as np
+import numpy.typing as npt
+import scipy
+
+
+class StreamingResampler:
+    def __init__(self, sr_in: int, sr_out: int, beta: float = 5.0):
+        """Polyphase resampler for an audio stream, keeping its filter state across updates.
+
+        Uses the linear-phase low-pass FIR filter of `scipy.signal.resample_poly` (a Kaiser windowed sinc of 10 zero
+        crossings per side at the lower of both rates), applied by `scipy.signal.upfirdn` to the new samples plus the
+        history of the filter. Hence the resampled stream matches resampling the whole signal at once, up to float32
+        rounding. Output sample `m` is centered on the input time `m / sr_out`.
+
+        Note:
+            The filter is zero-phase, hence the last few input samples (about `10 / sr_out` seconds) are only
+            resampled once later samples have arrived.
+
+        Usage:
+            `resampler = StreamingResampler(44100, 22050); y_22k = resampler.update(y_44k)`
+
+        Args:
+            sr_in: sampling rate of the input
+            sr_out: sampling rate of the output
+            beta: shape parameter of the Kaiser window
+        """
+        assert sr_in > 0 and sr_out > 0, "sampling rates must be greater than 0"
+
+        self.sr_in = int(sr_in)
+        self.sr_out = int(sr_out)
+        gcd = math.gcd(self.sr_in, self.sr_out)
+        self.up = self.sr_out // gcd
+        self.down = self.sr_in // gcd
+
+        # the filter of `scipy.signal.resample_poly`
+        max_rate = max(self.up, self.down)
+        self.half_len = 10 * max_rate
+        self.filter = (
+            scipy.signal.firwin(2 * self.half_len + 1, 1 / max_rate, window=("kaiser", beta)) * self.up
+        ).astype(np.float32)
+        # the history starts on an input sample whose upsampled index is a multiple of `down` from the output centers,
+        # such that the outputs of `scipy.signal.upfirdn` over the history are output samples
+        self.start_phase = self.half_len * pow(self.up, -1, self.down) % self.down if self.down > 1 else 0
+
+        self.reset()
+
+    def reset(self) -> None:
+        "Forget all past samples, e.g. after a gap in the stream."
+        self.history_start = self._history_start(0)  # stream index of the first sample in the history
+        self.history = np.zeros(-self.history_start, dtype=np.float32)  # incl. silence before the stream
+        self.n_samples_in = 0
+        self.n_samples_out = 0
+
+    def update(self, y: npt.NDArray) -> npt.NDArray[np.float32]:
+        """Add new samples to the stream and resample all samples whose filter support is complete.
+
+        Args:
+            y: the new audio samples
+
+        Returns:
+            the new resampled samples
+        """
+        self.history = np.concatenate([self.history, np.asarray(y, dtype=np.float32)])
+        self.n_samples_in += len(y)
+
+        # output m is the filtered upsampled stream at index `m * down + half_len`, which must not need future samples
+        n_out = max(self.n_samples_out, -(-(self.n_samples_in * self.up - self.half_len) // self.down))
+        if n_out == self.n_samples_out:
+            return np.zeros(0, dtype=np.float32)
+        out = scipy.signal.upfirdn(self.filter, self.history, self.up, self.down)
+        first = self.n_samples_out + (self.half_len - self.history_start * self.up) // self.down
+        out = out[first : first + n_out - self.n_samples_out]
+        self.n_samples_out = n_out
+
+        # keep the input samples of the next output's filter support
+        history_start = self._history_start(n_out)
+        self.history = self.history[history_start - self.history_start :]
+        self.history_start = history_start
+        return out.astype(np.float32, copy=False)
+
+    def _history_start(self, n_out: int) -> int:
+        "The first input sample to keep for output `n_out` and later, aligned to the start phase."
+        first_input = -(-(n_out * self.down - self.half_len) // self.up)
+        return first_input - (first_input - self.start_phase) % self.down
@@ -1,6 +1,28 @@
 # audio data readers
 # functionality to read audio data from various sources, like files or sound sources
 
+from circle_dance.audio.read.capture import StreamCapture, StreamStats
+from circle_dance.audio.read.file import (
+    AudioFileReader,
+    extract_notes_from_file,
+    file_reader,
+)
+from circle_dance.audio.read.note_events import NoteTracker
+from circle_dance.audio.read.note_queue import NoteBatchQueue
+from circle_dance.audio.read.ring_buffer import RingBuffer, SharedRingBuffer
 from circle_dance.audio.read.stream import stream_reader
+from circle_dance.audio.read.worker import StreamAnalysisProcess
 
-__all__ = ["stream_reader"]
+__all__ = [
+    "stream_reader",
+    "RingBuffer",
+    "SharedRingBuffer",
+    "StreamCapture",
+    "StreamStats",
+    "StreamAnalysisProcess",
+    "NoteBatchQueue",
+    "NoteTracker",
+    "AudioFileReader",
+    "file_reader",
+    "extract_notes_from_file",
+]
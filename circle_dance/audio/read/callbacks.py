@@ -2,13 +2,64 @@
 # these wrap the audio processing functionality to be usable in the stream_reader
 
 import logging
+import math
+import threading
+from typing import Callable
 
+import numpy as np
 import numpy.typing as npt
 
-from circle_dance.audio import process
+from circle_dance.audio import process, split
+from circle_dance.audio.read.note_events import NoteTracker
+from circle_dance.audio.read.ring_buffer import RingBuffer
+from circle_dance.audio.read.stream import CHUNK
 
 logger = logging.getLogger(__name__)
 
+INT16_SCALE = 1 / 32768  # scales int16 samples to [-1, 1), like the float samples `librosa.load` returns
+REFERENCE_RATE = 44100  # the sampling rate the sample counts of the streaming callbacks refer to
+
+
+class Float32Scratch:
+    def __init__(self, size: int = 0):
+        """Preallocated float32 buffer to convert the int16 buffers of a stream into, grown on demand.
+
+        Note:
+            The converted samples are a view on the scratch buffer, valid until the next conversion.
+
+        Args:
+            size: initial size in samples
+        """
+        self.data = np.empty(size, dtype=np.float32)
+
+    def convert(self, buffer: npt.NDArray) -> npt.NDArray[np.float32]:
+        "Convert int16 samples to float32 in [-1, 1); float32 samples are returned as they are, without a copy."
+        if buffer.dtype == np.float32:
+            return buffer
+        if len(buffer) > len(self.data):
+            self.data = np.empty(len(buffer), dtype=np.float32)
+        out = self.data[: len(buffer)]
+        if buffer.dtype == np.int16:
+            np.multiply(buffer, np.float32(INT16_SCALE), out=out)
+        else:
+            out[:] = buffer
+        return out
+
+
+_scratch = threading.local()  # per stream reader thread, for the stateless callbacks
+
+
+def _thread_scratch() -> Float32Scratch:
+    "The scratch buffer of the calling thread."
+    if not hasattr(_scratch, "buffer"):
+        _scratch.buffer = Float32Scratch()
+    return _scratch.buffer
+
+
+def _at_rate(n_samples: int, sr: float, multiple: int = 1) -> int:
+    "A number of samples at `REFERENCE_RATE` as about the same duration at another rate, in multiples of `multiple`."
+    return max(1, round(n_samples * sr / REFERENCE_RATE / multiple)) * multiple
+
 
 # Note: prefers steam_reader with
 #    buffer_replenish_multiplier = 5
@@ -45,7 +96,7 @@ def extract_node_onsets_callback(
         Notes cleaned from carryover effects.
     """
     # extract notes
-    notes_with_onsets = process.extract_note_onsets(buffer.astype(float), sr=sr, threshold=threshold)
+    notes_with_onsets = process.extract_note_onsets(_thread_scratch().convert(buffer), sr=sr, threshold=threshold)
 
     # remove carryover part and adjust times
     notes_with_onsets[:, 1:2] -= carryover_time_sec  # adjust onset times
@@ -69,7 +120,7 @@ def extract_note_durations_callback(
     threshold: float = 0.99,
 ) -> npt.NDArray:
     # extract notes
-    notes_with_durations = process.extract_note_durations(buffer.astype(float), sr=sr, thr=threshold)
+    notes_with_durations = process.extract_note_durations(_thread_scratch().convert(buffer), sr=sr, thr=threshold)
 
     # remove carryover part and adjust times
     notes_with_durations[:, 1:3] -= carryover_time_sec  # adjust onset and conclusion times
@@ -82,3 +133,612 @@ def extract_note_durations_callback(
     notes_with_durations[:, 1:3] += stream_clock
 
     return notes_with_durations
+
+
+class SharedStreamingCQT:
+    def __init__(
+        self,
+        window_frames: int = 64,
+        context_samples: int = 8192,
+        lookahead_samples: int = 4096,
+        backend: str = process.chroma.DEFAULT_BACKEND,
+    ):
+        """One `process.StreamingCQT` of a stream, shared by streaming callbacks analyzing it at different cadences.
+
+        A callback brings the CQT up to the end of its buffer with `update()`, which transforms only the samples
+        none of the callbacks has transformed yet; others may just read the final frames it already has, see
+        `final_frames()`. Hence, the frames of the stream are computed once, however many callbacks read them, e.g.
+        the analyzers of an `AnalysisScheduler`. A buffer not reaching back to the last sample the CQT has seen
+        restarts it.
+
+        Note:
+            Requires all callbacks to see the same stream, with the same stream clock.
+
+        Args:
+            window_frames: number of past frames to keep; must cover the frames all callbacks read
+            context_samples: see `process.StreamingCQT`; at `REFERENCE_RATE`, scaled to the rate of the stream
+            lookahead_samples: see `process.StreamingCQT`; at `REFERENCE_RATE`, scaled to the rate of the stream
+            backend: the chroma backend, see `process.StreamingCQT`
+        """
+        self.window_frames = window_frames
+        self.context_samples = context_samples
+        self.lookahead_samples = lookahead_samples
+        self.backend = backend
+
+        self.cqt: process.StreamingCQT | None = None
+        self.start_sample: int | None = None  # stream position, in samples, of the first sample of the CQT
+        self.scratch = Float32Scratch()
+
+    def update(self, buffer: npt.NDArray, sr: float, stream_clock: float, carryover_samples: int) -> int:
+        """Transform the samples of a buffer the CQT hasn't seen yet.
+
+        Args:
+            buffer: the audio buffer, see `extract_note_durations_callback`
+            sr: the sampling rate of the audio
+            stream_clock: the position in the stream of the first new sample in the buffer, in seconds
+            carryover_samples: the number of samples at the beginning of the buffer that are carried over
+
+        Returns:
+            the position of the first new sample in the buffer, in samples since the start of the CQT
+        """
+        if self.cqt is None:
+            self.cqt = process.StreamingCQT(
+                sr,
+                self.window_frames,
+                context_samples=_at_rate(self.context_samples, sr, multiple=process.chroma.SLIDE_LENGTH),
+                lookahead_samples=_at_rate(self.lookahead_samples, sr),
+                backend=self.backend,
+            )
+
+        # anchor the CQT on the buffer, and again after a gap in the stream
+        new_samples_start = round(stream_clock * sr)
+        buffer_end = new_samples_start + len(buffer) - carryover_samples
+        if self.start_sample is None or buffer_end - (self.start_sample + self.cqt.n_samples_total) > len(buffer):
+            self.cqt.reset()
+            self.start_sample = buffer_end - len(buffer)
+
+        n_unseen = buffer_end - (self.start_sample + self.cqt.n_samples_total)
+        if n_unseen > 0:
+            self.cqt.update(self.scratch.convert(buffer[len(buffer) - n_unseen :]))
+        return new_samples_start - self.start_sample
+
+    def final_frames(self, origin: int) -> tuple[npt.NDArray, int, int] | None:
+        """The final frames in the window, i.e. the ones later updates don't recompute anymore.
+
+        Args:
+            origin: the stream position, in samples, to return the position of the first frame relative to
+
+        Returns:
+            the final frames, oldest first; shape=(n_bins, n_frames), the position of the center of the oldest one,
+                in samples since `origin`, and the slide length; None if there are no final frames
+        """
+        if self.cqt is None or self.start_sample is None:
+            return None
+        cqt = self.cqt
+        n_final = (cqt.n_samples_total - cqt.lookahead_samples - cqt.first_frame_sample) // cqt.slide_length + 1
+        n_final = min(n_final, cqt.n_frames)
+        if n_final <= 0:
+            return None
+        return cqt.cqt[:, :n_final], self.start_sample + cqt.first_frame_sample - origin, cqt.slide_length
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped."
+        if self.cqt is not None:
+            self.cqt.reset()
+        self.start_sample = None
+
+
+# Note: works with any steam_reader multipliers, as the cost only depends on the new samples
+class StreamingNoteDurationsCallback:
+    def __init__(
+        self,
+        threshold: float = 0.99,
+        window_frames: int = 64,
+        context_samples: int = 8192,
+        lookahead_samples: int = 4096,
+        bands: split.T_BANDS | None = None,
+        backend: str = process.chroma.DEFAULT_BACKEND,
+        shared_cqt: SharedStreamingCQT | None = None,
+    ):
+        """Stateful variant of `extract_note_durations_callback` that computes the chromagram incrementally.
+
+        Only the new samples of each buffer are transformed (plus some context), the chroma frames of the carryover
+        are kept from the previous calls. Hence, the cost per call is independent of the carryover, which makes
+        small replenish multipliers (low latency) affordable.
+
+        Note:
+            Requires to see every buffer of the stream, in order. Use one instance per stream.
+
+        Usage:
+            `stream_reader(StreamingNoteDurationsCallback(threshold=0.9), ...)`
+
+        Args:
+            threshold: The energy threshold for considering a note as active, between 0 and 1.
+            window_frames: number of past chroma frames to extract the note durations from
+            context_samples: see `process.StreamingCQT`; at `REFERENCE_RATE`, scaled to the rate of the stream
+            lookahead_samples: see `process.StreamingCQT`; at `REFERENCE_RATE`, scaled to the rate of the stream
+            bands: extract the notes of each of these octave bands instead, with band offset note ids; see
+                `split.chromagrams_to_band_notes`
+            backend: the chroma backend, see `process.StreamingCQT`
+            shared_cqt: read the frames of this CQT, shared with other callbacks of the stream, instead of computing
+                own ones; its window, context, lookahead, and backend apply instead
+        """
+        self.threshold = threshold
+        self.window_frames = window_frames
+        self.context_samples = context_samples
+        self.lookahead_samples = lookahead_samples
+        self.bands = bands
+        self.backend = backend
+        self.shared_cqt = shared_cqt
+
+        self.cqt: process.StreamingCQT | None = None
+        self.scratch = Float32Scratch()
+
+    def __call__(
+        self,
+        buffer: npt.NDArray,
+        sr: float,
+        stream_clock: float,
+        carryover_samples: int,
+        carryover_time_sec: float,
+    ) -> npt.NDArray:
+        if self.shared_cqt is not None:
+            # bring the shared frames up to the end of the buffer
+            new_samples_start_sec = self.shared_cqt.update(buffer, sr, stream_clock, carryover_samples) / sr
+            self.cqt = self.shared_cqt.cqt
+        else:
+            if self.cqt is None:
+                self.cqt = process.StreamingCQT(
+                    sr,
+                    self.window_frames,
+                    context_samples=_at_rate(self.context_samples, sr, multiple=process.chroma.SLIDE_LENGTH),
+                    lookahead_samples=_at_rate(self.lookahead_samples, sr),
+                    backend=self.backend,
+                )
+
+            # transform only the new samples
+            new_samples_start_sec = self.cqt.n_samples_total / sr
+            self.cqt.update(self.scratch.convert(buffer[carryover_samples:]))
+        assert self.cqt is not None
+
+        # extract notes from the chroma window
+        if self.bands is None:
+            notes_with_durations = process.chromagram_to_note_durations(
+                self.cqt.chroma(), sr, thr=self.threshold, slide_length=self.cqt.slide_length
+            )
+        else:
+            notes_with_durations = split.chromagrams_to_band_notes(
+                split.fold_octave_bands(self.cqt.cqt, self.bands),
+                sr,
+                threshold=self.threshold,
+                hop_length=self.cqt.slide_length,
+            )
+
+        # make times relative to the new samples
+        notes_with_durations[:, 1:3] += self.cqt.first_frame_sample / sr - new_samples_start_sec
+        notes_with_durations = notes_with_durations[
+            notes_with_durations[:, 2] > 0.5 / sr
+        ]  # remove notes with duration in the past, incl. those ending on the first new sample up to rounding
+        notes_with_durations = notes_with_durations.clip(min=0)  # clip onset
+
+        # add stream clock to times to get real clock times of notes
+        notes_with_durations[:, 1:3] += stream_clock
+
+        return notes_with_durations
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped."
+        if self.shared_cqt is not None:
+            self.shared_cqt.reset()
+        elif self.cqt is not None:
+            self.cqt.reset()
+
+
+# Note: works with any steam_reader multipliers, as the cost only depends on the new samples
+class StreamingNoteOnsetsCallback:
+    def __init__(
+        self,
+        threshold: float = 0.99,
+        context_samples: int = 8192,
+        bands: split.T_BANDS | None = None,
+        backend: str = process.chroma.DEFAULT_BACKEND,
+        shared_cqt: SharedStreamingCQT | None = None,
+    ):
+        """Stateful variant of `extract_node_onsets_callback` that detects the onsets incrementally.
+
+        Only the new samples of each buffer are processed. Each onset is reported exactly once, with a bounded
+        lookahead of about 100ms (see `process.StreamingOnsetDetector`), hence its notes can lie slightly in the past.
+        The chromagram is only computed for buffers that yield onsets, and only around them.
+
+        Note:
+            Requires to see every buffer of the stream, in order. Use one instance per stream.
+
+        Usage:
+            `stream_reader(StreamingNoteOnsetsCallback(threshold=0.9), ...)`
+
+        Args:
+            threshold: The energy threshold for considering a note as active, between 0 and 1.
+            context_samples: number of samples before an onset to compute its chroma with; at `REFERENCE_RATE`,
+                scaled to the rate of the stream
+            bands: extract the notes of each of these octave bands instead, with band offset note ids; see
+                `split.chromagrams_to_band_notes`
+            backend: the chroma backend, see `process.get_cqt_plan`; "auto" picks the fastest one for the segments
+                around the onsets, of about the samples kept
+            shared_cqt: read the chroma at the onsets from the final frames this CQT, shared with other callbacks of
+                the stream, already has, instead of transforming the segment around them; the segment is still
+                transformed for onsets outside of them, e.g. within the lookahead of its latest update
+        """
+        self.threshold = threshold
+        self.context_samples = context_samples
+        self.bands = bands
+        self.backend = backend
+        self.shared_cqt = shared_cqt
+
+        self.detector: process.StreamingOnsetDetector | None = None
+        self.plan: process.chroma.ChromaPlan
+        self.scratch = Float32Scratch()
+        self.history = np.zeros(0, dtype=np.float32)  # the most recent samples, enough to cover all onsets
+        self.n_samples_total = 0
+
+    def __call__(
+        self,
+        buffer: npt.NDArray,
+        sr: float,
+        stream_clock: float,
+        carryover_samples: int,
+        carryover_time_sec: float,
+    ) -> npt.NDArray:
+        context_samples = _at_rate(self.context_samples, sr)
+        if self.detector is None:
+            self.detector = process.StreamingOnsetDetector(sr)
+            n_history = (self.detector.history_frames + self.detector.post_avg) * self.detector.hop_length
+            backend = process.resolve_chroma_backend(
+                self.backend, sr, n_history + context_samples, slide_length=self.detector.hop_length
+            )
+            self.plan = process.get_cqt_plan(sr, slide_length=self.detector.hop_length, backend=backend)
+        hop_length = self.detector.hop_length
+
+        # process only the new samples
+        new_samples = self.scratch.convert(buffer[carryover_samples:])
+        new_samples_start = self.n_samples_total
+        onset_frames = self.detector.update(new_samples)
+
+        # keep enough samples to cover onsets reported with the maximum delay plus context
+        n_history = (self.detector.history_frames + self.detector.post_avg) * hop_length + context_samples
+        self.history = np.concatenate([self.history, new_samples])[-n_history:]
+        self.n_samples_total += len(new_samples)
+
+        if len(onset_frames) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+
+        cqt: npt.NDArray | None = None
+        final = None
+        if self.shared_cqt is not None:  # relative to the first own sample
+            final = self.shared_cqt.final_frames(round(stream_clock * sr) - new_samples_start)
+        if final is not None:
+            # the final frames of the shared CQT, if they are on the onset frames and cover all onsets
+            frames, segment_start, slide_length = final
+            if (
+                slide_length == hop_length
+                and segment_start % hop_length == 0
+                and onset_frames.min() * hop_length >= segment_start
+                and onset_frames.max() < segment_start // hop_length + frames.shape[1]
+            ):
+                cqt = frames
+        if cqt is None:
+            # chroma of the segment from shortly before the first onset till now, starting on a frame center
+            history_start = self.n_samples_total - len(self.history)
+            segment_start = max(onset_frames.min() * hop_length - context_samples, history_start)
+            segment_start = -(-segment_start // hop_length) * hop_length
+            cqt = self.plan.cqt(self.history[segment_start - history_start :])
+
+        # extract notes at the onsets
+        onset_frames = onset_frames[onset_frames >= segment_start // hop_length] - segment_start // hop_length
+        if self.bands is None:
+            notes_with_onsets = process.chromagram_to_note_onsets(
+                process.fold_chroma(cqt), onset_frames, sr, threshold=self.threshold, hop_length=hop_length
+            )
+        else:
+            notes_with_onsets = split.chromagrams_to_band_notes(
+                split.fold_octave_bands(cqt, self.bands),
+                sr,
+                notes="onsets",
+                threshold=self.threshold,
+                hop_length=hop_length,
+                onset_frames=onset_frames,
+            )
+
+        # add stream clock to times to get real clock times of notes
+        notes_with_onsets[:, 1] += (segment_start - new_samples_start) / sr + stream_clock
+
+        return notes_with_onsets
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped."
+        if self.detector is not None:
+            self.detector.reset()
+        if self.shared_cqt is not None:
+            self.shared_cqt.reset()
+        self.history = np.zeros(0, dtype=np.float32)
+        self.n_samples_total = 0
+
+
+# Note: works with any steam_reader multipliers, as the cost only depends on the new samples
+class StreamingHPSSCallback:
+    def __init__(
+        self,
+        harmonic_callback: Callable[..., npt.NDArray],
+        percussive_callback: Callable[..., npt.NDArray],
+        kernel_size: int = 17,
+    ):
+        """Separates the harmonic and percussive part of a stream, and extracts the notes of each with its own callback.
+
+        Only the new samples of each buffer are separated (see `split.StreamingHPSS`), and the separated samples are
+        passed on as new samples without carryover. Hence, the wrapped callbacks must be streaming callbacks, e.g.
+        `StreamingNoteOnsetsCallback`. The stream clock passed on is the one of the separated samples, which lag
+        behind the stream by the latency of the separation. The note ids of the percussive notes are offset by 12,
+        like the ones of the second octave band, see `split.split_band_notes`.
+
+        Note:
+            Requires to see every buffer of the stream, in order. Use one instance per stream.
+
+        Usage:
+            `stream_reader(StreamingHPSSCallback(StreamingNoteOnsetsCallback(), StreamingNoteOnsetsCallback()), ...)`
+
+        Args:
+            harmonic_callback: the callback extracting the notes of the harmonic part
+            percussive_callback: the callback extracting the notes of the percussive part
+            kernel_size: see `split.StreamingHPSS`
+        """
+        self.callbacks = (harmonic_callback, percussive_callback)
+        self.kernel_size = kernel_size
+
+        self.hpss: split.StreamingHPSS | None = None
+        self.scratch = Float32Scratch()
+        self.n_samples_in = 0  # samples of the stream separated so far
+        self.n_samples_out = 0  # separated samples passed on so far
+
+    def __call__(
+        self,
+        buffer: npt.NDArray,
+        sr: float,
+        stream_clock: float,
+        carryover_samples: int,
+        carryover_time_sec: float,
+    ) -> npt.NDArray:
+        if self.hpss is None:
+            self.hpss = split.StreamingHPSS(sr, kernel_size=self.kernel_size)
+
+        # separate only the new samples
+        parts = self.hpss.update(self.scratch.convert(buffer[carryover_samples:]))
+        parts_clock = stream_clock - (self.n_samples_in - self.n_samples_out) / sr
+        self.n_samples_in += len(buffer) - carryover_samples
+        self.n_samples_out += len(parts[0])
+        if len(parts[0]) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+
+        # extract the notes of each part
+        all_notes = []
+        for i, (callback, part) in enumerate(zip(self.callbacks, parts)):
+            notes = callback(part, sr, parts_clock, 0, 0.0)
+            notes[:, 0] += 12 * i
+            all_notes.append(notes)
+        return np.concatenate(all_notes)
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped."
+        if self.hpss is not None:
+            self.hpss.reset()
+        self.n_samples_in = 0
+        self.n_samples_out = 0
+        for callback in self.callbacks:
+            if hasattr(callback, "reset"):
+                callback.reset()
+
+
+# Note: works with any steam_reader multipliers, as the cost only depends on the new samples
+class ResamplingCallback:
+    def __init__(self, callback: Callable[..., npt.NDArray], sr: int):
+        """Resamples a stream to the analysis sampling rate, and extracts the notes with a callback at that rate.
+
+        Only the new samples of each buffer are resampled (see `process.StreamingResampler`), and the resampled
+        samples are passed on as new samples without carryover. Hence, the wrapped callback must be a streaming
+        callback, e.g. `StreamingNoteOnsetsCallback` or `StreamingHPSSCallback`. The resampler is zero-phase and the
+        stream clock passed on is the one of the resampled samples, which lag behind the stream by the few samples
+        awaiting the rest of their filter support. Hence, the note times stay aligned with the stream.
+
+        Note:
+            Requires to see every buffer of the stream, in order. Use one instance per stream.
+
+        Usage:
+            `stream_reader(ResamplingCallback(StreamingNoteOnsetsCallback(), sr=22050), ...)`
+
+        Args:
+            callback: the callback extracting the notes of the resampled stream
+            sr: the sampling rate to analyze the stream at
+        """
+        self.callback = callback
+        self.sr = sr
+
+        self.resampler: process.StreamingResampler | None = None
+        self.scratch = Float32Scratch()
+
+    def __call__(
+        self,
+        buffer: npt.NDArray,
+        sr: float,
+        stream_clock: float,
+        carryover_samples: int,
+        carryover_time_sec: float,
+    ) -> npt.NDArray:
+        if sr == self.sr:  # nothing to resample, e.g. a song at the analysis sampling rate already
+            return self.callback(buffer, sr, stream_clock, carryover_samples, carryover_time_sec)
+        if self.resampler is None:
+            self.resampler = process.StreamingResampler(int(sr), self.sr)
+
+        # resample only the new samples
+        n_in, n_out = self.resampler.n_samples_in, self.resampler.n_samples_out
+        resampled = self.resampler.update(self.scratch.convert(buffer[carryover_samples:]))
+        if len(resampled) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+
+        resampled_clock = stream_clock - (n_in / sr - n_out / self.sr)
+        return self.callback(resampled, self.sr, resampled_clock, 0, 0.0)
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped."
+        if self.resampler is not None:
+            self.resampler.reset()
+        if hasattr(self.callback, "reset"):
+            self.callback.reset()
+
+
+# Note: works with any steam_reader multipliers; wraps the other callbacks, as it needs the note ids of all sheets
+class NoteEventsCallback:
+    def __init__(
+        self,
+        callback: Callable[..., npt.NDArray],
+        max_gap_sec: float = 0.0,
+        min_extend_sec: float = 0.0,
+        skip_unchanged_closes: bool = False,
+    ):
+        """Tracks the notes a duration callback reports across buffers, and passes on only their changes.
+
+        The duration callbacks (e.g. `extract_note_durations_callback` and `StreamingNoteDurationsCallback`) report a
+        sustained note again on every buffer. Instead, each note is reported once when it opens, whenever its
+        conclusion moves, and once when it closes, with a stable note id (see `NoteTracker`). Hence, with
+        `min_extend_sec` the queue carries fewer rows, and the note pools update the open notes by id (see
+        `NotePool.update_note`) instead of searching them.
+
+        Note:
+            Requires to see every buffer of the stream, in order. Use one instance per stream.
+
+        Usage:
+            `stream_reader(NoteEventsCallback(StreamingNoteDurationsCallback(threshold=0.9)), ...)`
+
+        Args:
+            callback: the callback extracting the note durations
+            max_gap_sec: see `NoteTracker`
+            min_extend_sec: see `NoteTracker`
+            skip_unchanged_closes: see `NoteTracker`
+        """
+        self.callback = callback
+        self.tracker = NoteTracker(
+            max_gap_sec=max_gap_sec, min_extend_sec=min_extend_sec, skip_unchanged_closes=skip_unchanged_closes
+        )
+
+    def __call__(
+        self,
+        buffer: npt.NDArray,
+        sr: float,
+        stream_clock: float,
+        carryover_samples: int,
+        carryover_time_sec: float,
+    ) -> npt.NDArray:
+        return self.tracker.update(self.callback(buffer, sr, stream_clock, carryover_samples, carryover_time_sec))
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped; the open notes close with the next notes after the gap."
+        if hasattr(self.callback, "reset"):
+            self.callback.reset()
+
+
+# Note: prefers steam_reader with
+#    buffer_replenish_multiplier = AnalysisScheduler.replenish_multiplier
+#    buffer_carryover_multiplier = 0, as the scheduler keeps the carryover of each analyzer itself
+class AnalysisScheduler:
+    def __init__(self, analyzers: list[tuple[Callable[..., npt.NDArray], int, int]], chunk: int = CHUNK):
+        """Runs several callbacks (analyzers) on one stream, each at its own cadence and with its own carryover.
+
+        Keeps the most recent samples of the stream in one ring buffer, and passes each analyzer a zero-copy view of
+        it once `replenish` chunks of new samples have arrived for it, with up to `carryover` chunks before them.
+        Hence, e.g. a low-latency onset detector every chunk and a duration analyzer every 4 chunks share one
+        capture. Analyzers can also share their spectral frames, see `SharedStreamingCQT`. The note ids of the i-th
+        analyzer are offset by 12 * i, like the ones of the i-th octave band, see `split.split_band_notes`.
+
+        Note:
+            Requires to see every buffer of the stream, in order. Use one instance per stream. The chunks are at
+            `REFERENCE_RATE`, scaled to the rate of the stream. Buffers with more new samples than an analyzer's
+            cadence, e.g. from `extract_notes_from_file`, are passed on whole, as the ring buffer grows to hold them.
+
+        Usage:
+            ```
+            onsets, durations = StreamingNoteOnsetsCallback(), StreamingNoteDurationsCallback()
+            scheduler = AnalysisScheduler([(onsets, 1, 0), (durations, 4, 0)])
+            stream_reader(scheduler, queue, close_request_event, scheduler.replenish_multiplier, 0, ...)
+            ```
+
+        Args:
+            analyzers: the callbacks, each with its replenish and carryover multiplier, see `stream_reader`
+            chunk: number of samples per chunk
+        """
+        assert len(analyzers) > 0, "at least one analyzer is required"
+        assert all(replenish > 0 and carryover >= 0 for _, replenish, carryover in analyzers), "invalid multipliers"
+
+        self.callbacks = [callback for callback, _, _ in analyzers]
+        self.replenish = [replenish for _, replenish, _ in analyzers]
+        self.carryover = [carryover for _, _, carryover in analyzers]
+        self.chunk = chunk
+
+        self.buffer: RingBuffer | None = None
+        self.n_pending = [0] * len(analyzers)  # new samples not yet passed to each analyzer
+
+    @property
+    def replenish_multiplier(self) -> int:
+        "The cadence to call the scheduler at, in chunks: the greatest common divisor of the analyzers' cadences."
+        return math.gcd(*self.replenish)
+
+    def __call__(
+        self,
+        buffer: npt.NDArray,
+        sr: float,
+        stream_clock: float,
+        carryover_samples: int,
+        carryover_time_sec: float,
+    ) -> npt.NDArray:
+        chunk = _at_rate(self.chunk, sr)
+        new_samples = buffer[carryover_samples:]
+
+        # room for the pending samples of every analyzer, plus its carryover
+        n_max = max(replenish + carryover for replenish, carryover in zip(self.replenish, self.carryover))
+        capacity = chunk * n_max + len(new_samples)
+        if self.buffer is None or self.buffer.capacity < capacity:
+            grown = RingBuffer(capacity, dtype=buffer.dtype)
+            if self.buffer is not None:
+                grown.write(self.buffer.view())
+            self.buffer = grown
+        self.buffer.write(new_samples)
+        buffer_end_clock = stream_clock + len(new_samples) / sr
+
+        # run the analyzers that are due, on the most recent samples
+        all_notes = []
+        for i, callback in enumerate(self.callbacks):
+            self.n_pending[i] += len(new_samples)
+            if self.n_pending[i] < chunk * self.replenish[i]:
+                continue
+            n_new = self.n_pending[i]
+            n_carryover = min(len(self.buffer) - n_new, chunk * self.carryover[i])
+            self.n_pending[i] = 0
+
+            notes = callback(
+                self.buffer.view(n_carryover + n_new),
+                sr,
+                buffer_end_clock - n_new / sr,
+                n_carryover,
+                n_carryover / sr,
+            )
+            notes[:, 0] += 12 * i
+            all_notes.append(notes)
+
+        if len(all_notes) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+        return np.concatenate(all_notes)
+
+    def reset(self) -> None:
+        "Forget the past stream, e.g. after audio was skipped."
+        if self.buffer is not None:
+            self.buffer.clear()
+        self.n_pending = [0] * len(self.callbacks)
+        for callback in self.callbacks:
+            if hasattr(callback, "reset"):
+                callback.reset()
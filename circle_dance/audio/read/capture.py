@@ -0,0 +1,146 @@
+# non-blocking audio capture
+# captures the OS's default input device with PyAudio's stream callback into a ring buffer, decoupled from analysis
+
+import logging
+import threading
+
+import numpy as np
+import numpy.typing as npt
+import pyaudio
+
+from circle_dance.audio.read.ring_buffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamStats:
+    def __init__(self) -> None:
+        """Counters describing the health of an audio stream, shared between capture, analysis, and game.
+
+        Plain attributes, written by a single thread each; readers may see slightly outdated values.
+        """
+        self.n_overflows = 0  # input overflows reported by the audio device, i.e. audio lost before capture
+        self.n_underruns = 0  # input underflows reported by the audio device
+        self.n_dropped_frames = 0  # captured frames overwritten before the analysis consumed them
+
+        self.analyzed_sec = 0.0  # position in the stream up to which the audio has been analyzed
+        self.lag_sec = 0.0  # seconds of captured audio waiting for the analysis, measured before each buffer
+        self.max_lag_sec = 0.0  # maximum lag seen so far
+        self.n_skipped_frames = 0  # frames discarded by the "skip" shedding policy
+        self.n_dropped_buffers = 0  # buffers analyzed only with the next one due to the "drop" shedding policy
+        self.n_dropped_notes = 0  # notes dropped from the full note queue to make room for newer ones
+
+    def __repr__(self) -> str:
+        return ", ".join(f"{k}={v}" for k, v in vars(self).items())
+
+
+class StreamCapture:
+    def __init__(
+        self,
+        rate: int,
+        chunk: int,
+        format: int = pyaudio.paInt16,
+        channels: int = 1,
+        capacity_sec: float = 5.0,
+        stats: StreamStats | None = None,
+        buffer: RingBuffer | None = None,
+    ):
+        """Capture the OS's default input device into a ring buffer, without ever waiting on the consumer.
+
+        PyAudio calls the capture callback from its own thread for every `chunk` of frames. The callback only writes
+        the frames into a lock-protected ring buffer and returns, hence capture never stalls on processing. The
+        analysis consumes the frames with `read()` at its own pace. If it falls behind by more than the capacity,
+        the oldest frames are dropped and counted.
+
+        Args:
+            rate: sample rate
+            chunk: number of frames per device buffer
+            format: PyAudio sample format; only `pyaudio.paInt16` is supported
+            channels: number of channels
+            capacity_sec: seconds of audio the ring buffer holds
+            stats: counters to update; a new instance if not given
+            buffer: the ring buffer to capture into, e.g. a `SharedRingBuffer` read by another process; a new one
+                holding `capacity_sec` of audio if not given
+        """
+        assert format == pyaudio.paInt16, "only 16 bit samples are supported"
+
+        self.rate = rate
+        self.chunk = chunk
+        self.stats = StreamStats() if stats is None else stats
+
+        self.buffer = RingBuffer(int(capacity_sec * rate) * channels, dtype=np.int16) if buffer is None else buffer
+        self.n_consumed = 0  # number of samples consumed by the analysis
+        self.condition = threading.Condition()  # guards buffer and n_consumed
+
+        self.p = pyaudio.PyAudio()
+        self.stream = self.p.open(
+            format=format,
+            channels=channels,
+            rate=rate,
+            input=True,
+            frames_per_buffer=chunk,
+            stream_callback=self._on_audio,
+        )
+
+    def _on_audio(self, in_data, frame_count, time_info, status_flags):
+        "PyAudio stream callback; runs on PyAudio's thread and must return quickly."
+        if status_flags & pyaudio.paInputOverflow:
+            self.stats.n_overflows += 1
+        if status_flags & pyaudio.paInputUnderflow:
+            self.stats.n_underruns += 1
+
+        with self.condition:
+            self.buffer.write(np.frombuffer(in_data, dtype=np.int16))
+            self.condition.notify()
+
+        return (None, pyaudio.paContinue)
+
+    @property
+    def n_available(self) -> int:
+        "Number of captured samples not yet consumed."
+        return self.buffer.n_written - self.n_consumed
+
+    def read(self, n: int, timeout: float | None = None) -> npt.NDArray[np.int16] | None:
+        """Consume the next `n` captured samples, waiting until they are available.
+
+        Args:
+            n: number of samples to consume; must not exceed the capacity
+            timeout: maximum seconds to wait; waits indefinitely if None
+
+        Returns:
+            a copy of the samples, or None if they did not become available in time
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.n_available >= n, timeout=timeout):
+                return None
+
+            # skip frames that have already been overwritten
+            n_lost = self.n_available - len(self.buffer)
+            if n_lost > 0:
+                logger.warning("analysis fell behind capture, dropped %d frames", n_lost)
+                self.stats.n_dropped_frames += n_lost
+                self.n_consumed += n_lost
+
+            samples = self.buffer.view(self.n_available)[:n].copy()
+            self.n_consumed += n
+            return samples
+
+    def skip(self, n: int | None = None) -> int:
+        """Discard captured samples without consuming them, e.g. to catch up with real time.
+
+        Args:
+            n: number of oldest samples to discard; all available samples if None
+
+        Returns:
+            the number of discarded samples
+        """
+        with self.condition:
+            n_skipped = self.n_available if n is None else min(n, self.n_available)
+            self.n_consumed += n_skipped
+            return n_skipped
+
+    def close(self) -> None:
+        "Stop capturing and release the audio device."
+        self.stream.stop_stream()
+        self.stream.close()
+        self.p.terminate()
@@ -0,0 +1,134 @@
+# note events across the buffers of a stream
+# the duration callbacks report a sustained note again on every buffer, the tracker turns that into open/extend/close
+
+import numpy as np
+import numpy.typing as npt
+
+NOTE_OPEN = 0  # a new note; its conclusion is provisional
+NOTE_EXTEND = 1  # a new conclusion of an open note
+NOTE_CLOSE = 2  # the final conclusion of a note; the note id isn't used again
+MAX_NOTE_UID = 2**24  # note ids wrap around here, such that they are exact in the float32 event rows
+
+
+class NoteTracker:
+    def __init__(self, max_gap_sec: float = 0.0, min_extend_sec: float = 0.0, skip_unchanged_closes: bool = False):
+        """Tracks the notes of a stream across buffers, and reports only their changes as note events.
+
+        Keeps the active (open) note of each note id. A note of a buffer continues the open note of the same id if
+        its onset lies at most `max_gap_sec` after the open note's conclusion, e.g. a note clipped to the first new
+        sample of the buffer, and opens a new note otherwise. An open note closes once a note of the same buffer
+        concludes after it, as the notes of a buffer all end at the latest at the end of the analyzed window. Hence,
+        a note sounding through the end of the window stays open.
+
+        Each event is a row (note_id, onset, conclusion, energy, note_uid, event), where the first four columns are
+        those of the notes, `note_uid` is a stable id of the tracked note and `event` one of `NOTE_OPEN`,
+        `NOTE_EXTEND`, or `NOTE_CLOSE`. A note opened and closed in the same buffer is only reported as closed. Per
+        buffer, there is at most one event per tracked note. The conclusion of an open note moves with every buffer
+        it sounds through; with `min_extend_sec`, it's only reported once it moved by that much, such that a sustained
+        note takes about one event per `min_extend_sec` instead of one per buffer. Most notes close a buffer after
+        their last extension, with the conclusion already reported; with `skip_unchanged_closes`, those closes aren't
+        reported, e.g. for the note pools, which forget the open notes once they are no longer drawn anyway.
+        Notes without a conclusion, i.e. note onsets, are complete once reported, hence reported as closed notes.
+
+        Usage:
+            `tracker = NoteTracker(); events = tracker.update(callback(buffer, ...))`
+
+        Args:
+            max_gap_sec: maximum gap between the conclusion of an open note and the onset of a note of the same id
+                to continue the open note
+            min_extend_sec: minimum change of the conclusion of an open note to report it; the conclusion reported
+                by the closing event is always the final one
+            skip_unchanged_closes: don't report the closing of a note whose final conclusion was already reported
+        """
+        assert max_gap_sec >= 0, "max_gap_sec must be non-negative"
+        assert min_extend_sec >= 0, "min_extend_sec must be non-negative"
+
+        self.max_gap_sec = max_gap_sec
+        self.min_extend_sec = min_extend_sec
+        self.skip_unchanged_closes = skip_unchanged_closes
+        # note id -> [note_uid, note_id, onset, conclusion, energy, reported conclusion] of the open notes
+        self.active: dict[int, list] = {}
+        self.next_uid = 0
+
+        self.n_notes = 0  # total number of note rows tracked
+        self.n_events = 0  # total number of events reported
+
+    def __len__(self) -> int:
+        "Number of open notes."
+        return len(self.active)
+
+    def update(self, notes: npt.NDArray, horizon: float | None = None) -> npt.NDArray[np.float32]:
+        """Track the notes of one buffer.
+
+        Args:
+            notes: the notes of the buffer, in stream clock times; shape=(N, 4) with rows (note, onset, conclusion,
+                energy)
+            horizon: the stream time up to which the notes are final, i.e. open notes concluding before it are
+                closed; the latest conclusion of the notes if None, and no notes are closed if there are none
+
+        Returns:
+            the note events, in the order the notes changed; shape=(M, 6) with rows (note_id, onset, conclusion,
+                energy, note_uid, event)
+        """
+        self.n_notes += len(notes)
+        changed: dict[int, tuple[list, int]] = {}  # note_uid -> (note, event), in order of the first change
+
+        # note onsets, complete once reported
+        is_onset = np.isnan(notes[:, 2])
+        for note_id, onset, conclusion, energy in notes[is_onset].tolist():
+            uid = self._new_uid()
+            changed[uid] = ([uid, note_id, onset, conclusion, energy, conclusion], NOTE_CLOSE)
+        notes = notes[~is_onset]
+        if horizon is None and len(notes) > 0:
+            horizon = float(notes[:, 2].max())
+
+        notes = notes[np.lexsort((notes[:, 1], notes[:, 0]))]
+        for note_id, onset, conclusion, energy in notes.tolist():
+            key = int(note_id)
+            active = self.active.get(key)
+            if active is not None and onset <= active[3] + self.max_gap_sec:
+                # continue the open note; provisional conclusions may also move back
+                active[3] = conclusion
+                active[4] = energy
+                if conclusion != active[5] and abs(conclusion - active[5]) >= self.min_extend_sec:
+                    active[5] = conclusion
+                    changed.setdefault(active[0], (active, NOTE_EXTEND))
+                continue
+
+            if active is not None:
+                self._close(active, changed)
+            active = [self._new_uid(), note_id, onset, conclusion, energy, conclusion]
+            self.active[key] = active
+            changed[active[0]] = (active, NOTE_OPEN)
+
+        # close the notes that ended before the horizon
+        for key, active in list(self.active.items()):
+            if horizon is not None and active[3] + self.max_gap_sec < horizon:
+                del self.active[key]
+                self._close(active, changed)
+
+        if len(changed) == 0:
+            return np.empty((0, 6), dtype=np.float32)
+        events = np.array(
+            [(note[1], note[2], note[3], note[4], note[0], event) for note, event in changed.values()],
+            dtype=np.float32,
+        )
+        self.n_events += len(events)
+        return events
+
+    def reset(self) -> None:
+        "Forget all open notes, without closing them."
+        self.active = {}
+
+    def _new_uid(self) -> int:
+        uid = self.next_uid
+        self.next_uid = (self.next_uid + 1) % MAX_NOTE_UID
+        return uid
+
+    def _close(self, active: list, changed: dict[int, tuple[list, int]]) -> None:
+        "Report the closing of an open note, or skip it if its final conclusion is already reported."
+        opened = active[0] in changed and changed[active[0]][1] == NOTE_OPEN
+        if self.skip_unchanged_closes and active[3] == active[5] and not opened:
+            return
+        active[5] = active[3]
+        changed[active[0]] = (active, NOTE_CLOSE)
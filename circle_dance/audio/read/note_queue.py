@@ -0,0 +1,83 @@
+# batched hand-off of notes from the stream reader to the game loop
+# one lock acquisition per buffer on the producer side and per frame on the consumer side, instead of one per note
+
+import threading
+
+import numpy as np
+import numpy.typing as npt
+
+
+class NoteBatchQueue:
+    def __init__(self, max_notes: int = 0):
+        """Thread-safe queue of note batches, i.e. the (N, 4) note arrays or the note events of whole buffers.
+
+        The producer puts the notes of a buffer with one `put()`, the consumer takes all pending notes with one
+        `drain()`. If more than `max_notes` are pending, the oldest notes are dropped to make room for the newest
+        (newest wins), and counted in `n_dropped_notes`.
+
+        Usage:
+            `stream_reader(callback, NoteBatchQueue(), ...)`, then `for note, onset, conclusion, energy in q.drain()`
+
+        Args:
+            max_notes: maximum number of pending notes; unbounded if 0
+        """
+        assert max_notes >= 0, "max_notes must be non-negative"
+
+        self.max_notes = max_notes
+        self.lock = threading.Lock()
+        self.batches: list[npt.NDArray] = []
+        self.n_pending = 0  # number of notes in all pending batches
+
+        self.n_put_notes = 0  # total number of notes put
+        self.n_dropped_notes = 0  # total number of notes dropped to make room for newer ones
+
+    def __len__(self) -> int:
+        "Number of pending notes."
+        return self.n_pending
+
+    def empty(self) -> bool:
+        return self.n_pending == 0
+
+    def put(self, notes: npt.NDArray) -> None:
+        """Add the notes of one buffer, dropping the oldest pending notes if full.
+
+        Args:
+            notes: the notes; shape=(N, 4) with rows (note, onset, conclusion, energy), or the note events
+                of `NoteTracker`
+        """
+        if len(notes) == 0:
+            return
+
+        with self.lock:
+            self.batches.append(notes)
+            self.n_pending += len(notes)
+            self.n_put_notes += len(notes)
+
+            # newest wins: drop whole oldest batches, then the oldest rows of the oldest remaining batch
+            while self.max_notes and self.n_pending > self.max_notes:
+                n_excess = self.n_pending - self.max_notes
+                oldest = self.batches[0]
+                if len(oldest) <= n_excess:
+                    self.batches.pop(0)
+                    n_dropped = len(oldest)
+                else:
+                    self.batches[0] = oldest[n_excess:]
+                    n_dropped = n_excess
+                self.n_pending -= n_dropped
+                self.n_dropped_notes += n_dropped
+
+    def drain(self) -> npt.NDArray:
+        """Take all pending notes, without waiting.
+
+        Returns:
+            the notes, oldest first; shape=(N, 4)
+        """
+        with self.lock:
+            batches, self.batches = self.batches, []
+            self.n_pending = 0
+
+        if len(batches) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+        if len(batches) == 1:
+            return batches[0]
+        return np.concatenate(batches)
@@ -0,0 +1,206 @@
+# fixed-capacity ring buffer for audio samples
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import numpy.typing as npt
+
+
+class RingBuffer:
+    def __init__(self, capacity: int, dtype: npt.DTypeLike = np.int16):
+        """A fixed-capacity ring buffer that keeps the most recent samples of a stream.
+
+        Uses a mirrored layout: the storage holds the ring twice and every sample is written to both halves. Hence,
+        the most recent samples are always available as one contiguous, zero-copy view, without ever reallocating or
+        moving the buffered samples.
+
+        Args:
+            capacity: maximum number of samples to keep
+            dtype: sample type
+        """
+        assert capacity > 0, "capacity must be positive"
+
+        self.capacity = capacity
+        self.data = np.zeros(2 * capacity, dtype=dtype)
+        self.position = 0  # write position in the first half
+        self.n_written = 0  # total number of samples written since creation
+
+    def __len__(self) -> int:
+        "Number of valid samples in the buffer."
+        return min(self.n_written, self.capacity)
+
+    def write(self, samples: npt.NDArray) -> None:
+        """Write samples in-place, overwriting the oldest ones.
+
+        Args:
+            samples: the new samples; if longer than the capacity, only the last `capacity` samples are kept
+        """
+        n_samples = len(samples)
+        samples = samples[-self.capacity :]
+        n = len(samples)
+
+        # write up to the end of the first half, then wrap around; mirror each part into the second half
+        # the position stays at n_written modulo the capacity, even if samples had to be cut
+        position = (self.position + n_samples - n) % self.capacity
+        n_head = min(n, self.capacity - position)
+        self.data[position : position + n_head] = samples[:n_head]
+        self.data[position + self.capacity : position + self.capacity + n_head] = samples[:n_head]
+        if n_head < n:
+            self.data[: n - n_head] = samples[n_head:]
+            self.data[self.capacity : self.capacity + n - n_head] = samples[n_head:]
+
+        self.position = (position + n) % self.capacity
+        self.n_written += n_samples
+
+    def view(self, n: int | None = None) -> npt.NDArray:
+        """Zero-copy, read-only view of the most recent samples, oldest first.
+
+        Note:
+            The view is only valid until the next write.
+
+        Args:
+            n: number of samples; defaults to all valid samples
+
+        Returns:
+            a contiguous view of the last `n` samples
+        """
+        n = len(self) if n is None else n
+        assert 0 <= n <= len(self), "can not view more samples than buffered"
+
+        end = self.position + self.capacity
+        view = self.data[end - n : end]
+        view.flags.writeable = False
+        return view
+
+    def clear(self) -> None:
+        "Forget all samples."
+        self.position = 0
+        self.n_written = 0
+
+
+class SharedRingBuffer(RingBuffer):
+    # header fields, as int64 in front of the samples
+    _POSITION, _N_WRITTEN, _N_CONSUMED, _N_DROPPED = range(4)
+    _HEADER_SIZE = 4 * 8
+
+    def __init__(self, capacity: int, dtype: npt.DTypeLike = np.int16, name: str | None = None):
+        """A `RingBuffer` in shared memory, written by one process and consumed by another.
+
+        Besides the samples, the shared memory holds the write state and the consumer's read position, hence both
+        sides see how far the consumer lags behind. Meant for exactly one writer and one reader; the writer publishes
+        new samples by increasing `n_written` only after writing them.
+
+        Note:
+            Pickles to its name, such that it can be passed to a `multiprocessing.Process` and attaches there.
+            The creating process must call `unlink()` once all processes are done with it.
+
+        Args:
+            capacity: maximum number of samples to keep
+            dtype: sample type
+            name: name of an existing shared ring to attach to; creates a new one if None
+        """
+        assert capacity > 0, "capacity must be positive"
+
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        size = self._HEADER_SIZE + 2 * capacity * self.dtype.itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((4,), dtype=np.int64, buffer=self.shm.buf)
+        self.data = np.ndarray((2 * capacity,), dtype=self.dtype, buffer=self.shm.buf, offset=self._HEADER_SIZE)
+        if name is None:
+            self.header[:] = 0
+
+    def __reduce__(self):
+        return (SharedRingBuffer, (self.capacity, self.dtype, self.shm.name))
+
+    @property
+    def position(self) -> int:  # type: ignore[override]
+        return int(self.header[self._POSITION])
+
+    @position.setter
+    def position(self, value: int) -> None:
+        self.header[self._POSITION] = value
+
+    @property
+    def n_written(self) -> int:  # type: ignore[override]
+        return int(self.header[self._N_WRITTEN])
+
+    @n_written.setter
+    def n_written(self, value: int) -> None:
+        self.header[self._N_WRITTEN] = value
+
+    @property
+    def n_consumed(self) -> int:
+        "Total number of samples consumed by the reader."
+        return int(self.header[self._N_CONSUMED])
+
+    @property
+    def n_dropped(self) -> int:
+        "Total number of samples overwritten before the reader consumed them."
+        return int(self.header[self._N_DROPPED])
+
+    @property
+    def n_available(self) -> int:
+        "Number of written samples not yet consumed."
+        return self.n_written - self.n_consumed
+
+    def read(self, n: int, timeout: float | None = None, poll_interval: float = 0.002) -> npt.NDArray | None:
+        """Consume the next `n` samples, polling until they are available.
+
+        Args:
+            n: number of samples to consume; must not exceed the capacity
+            timeout: maximum seconds to wait; waits indefinitely if None
+            poll_interval: seconds to sleep between checks
+
+        Returns:
+            a copy of the samples, or None if they did not become available in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.n_available < n:
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            time.sleep(poll_interval)
+
+        # skip samples that have already been overwritten
+        n_written = self.n_written
+        n_lost = n_written - self.n_consumed - self.capacity
+        if n_lost > 0:
+            self.header[self._N_DROPPED] += n_lost
+            self.header[self._N_CONSUMED] += n_lost
+
+        # read relative to the snapshot of the write state; the writer may go on meanwhile
+        n_unread = n_written - self.n_consumed
+        end = (n_written % self.capacity) + self.capacity
+        samples = self.data[end - n_unread : end - n_unread + n].copy()
+        self.header[self._N_CONSUMED] += n
+        return samples
+
+    def skip(self, n: int | None = None) -> int:
+        """Discard samples without consuming them.
+
+        Args:
+            n: number of oldest samples to discard; all available samples if None
+
+        Returns:
+            the number of discarded samples
+        """
+        n_skipped = self.n_available if n is None else min(n, self.n_available)
+        self.header[self._N_CONSUMED] += n_skipped
+        return n_skipped
+
+    def clear(self) -> None:
+        "Forget all samples."
+        self.header[:] = 0
+
+    def close(self) -> None:
+        "Detach from the shared memory."
+        del self.header, self.data
+        self.shm.close()
+
+    def unlink(self) -> None:
+        "Free the shared memory; call once, from the creating process."
+        self.shm.unlink()
@@ -1,6 +1,7 @@
 # stream reader
 
 import logging
+import multiprocessing.synchronize
 import queue
 import threading
 from queue import Empty, Full
@@ -10,12 +11,16 @@ import numpy as np
 import numpy.typing as npt
 import pyaudio
 
+from circle_dance.audio.read.capture import StreamCapture, StreamStats
+from circle_dance.audio.read.note_queue import NoteBatchQueue
+from circle_dance.audio.read.ring_buffer import RingBuffer
+
 logger = logging.getLogger(__name__)
 
 
 # !NOTE:
 # When the processing of an audio buffer has a runtime > buffer_replenish_multiplier * CHUNK / RATE, then the notes will slowly get more and more delayed
-# potential solution: discard older notes, always empty audio buffer until no more to get
+# solution: choose a shedding policy in stream_reader, which keeps the lag below max_lag_sec
 # !NOTE:
 # buffer_replenish_multiplier * CHUNK / RATE is minimum delay between displays - should be <= 0.02s to be perceived as real time
 # !NOTE:
@@ -25,6 +30,7 @@ logger = logging.getLogger(__name__)
 T_CALLBACK_PROCESS_BUFFER: TypeAlias = Callable[
     [npt.NDArray[np.int16], float, float, int, float], npt.NDArray[np.float32]
 ]
+T_EVENT: TypeAlias = threading.Event | multiprocessing.synchronize.Event
 
 # Main stream parameters
 CHUNK = 1024  # 1024 Number of frames per buffer
@@ -33,82 +39,220 @@ CHANNELS = 1  # Number of channels (1 for mono, 2 for stereo)
 RATE = 44100  # 44100  # 22050 # Sample rate (samples per second)
 
 
+# policies to keep the latency bounded when the analysis falls behind real time, see `stream_reader`
+SHEDDING_POLICIES = ("none", "skip", "drop")
+
+
 def stream_reader(
     process_buffer_callback: T_CALLBACK_PROCESS_BUFFER,
-    queue: queue.Queue,
+    queue: queue.Queue | NoteBatchQueue,
     close_request_event: threading.Event,
     buffer_replenish_multiplier: int,
     buffer_carryover_multiplier: int,
+    capture_mode: str = "blocking",
+    stats: StreamStats | None = None,
+    shedding_policy: str = "none",
+    max_lag_sec: float = 0.1,
 ):
     """Producer that produces notes from an audio stream. Meant to be run with multithreading.
 
     Note:
-        Does not run well with multiprocessing. Causes input buffer overflow.
+        Does not run well with multiprocessing, as the process can't keep up with the input device and causes input
+        buffer overflows. To analyze in another process, capture in this one and use `worker.StreamAnalysisProcess`.
+
+    Note:
+        With `capture_mode="blocking"`, the stream is read in the same loop that runs the analysis, hence a slow
+        buffer delays the next read and risks input overflows. With `capture_mode="callback"`, PyAudio captures on
+        its own thread into a ring buffer (see `StreamCapture`) and this loop only consumes the captured audio.
+
+    Note:
+        The lag is the audio captured but not yet consumed by the analysis, measured before each buffer and published
+        in `stats.lag_sec`. Once it exceeds `max_lag_sec`, the shedding policy applies:
+        - "none": analyze every buffer; the lag grows as long as the analysis is too slow
+        - "skip": discard the backlog and continue with the newest audio; stateful callbacks are reset (if they
+          provide `reset()`), as the stream is discontinuous afterwards
+        - "drop": analyze only every other buffer; the samples of a dropped buffer are passed to the callback as new
+          samples with the next buffer, such that the stream stays continuous. Saves the per-call overhead of the
+          callbacks, e.g. the context and lookahead a streaming CQT transforms with every call.
 
     Args:
         process_buffer_callback: function to call to process each buffer
-        queue: the queue to put the notes into
+        queue: the queue to put the notes into; a `NoteBatchQueue` receives the notes of each buffer as one batch
         close_request_event: closes itself once this event has been triggered
         buffer_replenish_multiplier: wait until we obtained this times CHUNK of new audio data until we process the buffer
         buffer_carryover_multiplier: carry over this times CHUNK of audio data from last call to the next call
+        capture_mode: "blocking" to read the stream in the analysis loop, "callback" to capture on PyAudio's thread
+        stats: counters to update with the stream's overflows, underruns, dropped frames and notes, and lag
+        shedding_policy: one of `SHEDDING_POLICIES`
+        max_lag_sec: the lag above which the shedding policy applies
     """
-    p = pyaudio.PyAudio()
-    stream = p.open(
-        format=FORMAT,
-        channels=CHANNELS,
-        rate=RATE,
-        input=True,
-        frames_per_buffer=CHUNK,
-    )
+    assert capture_mode in ("blocking", "callback"), f"unknown capture mode {capture_mode}"
+    assert shedding_policy in SHEDDING_POLICIES, f"unknown shedding policy {shedding_policy}"
+    stats = StreamStats() if stats is None else stats
 
-    stream_clock = 0.0  # position in stream; and position in buffer after carryover samples; in seconds
-    buffer = np.array([], dtype=np.int16)
+    read_chunk: Callable[[], npt.NDArray[np.int16] | None]
+    n_pending: Callable[[], int]  # number of captured samples not yet read
+    discard: Callable[[int], int]  # discard that many captured samples
+    if capture_mode == "callback":
+        capture = StreamCapture(RATE, CHUNK, format=FORMAT, channels=CHANNELS, stats=stats)
+        read_chunk = lambda: capture.read(CHUNK, timeout=0.1)  # noqa: E731; timeout to check for close requests
+        n_pending = lambda: capture.n_available  # noqa: E731
+        discard = capture.skip
+        close = capture.close
+    else:
+        p = pyaudio.PyAudio()
+        stream = p.open(
+            format=FORMAT,
+            channels=CHANNELS,
+            rate=RATE,
+            input=True,
+            frames_per_buffer=CHUNK,
+        )
+        # Convert the byte data to numpy array (zero-copy)
+        read_chunk = lambda: np.frombuffer(stream.read(CHUNK), dtype=np.int16)  # noqa: E731
+        n_pending = stream.get_read_available
+
+        def discard(n: int) -> int:
+            stream.read(n, exception_on_overflow=False)
+            return n
+
+        def close():
+            stream.stop_stream()
+            stream.close()
+            p.terminate()
+
+    # put items into queue, keeping newest items
+    def put_items(items: npt.NDArray) -> None:
+        if isinstance(queue, NoteBatchQueue):  # one batch per buffer, the queue drops the oldest notes itself
+            queue.put(items)
+            stats.n_dropped_notes = queue.n_dropped_notes
+            return
+
+        for item in items:
+            if queue.full():  # make one attempt at removing the oldest note in the queue if full
+                try:
+                    logger.warn("queue full, trying to discard oldest item")
+                    queue.get_nowait()
+                    stats.n_dropped_notes += 1
+                except Empty:
+                    pass
+            try:  # try, discard if didn't work
+                queue.put_nowait(item)
+            except Full:
+                logger.warn("discarded item due to full queue")
+                stats.n_dropped_notes += 1
 
     # read steam, process audio data, and write note to queue
     try:
-        while not close_request_event.is_set():
-            carryover_offset_samples = len(buffer)
-            carryover_offset_sec = carryover_offset_samples / RATE
-            # print("sp: carryover_offset_sec", carryover_offset_sec)
-
-            # fill up buffer
-            while len(buffer) - carryover_offset_samples < CHUNK * buffer_replenish_multiplier:
-                # Read a chunk of data from the stream
-                data = stream.read(CHUNK)
-                # Convert the byte data to numpy array
-                audio_chunk = np.frombuffer(data, dtype=np.int16)
-                # Append the new chunk to the buffer
-                buffer = np.append(buffer, audio_chunk)
-
-            # callback buffer processor
-            items = process_buffer_callback(
-                buffer,
-                RATE,
-                stream_clock,
-                carryover_offset_samples,
-                carryover_offset_sec,
-            )
-
-            # put items into queue, keeping newest items
-            for item in items:
-                if queue.full():  # make one attempt at removing the oldest note in the queue if full
-                    try:
-                        logger.warn("queue full, trying to discard oldest item")
-                        queue.get_nowait()
-                    except Empty:
-                        pass
-                try:  # try, discard if didn't work
-                    queue.put_nowait(item)
-                except Full:
-                    logger.warn("discarded item due to full queue")
-                    pass
+        analysis_loop(
+            process_buffer_callback,
+            put_items,
+            close_request_event,
+            read_chunk,
+            n_pending,
+            discard,
+            buffer_replenish_multiplier,
+            buffer_carryover_multiplier,
+            stats,
+            shedding_policy=shedding_policy,
+            max_lag_sec=max_lag_sec,
+        )
+    finally:
+        close()
+        logger.info("stream closed: %s", stats)
 
-            # update stream clock
-            stream_clock += len(buffer) / RATE - carryover_offset_sec  # subtract time of carryover samples
 
-            # keep something at the end of the buffer for better continuity
-            buffer = buffer[-CHUNK * buffer_carryover_multiplier :]
-    finally:
-        stream.stop_stream()
-        stream.close()
-        p.terminate()
+def analysis_loop(
+    process_buffer_callback: T_CALLBACK_PROCESS_BUFFER,
+    put_items: Callable[[npt.NDArray], None],
+    close_request_event: T_EVENT,
+    read_chunk: Callable[[], npt.NDArray[np.int16] | None],
+    n_pending: Callable[[], int],
+    discard: Callable[[int], int],
+    buffer_replenish_multiplier: int,
+    buffer_carryover_multiplier: int,
+    stats: StreamStats,
+    shedding_policy: str = "none",
+    max_lag_sec: float = 0.1,
+    rate: int = RATE,
+    chunk: int = CHUNK,
+) -> None:
+    """The buffer loop of `stream_reader`, independent of where the audio comes from and where the notes go to.
+
+    Args:
+        process_buffer_callback: function to call to process each buffer
+        put_items: function to hand over the notes of each buffer
+        close_request_event: returns once this event has been triggered
+        read_chunk: returns the next `chunk` of captured samples, or None if there are none yet
+        n_pending: returns the number of captured samples not yet read
+        discard: discards that many captured samples and returns their number
+        buffer_replenish_multiplier: see `stream_reader`
+        buffer_carryover_multiplier: see `stream_reader`
+        stats: counters to update with the lag and shed load
+        shedding_policy: see `stream_reader`
+        max_lag_sec: see `stream_reader`
+        rate: sample rate of the audio
+        chunk: number of samples returned by `read_chunk`
+    """
+    stream_clock = 0.0  # position in stream; and position in buffer after carryover samples; in seconds
+    n_buffers = 2 if shedding_policy == "drop" else 1  # buffers analyzed at once: a dropped one and the next one
+    buffer = RingBuffer(
+        chunk * (buffer_carryover_multiplier + n_buffers * buffer_replenish_multiplier), dtype=np.int16
+    )
+    dropped_last = False  # whether the last buffer was dropped by the "drop" policy
+    n_new_samples = 0  # samples read but not yet analyzed
+
+    while not close_request_event.is_set():
+        # measure the backlog of the analysis
+        stats.lag_sec = n_pending() / rate
+        stats.max_lag_sec = max(stats.max_lag_sec, stats.lag_sec)
+        lagging = stats.lag_sec > max_lag_sec
+
+        # shed load to catch up with real time
+        if lagging and shedding_policy == "skip":
+            n_skipped = discard(n_pending())
+            stats.n_skipped_frames += n_skipped
+            stream_clock += n_skipped / rate
+            buffer.clear()
+            if hasattr(process_buffer_callback, "reset"):
+                process_buffer_callback.reset()
+            logger.warning("analysis lagging %.3fs behind, skipped to the newest audio", stats.lag_sec)
+
+        # fill up buffer
+        n_read = 0
+        while n_read < buffer_replenish_multiplier and not close_request_event.is_set():
+            # Read a chunk of data from the stream and write it into the ring buffer
+            audio_chunk = read_chunk()
+            if audio_chunk is not None:
+                buffer.write(audio_chunk)
+                n_read += 1
+        if n_read < buffer_replenish_multiplier:
+            break
+        n_new_samples += chunk * buffer_replenish_multiplier
+
+        # skip the analysis of every other buffer while lagging; its samples are analyzed with the next buffer
+        dropped_last = lagging and shedding_policy == "drop" and not dropped_last
+        if dropped_last:
+            stats.n_dropped_buffers += 1
+            continue
+
+        # keep something at the end of the buffer for better continuity
+        carryover_offset_samples = min(len(buffer) - n_new_samples, chunk * buffer_carryover_multiplier)
+        carryover_offset_sec = carryover_offset_samples / rate
+        # print("sp: carryover_offset_sec", carryover_offset_sec)
+
+        # callback buffer processor, on a zero-copy view of the carryover and new samples
+        buffer_view = buffer.view(carryover_offset_samples + n_new_samples)
+        items = process_buffer_callback(
+            buffer_view,
+            rate,
+            stream_clock,
+            carryover_offset_samples,
+            carryover_offset_sec,
+        )
+        put_items(items)
+
+        # update stream clock
+        stream_clock += len(buffer_view) / rate - carryover_offset_sec  # subtract time of carryover samples
+        stats.analyzed_sec = stream_clock
+        n_new_samples = 0
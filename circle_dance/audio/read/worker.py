@@ -0,0 +1,219 @@
+# stream analysis in a worker process
+# capture stays in the calling process, the analysis runs in a worker process on another core and doesn't compete for
+# the GIL with the capture and the render loop
+
+import copy
+import logging
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.synchronize
+
+import numpy as np
+import numpy.typing as npt
+
+from circle_dance.audio import process
+from circle_dance.audio.read.capture import StreamCapture, StreamStats
+from circle_dance.audio.read.ring_buffer import SharedRingBuffer
+from circle_dance.audio.read.stream import (
+    CHANNELS,
+    CHUNK,
+    FORMAT,
+    RATE,
+    SHEDDING_POLICIES,
+    T_CALLBACK_PROCESS_BUFFER,
+    analysis_loop,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_worker(
+    process_buffer_callback: T_CALLBACK_PROCESS_BUFFER,
+    ring: SharedRingBuffer,
+    notes_conn: multiprocessing.connection.Connection,
+    close_request_event: multiprocessing.synchronize.Event,
+    ready_event: multiprocessing.synchronize.Event,
+    buffer_replenish_multiplier: int,
+    buffer_carryover_multiplier: int,
+    shedding_policy: str = "none",
+    max_lag_sec: float = 0.1,
+):
+    """Consumer that produces notes from the audio in a shared ring buffer. Meant to be run as a process.
+
+    The notes of each buffer are sent as one (N, 4) array through `notes_conn`; buffers without notes send nothing.
+    Before consuming, runs a throwaway copy of the callback on silence, such that lazy initializations (CQT plans,
+    JIT compilation, filter banks) happen before the capture starts, and then sets `ready_event`.
+
+    Args:
+        process_buffer_callback: function to call to process each buffer
+        ring: the shared ring buffer the audio is captured into
+        notes_conn: the sending end of the pipe to send the notes through
+        close_request_event: closes itself once this event has been triggered
+        ready_event: set once the worker is warmed up
+        buffer_replenish_multiplier: see `stream_reader`
+        buffer_carryover_multiplier: see `stream_reader`
+        shedding_policy: see `stream_reader`
+        max_lag_sec: see `stream_reader`
+    """
+    stats = StreamStats()
+
+    process.warm_up_cqt_plans(RATE)
+    carryover_samples = CHUNK * buffer_carryover_multiplier
+    copy.deepcopy(process_buffer_callback)(
+        np.zeros(carryover_samples + CHUNK * buffer_replenish_multiplier, dtype=np.int16),
+        RATE,
+        0.0,
+        carryover_samples,
+        carryover_samples / RATE,
+    )
+    ready_event.set()
+
+    def put_items(items: npt.NDArray) -> None:
+        if len(items) > 0:
+            notes_conn.send(np.asarray(items))
+
+    try:
+        analysis_loop(
+            process_buffer_callback,
+            put_items,
+            close_request_event,
+            lambda: ring.read(CHUNK, timeout=0.1),  # timeout to check for close requests
+            lambda: ring.n_available,
+            ring.skip,
+            buffer_replenish_multiplier,
+            buffer_carryover_multiplier,
+            stats,
+            shedding_policy=shedding_policy,
+            max_lag_sec=max_lag_sec,
+        )
+    except (BrokenPipeError, EOFError):
+        logger.warning("note receiver is gone, stopping analysis")
+    finally:
+        notes_conn.close()
+        ring.close()
+        logger.info("analysis worker closed: %s", stats)
+
+
+class StreamAnalysisProcess:
+    def __init__(
+        self,
+        process_buffer_callback: T_CALLBACK_PROCESS_BUFFER,
+        buffer_replenish_multiplier: int,
+        buffer_carryover_multiplier: int,
+        shedding_policy: str = "none",
+        max_lag_sec: float = 0.1,
+        capacity_sec: float = 5.0,
+        stats: StreamStats | None = None,
+        ready_timeout: float = 30.0,
+    ):
+        """Capture the OS's default input device in this process and analyze it in a worker process.
+
+        The capture (see `StreamCapture`) writes into a `SharedRingBuffer`, from which `analysis_worker` reads. The
+        notes come back through a pipe, one batch per buffer, and are collected with `drain()`, e.g. once per game
+        frame.
+
+        Usage:
+            ```
+            analysis = StreamAnalysisProcess(callbacks.StreamingNoteOnsetsCallback(threshold=0.9), 1, 20)
+            analysis.start()
+            for note, onset, conclusion, energy in analysis.drain(): ...
+            analysis.stop()
+            ```
+
+        Args:
+            process_buffer_callback: function to call to process each buffer; must be picklable
+            buffer_replenish_multiplier: see `stream_reader`
+            buffer_carryover_multiplier: see `stream_reader`
+            shedding_policy: see `stream_reader`
+            max_lag_sec: see `stream_reader`
+            capacity_sec: seconds of audio the shared ring buffer holds
+            stats: counters to update with the stream's overflows, dropped frames, and lag; a new instance if not given
+            ready_timeout: maximum seconds to wait for the worker to warm up before starting the capture anyway
+        """
+        assert shedding_policy in SHEDDING_POLICIES, f"unknown shedding policy {shedding_policy}"
+
+        self.process_buffer_callback = process_buffer_callback
+        self.buffer_replenish_multiplier = buffer_replenish_multiplier
+        self.buffer_carryover_multiplier = buffer_carryover_multiplier
+        self.shedding_policy = shedding_policy
+        self.max_lag_sec = max_lag_sec
+        self.capacity_sec = capacity_sec
+        self.stats = StreamStats() if stats is None else stats
+        self.ready_timeout = ready_timeout
+
+        self.ring: SharedRingBuffer
+        self.notes_conn: multiprocessing.connection.Connection
+        self.close_request_event: multiprocessing.synchronize.Event
+        self.process: multiprocessing.Process
+        self.capture: StreamCapture
+
+    def start(self) -> None:
+        "Start the worker process, then the capture once the worker is warmed up."
+        self.ring = SharedRingBuffer(int(self.capacity_sec * RATE) * CHANNELS, dtype=np.int16)
+        self.notes_conn, worker_conn = multiprocessing.Pipe(duplex=False)
+        self.close_request_event = multiprocessing.Event()
+        ready_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=analysis_worker,
+            args=(
+                self.process_buffer_callback,
+                self.ring,
+                worker_conn,
+                self.close_request_event,
+                ready_event,
+                self.buffer_replenish_multiplier,
+                self.buffer_carryover_multiplier,
+                self.shedding_policy,
+                self.max_lag_sec,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        worker_conn.close()  # only the worker sends
+        if not ready_event.wait(timeout=self.ready_timeout):
+            logger.warning("analysis worker not ready after %.1fs; starting capture anyway", self.ready_timeout)
+
+        self.capture = StreamCapture(RATE, CHUNK, format=FORMAT, channels=CHANNELS, stats=self.stats, buffer=self.ring)
+
+    @property
+    def lag_sec(self) -> float:
+        "Seconds of captured audio the worker is behind real time."
+        return self.ring.n_available / RATE
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def drain(self) -> npt.NDArray:
+        """Take all notes the worker produced since the last call, without waiting.
+
+        Returns:
+            the notes, oldest first; shape=(N, 4)
+        """
+        self.stats.lag_sec = self.lag_sec
+        self.stats.max_lag_sec = max(self.stats.max_lag_sec, self.stats.lag_sec)
+        self.stats.n_dropped_frames = self.ring.n_dropped
+
+        batches = []
+        try:
+            while self.notes_conn.poll():
+                batches.append(self.notes_conn.recv())
+        except EOFError:  # worker is gone
+            pass
+
+        if len(batches) == 0:
+            return np.empty((0, 4), dtype=np.float32)
+        return np.concatenate(batches)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        "Stop the capture and the worker, and free the shared memory."
+        self.close_request_event.set()
+        self.capture.close()
+        self.process.join(timeout=timeout)  # maximum time in seconds to wait for the worker to terminate itself
+        if self.process.is_alive():
+            logger.warning("analysis worker did not stop in time; terminating it")
+            self.process.terminate()
+            self.process.join()
+        self.notes_conn.close()
+        self.ring.close()
+        self.ring.unlink()
+        logger.info("stream closed: %s", self.stats)
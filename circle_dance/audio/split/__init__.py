@@ -1,2 +1,24 @@
 # audio data splitters
 # functionality to split audio data into various elements, e.g. by stem or frequency range
+
+from circle_dance.audio.split.hpss import StreamingHPSS
+from circle_dance.audio.split.octaves import (
+    BAND_NAMES,
+    BANDS,
+    T_BANDS,
+    chromagrams_to_band_notes,
+    extract_octave_band_notes,
+    fold_octave_bands,
+    split_band_notes,
+)
+
+__all__ = [
+    "T_BANDS",
+    "BANDS",
+    "BAND_NAMES",
+    "fold_octave_bands",
+    "chromagrams_to_band_notes",
+    "split_band_notes",
+    "extract_octave_band_notes",
+    "StreamingHPSS",
+]
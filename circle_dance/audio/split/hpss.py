@@ -0,0 +1,135 @@
+# streaming harmonic/percussive source separation
+# splits an audio stream into its harmonic and percussive part, median filtering only the new spectrogram frames
+
+import librosa
+import numpy as np
+import numpy.typing as npt
+import scipy
+
+
+class StreamingHPSS:
+    def __init__(
+        self,
+        sr: float,
+        n_fft: int = 2048,
+        hop_length: int = 512,
+        kernel_size: int = 17,
+        power: float = 2.0,
+        margin: float = 1.0,
+    ):
+        """Incremental harmonic/percussive source separation of an audio stream.
+
+        Follows `librosa.effects.hpss`: the harmonic part of the magnitude spectrogram is its median over time, the
+        percussive part its median over frequency, and the STFT is split by soft masks of the two. The masked STFTs
+        are inverted by overlap-add. Each update computes only the STFT frames of the new samples, and median filters
+        only the frames that just got `kernel_size // 2` frames of lookahead. The magnitudes of the last `kernel_size`
+        frames are kept for the time median, and the overlap-add tails of both outputs.
+
+        Note:
+            The outputs are delayed by the median lookahead plus the overlap-add (see `latency_samples`), i.e. about
+            130ms with the defaults. Output sample `k` corresponds to input sample `k`. The time median is padded with
+            silent frames at the start of the stream.
+
+        Args:
+            sr: sampling rate of the audio data
+            n_fft: length of the FFT window; a multiple of `hop_length`
+            hop_length: the hop length of the STFT frames
+            kernel_size: length of both median filters, in frames resp. frequency bins; odd, librosa defaults to 31
+            power: exponent of the soft masks
+            margin: margin of the soft masks, see `librosa.decompose.hpss`; at least 1
+        """
+        assert n_fft % hop_length == 0, "n_fft must be a multiple of hop_length"
+        assert kernel_size % 2 == 1, "kernel_size must be odd"
+        assert margin >= 1, "margin must be at least 1"
+
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.kernel_size = kernel_size
+        self.power = power
+        self.margin = margin
+
+        self.window = scipy.signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        # overlap-added squared window per sample of a hop, to normalize the inverse STFT
+        n_overlap = n_fft // hop_length
+        self.window_norm = np.square(self.window).reshape(n_overlap, hop_length).sum(axis=0)
+
+        self.reset()
+
+    @property
+    def latency_samples(self) -> int:
+        "Number of samples the outputs lag behind the input."
+        return (self.kernel_size // 2) * self.hop_length + self.n_fft - self.hop_length
+
+    def reset(self) -> None:
+        "Forget all past samples and frames, e.g. after a gap in the stream."
+        n_bins = 1 + self.n_fft // 2
+        n_lookahead = self.kernel_size // 2
+
+        self.samples = np.zeros(self.n_fft // 2, dtype=np.float32)  # pending samples, incl. the centering padding
+        self.mags = np.zeros((n_bins, n_lookahead), dtype=np.float32)  # magnitudes from the median's first frame
+        self.stft = np.zeros((n_bins, 0), dtype=np.complex64)  # frames waiting for their lookahead
+        self.n_frames = 0  # number of frames computed since the start of the stream
+        self.tails = np.zeros((2, self.n_fft - self.hop_length), dtype=np.float32)  # overlap-add tails of outputs
+        self.n_trim = self.n_fft // 2  # output samples left to drop, which precede the stream due to centering
+
+    def update(self, y: npt.NDArray) -> tuple[npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """Add new samples to the stream and separate the frames that are complete.
+
+        Args:
+            y: the new audio samples
+
+        Returns:
+            the new samples of the harmonic and of the percussive part; both of the same length, a multiple of the
+                hop length (or less at the start of the stream)
+        """
+        # STFT of the new frames
+        self.samples = np.concatenate([self.samples, np.asarray(y, dtype=np.float32)])
+        n_new = max(0, (len(self.samples) - self.n_fft) // self.hop_length + 1)
+        if n_new == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(self.samples, self.n_fft)[:: self.hop_length][:n_new]
+        stft = scipy.fft.rfft(frames * self.window, axis=1).T
+        self.samples = self.samples[n_new * self.hop_length :]
+        self.n_frames += n_new
+
+        # frames with enough lookahead for the time median; the median's window spans all kept magnitudes
+        self.stft = np.concatenate([self.stft, stft], axis=1)
+        self.mags = np.concatenate([self.mags, np.abs(stft)], axis=1)
+        n_ready = self.mags.shape[1] - 2 * (self.kernel_size // 2)
+        if n_ready <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+        ready = self.stft[:, :n_ready]
+        mags = self.mags[:, self.kernel_size // 2 : self.kernel_size // 2 + n_ready]
+
+        harmonic = np.median(np.lib.stride_tricks.sliding_window_view(self.mags, self.kernel_size, axis=1), axis=2)
+        percussive = scipy.ndimage.median_filter(mags, size=(self.kernel_size, 1), mode="reflect")
+        self.stft = self.stft[:, n_ready:]
+        self.mags = self.mags[:, n_ready:]
+
+        mask_harmonic = librosa.util.softmask(harmonic, percussive * self.margin, power=self.power)
+        mask_percussive = librosa.util.softmask(percussive, harmonic * self.margin, power=self.power)
+
+        out_harmonic = self._overlap_add(0, ready * mask_harmonic)
+        out_percussive = self._overlap_add(1, ready * mask_percussive)
+
+        # drop the samples preceding the stream
+        n_trim = min(self.n_trim, len(out_harmonic))
+        self.n_trim -= n_trim
+        return out_harmonic[n_trim:], out_percussive[n_trim:]
+
+    def _overlap_add(self, output: int, stft: npt.NDArray) -> npt.NDArray[np.float32]:
+        "Inverse STFT of the frames of an output, returning the samples no later frame overlaps."
+        n_frames = stft.shape[1]
+        n_overlap = self.n_fft // self.hop_length
+        frames = scipy.fft.irfft(stft.T, n=self.n_fft, axis=1) * self.window
+        frames = frames.reshape(n_frames, n_overlap, self.hop_length)
+
+        # hops of the output, each the sum of the overlapping frame parts
+        hops = np.zeros((n_frames + n_overlap - 1, self.hop_length), dtype=np.float32)
+        hops[: n_overlap - 1] = self.tails[output].reshape(n_overlap - 1, self.hop_length)
+        for i in range(n_overlap):
+            hops[i : i + n_frames] += frames[:, i]
+
+        self.tails[output] = hops[n_frames:].reshape(-1)
+        return (hops[:n_frames] / self.window_norm).reshape(-1)
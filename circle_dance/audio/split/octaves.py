@@ -0,0 +1,133 @@
+# octave band splitter
+# splits the notes of a signal into octave bands, e.g. bass, mid, and treble, all folded from one shared CQT
+
+import librosa
+import numpy as np
+import numpy.typing as npt
+
+from circle_dance.audio.process.chroma import (
+    DEFAULT_BACKEND,
+    N_BINS,
+    N_CHROMA,
+    fold_chroma,
+    get_cqt_plan,
+    resolve_chroma_backend,
+)
+from circle_dance.audio.process.note_durations import chromagram_to_note_durations
+from circle_dance.audio.process.note_onsets import chromagram_to_note_onsets
+
+T_BANDS = tuple[tuple[int, int], ...]  # per band, the (first, stop) octave of the CQT, counted from its lowest octave
+
+N_OCTAVES = N_BINS // N_CHROMA
+BANDS: T_BANDS = ((0, 2), (2, 4), (4, N_OCTAVES))  # bass C1-B2, mid C3-B4, treble C5-B7
+BAND_NAMES = ("bass", "mid", "treble")
+
+
+def fold_octave_bands(cqt: npt.NDArray, bands: T_BANDS = BANDS) -> list[npt.NDArray[np.float32]]:
+    """Fold the octaves of each band of a CQT into a chromagram, see `fold_chroma`.
+
+    Each chromagram is max normalized per frame on its own, hence a quiet band shows its notes as loud as the others.
+    The bands may overlap or leave out octaves.
+
+    Args:
+        cqt: the CQT; shape=(n_bins, n_frames), with 12 bins per octave starting at a C
+        bands: the (first, stop) octave of each band
+
+    Returns:
+        the chromagram of each band; shape=(12, n_frames)
+    """
+    n_octaves = cqt.shape[0] // N_CHROMA
+    assert all(0 <= first < stop <= n_octaves for first, stop in bands), f"bands must lie within {n_octaves} octaves"
+    return [fold_chroma(cqt[first * N_CHROMA : stop * N_CHROMA]) for first, stop in bands]
+
+
+def chromagrams_to_band_notes(
+    chromas: list[npt.NDArray],
+    sr: float,
+    notes: str = "durations",
+    threshold: float = 0.9,
+    hop_length: int = 512,
+    onset_frames: npt.NDArray | None = None,
+) -> npt.NDArray[np.float32]:
+    """Extract the notes of each band's chromagram, see `chromagram_to_note_durations` and `chromagram_to_note_onsets`.
+
+    The note id of a note of band `i` is offset by `12 * i`, hence the notes of all bands fit in one array, e.g. to be
+    queued or cached like the notes of a single chromagram. See `split_band_notes` to route them to their bands.
+
+    Args:
+        chromas: the chromagram of each band; shape=(12, n_frames)
+        sr: sampling rate of the audio data the chromagrams were computed from
+        notes: "durations" or "onsets"
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        hop_length: the hop length used to compute the chromagrams and the onsets
+        onset_frames: the indices of the onset frames; required for onsets
+
+    Returns:
+        the detected N notes of all bands, ordered by band for durations and by onset for onsets; shape=(N, 4), with
+            columns=(band * 12 + note_id, onset(sec), conclusion(sec) or np.nan, energy[0,1])
+    """
+    assert notes == "durations" or onset_frames is not None, "onsets require the onset frames"
+    band_notes = []
+    for i, chroma in enumerate(chromas):
+        if notes == "durations":
+            extracted = chromagram_to_note_durations(chroma, sr, thr=threshold, slide_length=hop_length)
+        else:
+            extracted = chromagram_to_note_onsets(chroma, onset_frames, sr, threshold=threshold, hop_length=hop_length)
+        extracted[:, 0] += i * N_CHROMA
+        band_notes.append(extracted)
+
+    merged = np.concatenate(band_notes) if band_notes else np.empty((0, 4), dtype=np.float32)
+    if notes == "onsets":
+        merged = merged[np.lexsort((merged[:, 0], merged[:, 1]))]
+    return merged
+
+
+def split_band_notes(notes: npt.NDArray) -> tuple[npt.NDArray[np.int_], npt.NDArray]:
+    """Split the note ids of band notes (see `chromagrams_to_band_notes`) into band and note.
+
+    Returns:
+        the band of each note, and the notes with their note id within the band
+    """
+    band_ids = notes[:, 0].astype(int) // N_CHROMA
+    notes = notes.copy()
+    notes[:, 0] %= N_CHROMA
+    return band_ids, notes
+
+
+def extract_octave_band_notes(
+    y: npt.NDArray,
+    sr: float,
+    notes: str = "durations",
+    bands: T_BANDS = BANDS,
+    threshold: float = 0.9,
+    backend: str = DEFAULT_BACKEND,
+) -> npt.NDArray[np.float32]:
+    """Extract the note durations or onsets of each octave band of a signal.
+
+    Computes the CQT once, as `extract_note_durations` and `extract_note_onsets` do, and folds each band from it.
+    Hence splitting into bands costs about as much as extracting the notes of the whole signal, unlike filtering the
+    signal and analyzing each band separately.
+
+    Usage:
+        `band_ids, notes = split_band_notes(extract_octave_band_notes(y, sr))`
+
+    Args:
+        y: audio data
+        sr: sampling rate of the audio data
+        notes: "durations" or "onsets"
+        bands: the (first, stop) octave of each band
+        threshold: the chroma energy threshold for considering a note as active; between 0 and 1
+        backend: the chroma backend, see `get_cqt_plan`; "auto" picks the fastest one for the length of `y`
+
+    Returns:
+        the detected notes of all bands; shape=(N, 4), see `chromagrams_to_band_notes`
+    """
+    backend = resolve_chroma_backend(backend, sr, len(y), slide_length=512)
+    chromas = fold_octave_bands(get_cqt_plan(sr, slide_length=512, backend=backend).cqt(y), bands)
+
+    onset_frames = None
+    if notes == "onsets":
+        onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+        onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, normalize=True, backtrack=True)
+
+    return chromagrams_to_band_notes(chromas, sr, notes=notes, threshold=threshold, onset_frames=onset_frames)
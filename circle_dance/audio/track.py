@@ -0,0 +1,157 @@
+# note tracks: the extracted notes of a song, stored for memory-mapped playback
+# columnar and sorted by onset, with a time index, such that opening is constant time and seeking a binary search
+
+import json
+import math
+import struct
+
+import numpy as np
+import numpy.typing as npt
+
+MAGIC = b"CDNOTES\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQdQ")  # magic, version, metadata size, n_notes, index resolution, index size
+ALIGNMENT = 8
+
+# columns in storage order, with their dtypes
+COLUMNS: list[tuple[str, type]] = [
+    ("onsets", np.float64),
+    ("conclusions", np.float64),
+    ("energies", np.float32),
+    ("note_ids", np.uint8),
+]
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+class NoteTrack:
+    def __init__(self, fn: str):
+        """Memory-mapped note track, as written by `NoteTrack.write`.
+
+        The file consists of a header, JSON metadata, the note columns (onsets, conclusions, energies, note ids) sorted
+        by onset, and a time index holding the first row at or after every `index_resolution` seconds. Opening maps
+        the file without reading the notes, hence takes constant time regardless of the track's length; the pages of
+        the notes are only read once accessed.
+
+        Usage:
+            ```
+            NoteTrack.write("song.notes", extract_note_durations(y, sr), {"extractor": "durations"})
+            track = NoteTrack("song.notes")
+            notes = track[track.seek(60.0) : track.seek(70.0)]  # the notes with onsets in [60s, 70s)
+            ```
+
+        Args:
+            fn: the note track file
+        """
+        self.fn = fn
+        self._mm = np.memmap(fn, dtype=np.uint8, mode="r")
+
+        magic, version, metadata_size, n_notes, index_resolution, n_index = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{fn} is not a note track")
+        if version != VERSION:
+            raise ValueError(f"{fn} has note track version {version}, expected {VERSION}")
+
+        offset = HEADER.size
+        self.metadata: dict = json.loads(bytes(self._mm[offset : offset + metadata_size]).decode("utf-8"))
+        offset += _aligned(metadata_size)
+
+        self.n_notes = n_notes
+        self.index_resolution = index_resolution
+        self.onsets: npt.NDArray[np.float64]
+        self.conclusions: npt.NDArray[np.float64]
+        self.energies: npt.NDArray[np.float32]
+        self.note_ids: npt.NDArray[np.uint8]
+        for name, dtype in COLUMNS:
+            setattr(self, name, np.frombuffer(self._mm, dtype=dtype, count=n_notes, offset=offset))
+            offset += _aligned(n_notes * np.dtype(dtype).itemsize)
+        self.index: npt.NDArray[np.int64] = np.frombuffer(self._mm, dtype=np.int64, count=n_index, offset=offset)
+
+    @staticmethod
+    def write(fn: str, notes: npt.NDArray, metadata: dict | None = None, index_resolution: float = 1.0) -> None:
+        """Write notes as a note track.
+
+        Besides the given metadata, stores the `max_duration` of the notes (0 if they have no conclusions), which
+        bounds how far before the playhead the onsets of still sounding notes can lie.
+
+        Args:
+            fn: the note track file to write
+            notes: the notes, in any order; shape=(N, 4) with rows (note, onset, conclusion, energy)
+            metadata: JSON serializable information on the notes, e.g. the extractor and its parameters
+            index_resolution: seconds between the entries of the time index
+        """
+        assert index_resolution > 0, "index_resolution must be greater than 0"
+
+        notes = np.asarray(notes, dtype=np.float64).reshape(-1, 4)
+        notes = notes[np.argsort(notes[:, 1], kind="stable")]
+        columns = {
+            "note_ids": notes[:, 0].astype(np.uint8),
+            "onsets": notes[:, 1],
+            "conclusions": notes[:, 2],
+            "energies": notes[:, 3].astype(np.float32),
+        }
+
+        durations = notes[:, 2] - notes[:, 1]
+        max_duration = float(np.nanmax(durations)) if np.isfinite(durations).any() else 0.0
+        metadata_bytes = json.dumps({**(metadata or {}), "max_duration": max_duration}).encode("utf-8")
+
+        n_index = math.floor(notes[-1, 1] / index_resolution) + 2 if len(notes) else 1
+        index = np.searchsorted(notes[:, 1], np.arange(n_index) * index_resolution, side="left").astype(np.int64)
+
+        with open(fn, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(metadata_bytes), len(notes), index_resolution, n_index))
+            f.write(metadata_bytes.ljust(_aligned(len(metadata_bytes)), b"\0"))
+            for name, dtype in COLUMNS:
+                data = np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+                f.write(data.ljust(_aligned(len(data)), b"\0"))
+            f.write(index.tobytes())
+
+    def __len__(self) -> int:
+        return self.n_notes
+
+    def __getitem__(self, rows: slice) -> npt.NDArray[np.float64]:
+        """The notes of a range of rows.
+
+        Returns:
+            the notes, sorted by onset; shape=(N, 4) with rows (note, onset, conclusion, energy)
+        """
+        notes = np.empty((len(self.onsets[rows]), 4))
+        notes[:, 0] = self.note_ids[rows]
+        notes[:, 1] = self.onsets[rows]
+        notes[:, 2] = self.conclusions[rows]
+        notes[:, 3] = self.energies[rows]
+        return notes
+
+    @property
+    def max_duration(self) -> float:
+        "Duration of the longest note in seconds."
+        return self.metadata["max_duration"]
+
+    def seek(self, t: float, side: str = "left") -> int:
+        """Binary search for the row of a time, narrowed down by the time index.
+
+        Only the pages of the onsets around `t` are read, hence seeking is cheap regardless of the track's length.
+
+        Args:
+            t: time in seconds
+            side: "left" for the first row with an onset at or after `t`, "right" for the first row after `t`
+
+        Returns:
+            the row; `len(self)` if there is none
+        """
+        n_index = len(self.index)
+        k = math.floor(t / self.index_resolution) if t > 0 else 0
+        if k >= n_index:
+            return self.n_notes
+
+        # widen by one entry on each side, to be safe from rounding in the bucket computation
+        lo = int(self.index[max(k - 1, 0)])
+        hi = int(self.index[k + 2]) if k + 2 < n_index else self.n_notes
+        return lo + int(np.searchsorted(self.onsets[lo:hi], t, side=side))
+
+    def close(self) -> None:
+        "Drop the references to the memory map, which is unmapped once no notes returned by the columns remain."
+        del self.onsets, self.conclusions, self.energies, self.note_ids, self.index
+        del self._mm
@@ -33,6 +33,8 @@ def get_parser() -> argparse.ArgumentParser:
     # add subparsers
     __register_subcommand(subparsers, subcommands.PlaySubcommand)
     __register_subcommand(subparsers, subcommands.ListenSubcommand)
+    __register_subcommand(subparsers, subcommands.AnalyzeSubcommand)
+    __register_subcommand(subparsers, subcommands.IndexSubcommand)
 
     return parser
 
@@ -0,0 +1,115 @@
+import argparse
+import logging
+import os
+import time
+
+import librosa
+
+from circle_dance.audio.process import (
+    extract_note_durations_parallel,
+    extract_note_onsets_parallel,
+)
+from circle_dance.audio.read import callbacks, extract_notes_from_file
+from circle_dance.audio.track import NoteTrack
+from circle_dance.cli.subcommands.base import BaseSubcommand, classproperty
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    print(AnalyzeSubcommand.name)
+    args = get_parser().parse_args()
+    AnalyzeSubcommand.run(args)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=AnalyzeSubcommand.name, description=AnalyzeSubcommand.description)
+    AnalyzeSubcommand.add_arguments(parser)
+    return parser
+
+
+class AnalyzeSubcommand(BaseSubcommand):
+    "The analyze subcommand implementation."
+
+    _name = "analyze"
+    _help = "Extract the notes of a song into a note track, for `play --track`."
+    _description = (
+        "Extract the notes of a song into a note track, for `play --track`. A note track is memory-mapped when played, "
+        "hence starts in constant time and allows seeking, regardless of the length of the song."
+    )
+
+    @classproperty
+    def name(cls) -> str:
+        return cls._name
+
+    @classproperty
+    def help(cls) -> str:
+        return cls._help
+
+    @classproperty
+    def description(cls) -> str:
+        return cls._description
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("filename", help="Song to analyze.")
+        parser.add_argument(
+            "-o",
+            "--output",
+            default=None,
+            help="Note track file to write; defaults to SONG.NOTES.notes, e.g. song.durations.notes",
+        )
+        parser.add_argument("-t", "--threshold", type=float, default=0.75, help="Threshold for note detection.")
+        parser.add_argument(
+            "--notes",
+            choices=["onsets", "durations"],
+            default="durations",
+            help="Notes to extract: onsets for dot notes, durations for (simple) arc notes.",
+        )
+        parser.add_argument(
+            "--streaming",
+            action="store_true",
+            help="Extract the notes block by block in constant memory, e.g. for multi-hour recordings.",
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of processes to analyze the song with, segment by segment; 0 for all CPUs.",
+        )
+
+    @staticmethod
+    def run(args: argparse.Namespace) -> None:
+        output = args.output or f"{os.path.splitext(args.filename)[0]}.{args.notes}.notes"
+
+        t = time.perf_counter()
+        if args.streaming:
+            callback = (
+                callbacks.StreamingNoteOnsetsCallback(threshold=args.threshold)
+                if args.notes == "onsets"
+                else callbacks.StreamingNoteDurationsCallback(threshold=args.threshold)
+            )
+            extractor = type(callback).__name__
+            notes = extract_notes_from_file(callback, args.filename)
+        else:
+            y, sr = librosa.load(args.filename, sr=None)
+            if args.notes == "onsets":
+                notes = extract_note_onsets_parallel(y, sr, threshold=args.threshold, n_jobs=args.jobs or None)
+            else:
+                notes = extract_note_durations_parallel(y, sr, thr=args.threshold, n_jobs=args.jobs or None)
+            extractor = args.notes
+        logger.info("extracted %d notes in %.2fs", len(notes), time.perf_counter() - t)
+
+        metadata = {
+            "notes": args.notes,
+            "extractor": extractor,
+            "threshold": args.threshold,
+            "source": os.path.basename(args.filename),
+        }
+        NoteTrack.write(output, notes, metadata)
+        print(f"wrote {len(notes)} notes to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+
+from circle_dance.audio import library
+from circle_dance.cli.subcommands.base import BaseSubcommand, classproperty
+
+
+def main():
+    print(IndexSubcommand.name)
+    args = get_parser().parse_args()
+    IndexSubcommand.run(args)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=IndexSubcommand.name, description=IndexSubcommand.description)
+    IndexSubcommand.add_arguments(parser)
+    return parser
+
+
+class IndexSubcommand(BaseSubcommand):
+    "The index subcommand implementation."
+
+    _name = "index"
+    _help = "Write the note tracks of all songs in a directory, for `play --track`."
+    _description = (
+        "Write the note tracks of all songs in a directory, for `play --track`. Songs are analyzed in parallel, and "
+        "songs whose note tracks are up to date are skipped. Reports the throughput and the time spent per stage."
+    )
+
+    @classproperty
+    def name(cls) -> str:
+        return cls._name
+
+    @classproperty
+    def help(cls) -> str:
+        return cls._help
+
+    @classproperty
+    def description(cls) -> str:
+        return cls._description
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser) -> None:
+        parser.add_argument("directory", help="Library directory, searched recursively for songs.")
+        parser.add_argument(
+            "-o",
+            "--output-dir",
+            default=None,
+            help="Where to write the note tracks, mirroring the library's directory tree; next to the songs if not "
+            "given.",
+        )
+        parser.add_argument("-t", "--threshold", type=float, default=0.75, help="Threshold for note detection.")
+        parser.add_argument(
+            "--notes",
+            choices=library.NOTES,
+            nargs="+",
+            default=list(library.NOTES),
+            help="Notes to extract, each into its own note track: onsets for dot notes, durations for arc notes.",
+        )
+        parser.add_argument(
+            "-j", "--jobs", type=int, default=0, help="Number of processes to analyze songs with; 0 for all CPUs."
+        )
+        parser.add_argument("--force", action="store_true", help="Re-index all songs, including unchanged ones.")
+
+    @staticmethod
+    def run(args: argparse.Namespace) -> None:
+        stats = library.index_library(
+            args.directory,
+            output_dir=args.output_dir,
+            notes=tuple(args.notes),
+            threshold=args.threshold,
+            n_jobs=args.jobs or None,
+            force=args.force,
+        )
+        print(stats.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import argparse
 
+from circle_dance.audio import process, split
+from circle_dance.audio.read import stream
 from circle_dance.cli.subcommands import BaseSubcommand, classproperty
 from circle_dance.game import Game, modules
 
@@ -39,20 +41,97 @@ class ListenSubcommand(BaseSubcommand):
     def add_arguments(parser: argparse.ArgumentParser) -> None:
         parser.add_argument("-t", "--threshold", type=float, default=0.75, help="Threshold for note detection.")
         parser.add_argument(
-            "--note-type", choices=["dot", "arc"], default="dot", help="Type of note to use in visualization."
+            "--note-type",
+            choices=["dot", "arc", "sarc", "mixed"],
+            default="dot",
+            help="Type of note to use in visualization; 'mixed' shows onsets as dots and durations as arcs.",
+        )
+        parser.add_argument(
+            "--bands",
+            action="store_true",
+            help="Split the notes into bass, mid, and treble octaves, each shown on its own sheet.",
+        )
+        parser.add_argument(
+            "--hpss",
+            action="store_true",
+            help="Separate the harmonic and the percussive sounds, each shown on its own sheet.",
+        )
+        parser.add_argument(
+            "--sr",
+            type=int,
+            default=None,
+            help="Sampling rate to analyze at, e.g. 22050 for about half the cost; the native rate if not given.",
+        )
+        parser.add_argument(
+            "--chroma-backend",
+            choices=[*process.chroma.BACKENDS, process.chroma.AUTO_BACKEND],
+            default=process.chroma.DEFAULT_BACKEND,
+            help="Transform to compute the chroma with; 'auto' benchmarks them and picks the fastest one.",
+        )
+        parser.add_argument(
+            "--shedding",
+            choices=stream.SHEDDING_POLICIES,
+            default="none",
+            help="How to keep the latency bounded when the analysis falls behind real time.",
+        )
+        parser.add_argument(
+            "--max-lag", type=float, default=0.1, help="Lag in seconds above which the shedding policy applies."
+        )
+        parser.add_argument(
+            "--worker",
+            choices=["thread", "process"],
+            default="thread",
+            help="Analyze the stream in a thread, or in a worker process to use another core.",
         )
 
     @staticmethod
     def run(args: argparse.Namespace) -> None:
         g = Game()
+        bands = split.BANDS if args.bands else None
 
         circular_sheet: modules.BaseModule
         if args.note_type == "dot":
-            circular_sheet = modules.DotNotesOnCircularSheetStream(threshold=args.threshold)
+            circular_sheet = modules.DotNotesOnCircularSheetStream(
+                threshold=args.threshold,
+                shedding_policy=args.shedding,
+                max_lag_sec=args.max_lag,
+                worker=args.worker,
+                bands=bands,
+                hpss=args.hpss,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
+        elif args.note_type == "mixed":
+            circular_sheet = modules.MixedNotesOnCircularSheetStream(
+                threshold=args.threshold,
+                shedding_policy=args.shedding,
+                max_lag_sec=args.max_lag,
+                worker=args.worker,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
         elif args.note_type == "sarc":
-            circular_sheet = modules.SimpleArcNotesOnCircularSheetStream(threshold=args.threshold)
+            circular_sheet = modules.SimpleArcNotesOnCircularSheetStream(
+                threshold=args.threshold,
+                shedding_policy=args.shedding,
+                max_lag_sec=args.max_lag,
+                worker=args.worker,
+                bands=bands,
+                hpss=args.hpss,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
         else:
-            circular_sheet = modules.ArcNotesOnCircularSheetStream(threshold=args.threshold)
+            circular_sheet = modules.ArcNotesOnCircularSheetStream(
+                threshold=args.threshold,
+                shedding_policy=args.shedding,
+                max_lag_sec=args.max_lag,
+                worker=args.worker,
+                bands=bands,
+                hpss=args.hpss,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
         circular_sheet.register_callbacks(g)
 
         g.run()
@@ -1,7 +1,14 @@
 import argparse
 
+import pygame
+
+from circle_dance.audio import process, split
+from circle_dance.audio.cache import MAX_BYTES, NoteCache
 from circle_dance.cli.subcommands import BaseSubcommand, classproperty
 from circle_dance.game import Game, modules
+from circle_dance.game.modules.circular_sheet_file import CircularSheet
+
+SEEK_STEP_SEC = 10.0
 
 
 def main():
@@ -37,29 +44,129 @@ class PlaySubcommand(BaseSubcommand):
 
     @staticmethod
     def add_arguments(parser: argparse.ArgumentParser) -> None:
-        parser.add_argument("filename", help="Song to play.")
+        parser.add_argument(
+            "filenames",
+            nargs="+",
+            metavar="filename",
+            help="Song to play; several songs are played one after the other as a playlist.",
+        )
         parser.add_argument("-t", "--threshold", type=float, default=0.75, help="Threshold for note detection.")
         parser.add_argument(
             "--note-type", choices=["dot", "arc", "sarc"], default="dot", help="Type of note to use in visualization."
         )
+        parser.add_argument(
+            "--bands",
+            action="store_true",
+            help="Split the notes into bass, mid, and treble octaves, each shown on its own sheet.",
+        )
+        parser.add_argument(
+            "--sr",
+            type=int,
+            default=None,
+            help="Sampling rate to analyze at, e.g. 22050 for about half the cost; the native rate if not given.",
+        )
+        parser.add_argument(
+            "--chroma-backend",
+            choices=[*process.chroma.BACKENDS, process.chroma.AUTO_BACKEND],
+            default=process.chroma.DEFAULT_BACKEND,
+            help="Transform to compute the chroma with; 'auto' benchmarks them and picks the fastest one.",
+        )
+        parser.add_argument(
+            "--streaming",
+            action="store_true",
+            help="Extract the notes block by block in constant memory, with the same pipeline as `listen`.",
+        )
+        parser.add_argument(
+            "--progressive",
+            action="store_true",
+            help="Start playing right away and analyze the song ahead of the playhead while it plays.",
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of processes to analyze the song with, segment by segment; 0 for all CPUs.",
+        )
+        parser.add_argument(
+            "--track",
+            default=None,
+            help="Note track of the song written by `analyze`, to play instead of analyzing the song. Allows seeking "
+            "with the left and right arrow keys.",
+        )
+        parser.add_argument(
+            "--no-cache", action="store_true", help="Always analyze the song, ignoring the cache of extracted notes."
+        )
+        parser.add_argument(
+            "--cache-size",
+            type=int,
+            default=MAX_BYTES // 2**20,
+            help="Maximum size of the cache of extracted notes in MB; the least recently played songs are evicted.",
+        )
 
     @staticmethod
     def run(args: argparse.Namespace) -> None:
+        if args.track is not None and len(args.filenames) > 1:
+            raise ValueError("a note track can only be played with a single song")
+        filename = args.filenames[0]
+        bands = split.BANDS if args.bands else None
+
         g = Game()
+        cache = None if args.no_cache else NoteCache(max_bytes=args.cache_size * 2**20)
 
-        circular_sheet: modules.BaseModule
+        circular_sheet: CircularSheet
         if args.note_type == "dot":
-            circular_sheet = modules.DotNotesOnCircularSheet(args.filename, threshold=args.threshold)
+            circular_sheet = modules.DotNotesOnCircularSheet(
+                filename,
+                threshold=args.threshold,
+                streaming=args.streaming,
+                progressive=args.progressive,
+                n_jobs=args.jobs or None,
+                cache=cache,
+                track=args.track,
+                bands=bands,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
         elif args.note_type == "sarc":
-            circular_sheet = modules.SimpleArcNotesOnCircularSheet(args.filename, threshold=args.threshold)
+            circular_sheet = modules.SimpleArcNotesOnCircularSheet(
+                filename,
+                threshold=args.threshold,
+                streaming=args.streaming,
+                progressive=args.progressive,
+                n_jobs=args.jobs or None,
+                cache=cache,
+                track=args.track,
+                bands=bands,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
         else:
-            circular_sheet = modules.ArcNotesOnCircularSheet(args.filename, threshold=args.threshold)
-        music_player = modules.MusicPlayer(args.filename)
+            circular_sheet = modules.ArcNotesOnCircularSheet(
+                filename,
+                threshold=args.threshold,
+                streaming=args.streaming,
+                progressive=args.progressive,
+                n_jobs=args.jobs or None,
+                cache=cache,
+                track=args.track,
+                bands=bands,
+                sr=args.sr,
+                chroma_backend=args.chroma_backend,
+            )
+        music_player = modules.MusicPlayer(filename)
 
         circular_sheet.register_callbacks(g)
         music_player.register_callbacks(
             g
         )  # note: order can matter; we want music to start after all other setup / pre-run is done
+        if len(args.filenames) > 1:
+            playlist = modules.Playlist(args.filenames, circular_sheet, music_player)
+            playlist.register_callbacks(g)  # after the music player, to queue the next song once the first one started
+
+        if args.track is not None:
+            g.register_keydown_callback(pygame.K_LEFT, lambda g: g.seek(g.clock - SEEK_STEP_SEC))
+            g.register_keydown_callback(pygame.K_RIGHT, lambda g: g.seek(g.clock + SEEK_STEP_SEC))
 
         g.run()
 
@@ -21,6 +21,7 @@ class Game:
     T_CALLBACK_UPDATE: TypeAlias = __T_CALLBACK_W_CLOCK
     T_CALLBACK_SHOULD_TERMINATE: TypeAlias = Callable[["Game", float], bool]
     T_CALLBACK_KEYDOWN: TypeAlias = __T_CALLBACK_WO_CLOCK
+    T_CALLBACK_SEEK: TypeAlias = __T_CALLBACK_W_CLOCK
 
     def __init__(self) -> None:
         """Game implementation.
@@ -45,6 +46,10 @@ class Game:
         self.__callbacks_update: list[Game.T_CALLBACK_UPDATE] = []
         self.__callbacks_should_terminate: list[Game.T_CALLBACK_SHOULD_TERMINATE] = []
         self.__callbacks_keydown: dict[int, Game.T_CALLBACK_KEYDOWN] = {}
+        self.__callbacks_seek: list[Game.T_CALLBACK_SEEK] = []
+
+        self.start_time = 0.0  # wall time of clock = 0
+        self.clock = 0.0
 
     def run(self) -> None:
         "Run the game."
@@ -53,12 +58,12 @@ class Game:
         [c(self) for c in self.__callbacks_setup]
 
         # Animation loop
-        start_time = time.time()
-        clock = 0.0
+        self.start_time = time.time()
+        self.clock = 0.0
         running = True
 
         # pre-run callbacks
-        [c(self, clock) for c in self.__callbacks_pre_run]
+        [c(self, self.clock) for c in self.__callbacks_pre_run]
 
         while running:
             # exit on ESC and pygame.QUIT
@@ -69,21 +74,21 @@ class Game:
                     self.__callbacks_keydown[event.key](self)  # handle keydown callbacks
 
             # update clock
-            clock = time.time() - start_time
+            self.clock = time.time() - self.start_time
 
             # update by calling update on each module
             # mainly used to update the screen
-            [c(self, clock) for c in self.__callbacks_update]
+            [c(self, self.clock) for c in self.__callbacks_update]
 
             pygame.display.flip()
 
             # check if termination desire signaled by any module
-            if functools.reduce(lambda a, b: a or b, [c(self, clock) for c in self.__callbacks_should_terminate]):
+            if functools.reduce(lambda a, b: a or b, [c(self, self.clock) for c in self.__callbacks_should_terminate]):
                 running = False
 
         # post-run callbacks
-        clock = time.time() - start_time
-        [c(self, clock) for c in self.__callbacks_post_run]
+        self.clock = time.time() - self.start_time
+        [c(self, self.clock) for c in self.__callbacks_post_run]
 
         # teardown
         [c(self) for c in self.__callbacks_teardown]
@@ -110,6 +115,23 @@ class Game:
     def register_keydown_callback(self, key: int, callback: T_CALLBACK_KEYDOWN) -> None:
         self.__callbacks_keydown[key] = callback
 
+    def register_seek_callback(self, callback: T_CALLBACK_SEEK) -> None:
+        self.__callbacks_seek.append(callback)
+
+    def seek(self, clock: float, notify: bool = True) -> None:
+        """Jump the clock to another time, e.g. from a keydown callback, and let the modules follow.
+
+        Args:
+            clock: the new clock time in seconds; clipped to be non-negative
+            notify: whether to call the seek callbacks; e.g. not when the clock restarts for the next song of a
+                playlist, which the modules have already switched to
+        """
+        clock = max(0.0, clock)
+        self.start_time = time.time() - clock
+        self.clock = clock
+        if notify:
+            [c(self, clock) for c in self.__callbacks_seek]
+
     def _setup(self) -> None:
         "Game setup, before the clock starts."
         pygame.init()
@@ -12,9 +12,11 @@ from circle_dance.game.modules.circular_sheet_stream import (
     ArcNotesOnCircularSheetStream,
     CircularSheetStream,
     DotNotesOnCircularSheetStream,
+    MixedNotesOnCircularSheetStream,
     SimpleArcNotesOnCircularSheetStream,
 )
 from circle_dance.game.modules.music_player import MusicPlayer
+from circle_dance.game.modules.playlist import Playlist
 
 __all__ = [
     "BaseModule",
@@ -25,5 +27,7 @@ __all__ = [
     "DotNotesOnCircularSheetStream",
     "ArcNotesOnCircularSheetStream",
     "SimpleArcNotesOnCircularSheetStream",
+    "MixedNotesOnCircularSheetStream",
     "MusicPlayer",
+    "Playlist",
 ]
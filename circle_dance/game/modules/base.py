@@ -45,6 +45,10 @@ class BaseModule(abc.ABC):
         """Request game termination."""
         pass
 
+    def _seek(self, g: Game, clock: float):
+        """Follow a jump of the clock, see `Game.seek`; optional, as most modules only depend on the current clock."""
+        pass
+
     def register_callbacks(self, g: Game):
         """Register the module's callbacks with the game."""
         g.register_setup_callback(self._setup)
@@ -53,3 +57,4 @@ class BaseModule(abc.ABC):
         g.register_post_run_callback(self._post_run)
         g.register_update_callback(self._update)
         g.register_should_terminate_callback(self._should_terminate)
+        g.register_seek_callback(self._seek)
@@ -1,15 +1,47 @@
+import logging
+import threading
+import time
+from typing import Callable
+
 import librosa
+import numpy as np
+import numpy.typing as npt
 
-from circle_dance.audio.process import extract_note_durations, extract_note_onsets
+from circle_dance.audio import process, split
+from circle_dance.audio.cache import NoteCache
+from circle_dance.audio.process import extract_notes_multi
+from circle_dance.audio.read import NoteBatchQueue, StreamStats, callbacks
+from circle_dance.audio.read.file import extract_notes_from_file, file_reader
+from circle_dance.audio.read.stream import T_CALLBACK_PROCESS_BUFFER
+from circle_dance.audio.track import NoteTrack
 from circle_dance.game import Game
 from circle_dance.game.modules import BaseModule
 from circle_dance.visualize import circular_sheet
 
+logger = logging.getLogger(__name__)
+
 
 class CircularSheet(BaseModule):
     "Base class for all notes on a circular sheet parsed from a file."
 
-    def __init__(self, fn: str, threshold: float = 0.75, n_clones: int = 1):
+    NOTES = "durations"  # the notes the note pool draws, "onsets" or "durations"
+
+    def __init__(
+        self,
+        fn: str,
+        threshold: float = 0.75,
+        n_clones: int = 1,
+        streaming: bool = False,
+        progressive: bool = False,
+        lead_sec: float = 3.0,
+        max_ahead_sec: float = 30.0,
+        n_jobs: int | None = 1,
+        cache: NoteCache | None = None,
+        track: str | None = None,
+        bands: split.T_BANDS | None = None,
+        sr: int | None = None,
+        chroma_backend: str = process.chroma.DEFAULT_BACKEND,
+    ):
         """Module that parses an audio file and animate it's notes on a circular sheet.
 
         Best combined with the `MusicPlayer` module to play the audio while the notes are animated
@@ -18,18 +50,68 @@ class CircularSheet(BaseModule):
             fn: the song file
             threshold: the chroma energy threshold for considering a note as active; between 0 and 1
             n_clones: number of times to clone the song to produce multiple sheets in the visualization
+            streaming: extract the notes block by block with the live stream's pipeline, in constant memory, instead of
+                loading and analyzing the whole song at once
+            progressive: like `streaming`, but analyze in a background thread while the song plays; the setup only
+                waits for the first `lead_sec` to be analyzed, hence the time to the first frame doesn't depend on the
+                length of the song
+            lead_sec: seconds of the song to analyze before the setup returns, in progressive mode
+            max_ahead_sec: maximum seconds to analyze ahead of the playhead, in progressive mode
+            n_jobs: number of processes to analyze the whole song with, segment by segment; all CPUs if None
+            cache: where to look up the notes before analyzing the song, and to store them after; not cached if None
+            track: a note track of the song (see `circle_dance analyze`) to play instead of analyzing the song; the
+                notes are memory-mapped and fed to the canvas just in time, and the only mode that supports seeking
+            bands: split the notes into these octave bands (see `split.BANDS`), each shown on its own sheet; all bands
+                are folded from one shared CQT
+            sr: the sampling rate to analyze the song at, e.g. 22050 to halve the cost of the analysis; the song is
+                resampled on load, or block by block in streaming and progressive mode, with the same polyphase filter
+                (see `process.StreamingResampler`); the frames keep their 512 samples, hence get coarser in time; the
+                native sampling rate if None
+            chroma_backend: the chroma backend, see `process.get_cqt_plan`; "auto" picks the fastest one on this
+                machine for the song, resp. for the blocks in streaming and progressive mode
         """
         assert threshold > 0 and threshold <= 1, "threshold must be between 0 and 1"
         assert n_clones > 0, "n_clones must be greater than 0"
+        assert bands is None or n_clones == 1, "octave bands can't be cloned"
+        assert sr is None or sr > 0, "sr must be greater than 0"
 
         self.fn = fn
         self.threshold = threshold
         self.n_clones = n_clones
+        self.streaming = streaming
+        self.progressive = progressive
+        self.lead_sec = lead_sec
+        self.max_ahead_sec = max_ahead_sec
+        self.n_jobs = n_jobs
+        self.cache = cache
+        self.track = track
+        self.bands = bands
+        self.sr = sr
+        self.chroma_backend = chroma_backend
 
         self.canvas: circular_sheet.Canvas
 
+        # progressive mode
+        self.clock = 0.0  # playhead, read by the analysis thread
+        self.thread: threading.Thread | None = None
+        self.close_request_event = threading.Event()
+        self.queue = NoteBatchQueue()
+        self.stats = StreamStats()
+        self.pending = np.empty((0, 4))  # analyzed notes not yet added to the canvas, sorted by onset
+
+        # note track mode
+        self.note_track: NoteTrack | None = None
+        self.cursor = 0  # first row of the note track not yet added to the canvas
+
+    @property
+    def n_sheets(self) -> int:
+        "Number of sheets on the canvas: one per clone, or one per octave band."
+        return self.n_clones if self.bands is None else len(self.bands)
+
     def _teardown(self, g: Game):
-        pass
+        self._stop_thread()
+        if self.note_track is not None:
+            self.note_track.close()
 
     def _pre_run(self, g: Game, clock: float):
         pass
@@ -39,60 +121,293 @@ class CircularSheet(BaseModule):
 
     def _update(self, g: Game, clock: float):
         "Draw the complete scene onto the screen."
+        self.clock = clock
+        if self.thread is not None or len(self.pending) > 0:
+            self._feed_notes(clock)
+        if self.note_track is not None:
+            self._feed_track(clock)
         self.canvas.draw(clock)
 
+    def _seek(self, g: Game, clock: float):
+        "Replace the notes on the canvas by the ones alive at the new clock time; note track mode only."
+        if self.note_track is None:
+            return
+        self.canvas.clear_notes()
+        lifetime = circular_sheet.config.rotation_period - 1
+        self.cursor = self.note_track.seek(clock - lifetime - self.note_track.max_duration)
+        self._feed_track(clock)
+
     def _should_terminate(self, g: Game, clock: float) -> bool:
         "Will never request the game to terminate."
         return False
 
+    def _stop_thread(self):
+        if self.thread is not None:
+            self.close_request_event.set()
+            self.thread.join(timeout=2)  # maximum time in seconds to wait for thread to terminate itself
+            self.thread = None
+
+    def extract_song(self, fn: str) -> npt.NDArray:
+        """Extract the notes of a song with the module's settings, from the cache if possible.
+
+        Doesn't touch the canvas, hence can run in a background thread, e.g. to prefetch the next song of a playlist.
+        Songs are analyzed as a whole, or block by block in streaming and progressive mode.
+
+        Returns:
+            the notes; shape=(N, 4)
+        """
+        extract: Callable[[], npt.NDArray]
+        if self.streaming or self.progressive:
+            callback = self._make_callback()
+            extractor = self._extractor(type(callback).__name__)
+            extract = lambda: extract_notes_from_file(self._resampling(callback), fn)  # noqa: E731
+        else:
+            extractor = self._extractor(self.NOTES)
+
+            def extract() -> npt.NDArray:
+                y, sr = self._load(fn)
+                return self._extract_signals([y], sr)[0]
+
+        if self.cache is None:
+            return extract()
+        return self.cache.get_or_extract(fn, extractor, self.threshold, extract)
+
+    def switch_song(self, fn: str, notes: npt.NDArray):
+        """Replace the notes on the canvas by the notes of another song, e.g. the next song of a playlist.
+
+        The notes are added to the canvas just in time, hence switching takes constant time. The clock is expected to
+        start over for the new song.
+
+        Args:
+            fn: the new song file
+            notes: the notes of the new song, e.g. from `extract_song`; shape=(N, 4)
+        """
+        self._stop_thread()  # progressive analysis of the previous song
+        self.queue.drain()
+        self.fn = fn
+        self.canvas.clear_notes()
+        self.pending = notes[np.argsort(notes[:, 1], kind="stable")]
+
+    def _setup_streaming(self, g: Game, note_pool: type[circular_sheet.NotePool], callback: T_CALLBACK_PROCESS_BUFFER):
+        "Setup the visualization with the notes extracted block by block by the stream callback."
+        self.canvas = circular_sheet.Canvas(g.screen, self.n_sheets, note_pool)
+        extractor = self._extractor(type(callback).__name__)
+
+        key: str | None = None
+        if self.progressive and self.cache is not None:
+            key = self.cache.key(self.fn, extractor, self.threshold)
+            notes = self.cache.get(key)
+            if notes is not None:  # nothing left to analyze
+                logger.info("loaded %d notes from the cache", len(notes))
+                return self._add_notes(notes)
+
+        if self.progressive:
+            self.thread = threading.Thread(
+                target=self._analyze_progressively, args=(self._resampling(callback), key), daemon=True
+            )
+            self.thread.start()
+
+            # wait for the start of the song only
+            t = time.perf_counter()
+            while self.stats.analyzed_sec < self.lead_sec and self.thread.is_alive():
+                time.sleep(0.01)
+            logger.info("analyzed the first %.1fs in %.2fs", self.stats.analyzed_sec, time.perf_counter() - t)
+            return
+
+        callback = self._resampling(callback)
+        if self.cache is None:
+            notes = extract_notes_from_file(callback, self.fn)
+        else:
+            notes = self.cache.get_or_extract(
+                self.fn, extractor, self.threshold, lambda: extract_notes_from_file(callback, self.fn)
+            )
+        self._add_notes(notes)
+
+    def _analyze_progressively(self, callback: T_CALLBACK_PROCESS_BUFFER, key: str | None):
+        """Analyze the song block by block, ahead of the playhead; run in a background thread.
+
+        Hands over the notes of each buffer to the queue, and stores all notes in the cache under `key` once the whole
+        song has been analyzed, like `extract_notes_from_file` in streaming mode. Not cached if `key` is None, or if
+        the analysis is stopped early.
+        """
+        batches: list[npt.NDArray] = []
+
+        def put_items(items: npt.NDArray):
+            self.queue.put(items)
+            if key is not None and len(items) > 0:
+                batches.append(items)
+
+        file_reader(
+            callback,
+            self.fn,
+            put_items,
+            self.close_request_event,
+            buffer_replenish_multiplier=16,
+            stats=self.stats,
+            playhead=lambda: self.clock,
+            max_ahead_sec=self.max_ahead_sec,
+        )
+        if key is not None and self.cache is not None and not self.close_request_event.is_set():
+            self.cache.put(key, np.concatenate(batches) if len(batches) > 0 else np.empty((0, 4), dtype=np.float32))
+
+    def _setup_track(self, g: Game, note_pool: type[circular_sheet.NotePool], durations: bool):
+        "Setup the visualization with the notes of the note track, which are added to the canvas just in time."
+        self.canvas = circular_sheet.Canvas(g.screen, self.n_sheets, note_pool)
+        assert self.track is not None
+        if self.bands is not None:
+            raise ValueError("note tracks hold the notes of the whole song, not of octave bands")
+
+        self.note_track = NoteTrack(self.track)
+        if durations and self.note_track.metadata.get("notes") != "durations":
+            raise ValueError(f"{self.track} holds note onsets, but {type(self).__name__} requires note durations")
+        logger.info("opened note track %s with %d notes", self.track, len(self.note_track))
+
+    def _feed_track(self, clock: float):
+        "Add the notes of the note track to the canvas once their onset has passed."
+        assert self.note_track is not None
+        n_due = self.note_track.seek(clock)
+        if n_due > self.cursor:
+            self._add_notes(self.note_track[self.cursor : n_due])
+            self.cursor = n_due
+
+    def _add_notes(self, notes: npt.NDArray):
+        for i in range(self.n_clones):
+            self._add_clone_notes(i, notes)
+
+    def _add_clone_notes(self, clone: int, notes: npt.NDArray):
+        "Add the notes of a clone to its sheet, or with octave bands, each note to the sheet of its band."
+        if self.bands is None:
+            sheet_ids = np.full(len(notes), clone)
+        else:
+            sheet_ids, notes = split.split_band_notes(notes)
+        for sheet_id, (note, onset, conclusion, energy) in zip(sheet_ids.tolist(), notes.tolist()):
+            self.canvas.add_note(int(sheet_id), int(note), onset, conclusion, energy)
+
+    def _feed_notes(self, clock: float):
+        "Add the analyzed notes to the canvas just in time, i.e. once their onset has passed."
+        notes = self.queue.drain()
+        if len(notes) > 0:
+            self.pending = np.concatenate([self.pending, notes])
+            self.pending = self.pending[np.argsort(self.pending[:, 1], kind="stable")]
+
+        n_due = np.searchsorted(self.pending[:, 1], clock)
+        if n_due > 0:
+            self._add_notes(self.pending[:n_due])
+            self.pending = self.pending[n_due:]
+
+    def _extract_notes(self) -> list[npt.NDArray]:
+        """The notes of each clone, from the cache if possible, else extracted from the loaded song.
+
+        The signals of all clones are analyzed at once, identical ones only once, see `extract_notes_multi`.
+        """
+        if self.cache is not None:
+            key = self.cache.key(self.fn, self._extractor(self.NOTES), self.threshold)
+            notes = self.cache.get(key)
+            if notes is not None:
+                logger.info("loaded %d notes from the cache", len(notes))
+                return [notes] * self.n_clones
+
+        ys, sr = self._load_audio()
+        notes_per_clone = self._extract_signals(ys, sr)
+        if self.cache is not None:
+            self.cache.put(key, notes_per_clone[0])
+        return notes_per_clone
+
+    def _extract_signals(self, ys: list[npt.NDArray], sr: float) -> list[npt.NDArray]:
+        "The notes of each signal, see `extract_notes_multi`; with octave bands, see `split.extract_octave_band_notes`."
+        if self.bands is None:
+            return extract_notes_multi(
+                ys, sr, notes=self.NOTES, threshold=self.threshold, n_jobs=self.n_jobs, backend=self.chroma_backend
+            )
+        return [
+            split.extract_octave_band_notes(
+                y, sr, notes=self.NOTES, bands=self.bands, threshold=self.threshold, backend=self.chroma_backend
+            )
+            for y in ys
+        ]
+
+    def _extractor(self, name: str) -> str:
+        "The extractor in the cache keys, which includes the octave bands, the analysis sampling rate, and the backend."
+        if self.bands is not None:
+            name += "-bands" + "".join(f"-{first}{stop}" for first, stop in self.bands)
+        if self.sr is not None:
+            name += f"-sr{self.sr}"
+        if self.chroma_backend != process.chroma.DEFAULT_BACKEND:
+            name += f"-{self.chroma_backend}"
+        return name
+
+    def _make_callback(self) -> T_CALLBACK_PROCESS_BUFFER:
+        "The stream callback extracting the module's notes block by block."
+        if self.NOTES == "onsets":
+            return callbacks.StreamingNoteOnsetsCallback(
+                threshold=self.threshold, bands=self.bands, backend=self.chroma_backend
+            )
+        return callbacks.StreamingNoteDurationsCallback(
+            threshold=self.threshold, bands=self.bands, backend=self.chroma_backend
+        )
+
+    def _resampling(self, callback: T_CALLBACK_PROCESS_BUFFER) -> T_CALLBACK_PROCESS_BUFFER:
+        "The stream callback analyzing at the analysis sampling rate, see `callbacks.ResamplingCallback`."
+        if self.sr is None:
+            return callback
+        return callbacks.ResamplingCallback(callback, self.sr)
+
+    def _load(self, fn: str) -> tuple[npt.NDArray, float]:
+        "Load a song at the analysis sampling rate, with the polyphase filter of the streaming resampler."
+        return librosa.load(fn, sr=self.sr, res_type="polyphase")  # sr = None means using native sampling rate
+
     def _load_audio(self):
         # load song data
-        y, sr = librosa.load(self.fn, sr=None)  # sr = None means using native sampling rate
+        y, sr = self._load(self.fn)
         ys = [y] * self.n_clones  # fake multi-stem data by cloning
         return ys, sr
 
 
 class DotNotesOnCircularSheet(CircularSheet):
+    NOTES = "onsets"
 
     def _setup(self, g: Game):
         """Parse audio and setup the visualization and note pool."""
-        ys, sr = self._load_audio()
+        if self.track is not None:
+            return self._setup_track(g, circular_sheet.DotNotePool, durations=False)
+        if self.streaming or self.progressive:
+            return self._setup_streaming(g, circular_sheet.DotNotePool, self._make_callback())
 
         # Init canvas
-        self.canvas = circular_sheet.Canvas(g.screen, len(ys), circular_sheet.DotNotePool)
+        self.canvas = circular_sheet.Canvas(g.screen, self.n_sheets, circular_sheet.DotNotePool)
 
         # Extract note onsets
-        for i in range(len(ys)):
-            note_onsets = extract_note_onsets(ys[i], sr, threshold=self.threshold)
-            for note, onset, conclusion, energy in note_onsets:
-                self.canvas.add_note(i, int(note), onset, conclusion, energy)
+        for i, notes in enumerate(self._extract_notes()):
+            self._add_clone_notes(i, notes)
 
 
 class SimpleArcNotesOnCircularSheet(CircularSheet):
     def _setup(self, g: Game):
         """Parse audio and setup the visualization and note pool."""
-        ys, sr = self._load_audio()
+        if self.track is not None:
+            return self._setup_track(g, circular_sheet.SimpleArcNotePool, durations=True)
+        if self.streaming or self.progressive:
+            return self._setup_streaming(g, circular_sheet.SimpleArcNotePool, self._make_callback())
 
         # Init canvas
-        self.canvas = circular_sheet.Canvas(g.screen, len(ys), circular_sheet.SimpleArcNotePool)
+        self.canvas = circular_sheet.Canvas(g.screen, self.n_sheets, circular_sheet.SimpleArcNotePool)
 
         # Extract note onsets
-        for i in range(len(ys)):
-            note_onsets = extract_note_durations(ys[i], sr, thr=self.threshold)
-            for note, onset, conclusion, energy in note_onsets:
-                self.canvas.add_note(i, int(note), onset, conclusion, energy)
+        for i, notes in enumerate(self._extract_notes()):
+            self._add_clone_notes(i, notes)
 
 
 class ArcNotesOnCircularSheet(CircularSheet):
     def _setup(self, g: Game):
         """Parse audio and setup the visualization and note pool."""
-        ys, sr = self._load_audio()
+        if self.track is not None:
+            return self._setup_track(g, circular_sheet.ArcNotePool, durations=True)
+        if self.streaming or self.progressive:
+            return self._setup_streaming(g, circular_sheet.ArcNotePool, self._make_callback())
 
         # Init canvas
-        self.canvas = circular_sheet.Canvas(g.screen, len(ys), circular_sheet.ArcNotePool)
+        self.canvas = circular_sheet.Canvas(g.screen, self.n_sheets, circular_sheet.ArcNotePool)
 
         # Extract note onsets
-        for i in range(len(ys)):
-            note_onsets = extract_note_durations(ys[i], sr, thr=self.threshold)
-            for note, onset, conclusion, energy in note_onsets:
-                self.canvas.add_note(i, int(note), onset, conclusion, energy)
+        for i, notes in enumerate(self._extract_notes()):
+            self._add_clone_notes(i, notes)
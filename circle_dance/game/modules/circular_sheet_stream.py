@@ -1,43 +1,160 @@
 import logging
 import threading
 from abc import ABC, abstractmethod
-from queue import Empty, Queue
 
-from circle_dance.audio.read import callbacks, stream_reader
+import numpy as np
+
+from circle_dance.audio import process, split
+from circle_dance.audio.read import (
+    NoteBatchQueue,
+    StreamAnalysisProcess,
+    StreamStats,
+    callbacks,
+    stream,
+    stream_reader,
+)
+from circle_dance.audio.read.note_events import NOTE_CLOSE
 from circle_dance.game import Game
 from circle_dance.game.modules import BaseModule
 from circle_dance.visualize import circular_sheet
 
 logger = logging.getLogger(__name__)
 
+MIN_EXTEND_SEC = 0.05  # report the conclusion of a sounding note once it moved by this much, see `NoteTracker`
+
 
 class CircularSheetStream(BaseModule, ABC):
     "Base class for all notes on a circular sheet parsed from a stream."
 
-    def __init__(self, threshold: float = 0.99, n_clones: int = 1):
+    NOTE_EVENTS = False  # whether the callback reports note durations, which are tracked across buffers as note events
+    BUFFER_REPLENISH_MULTIPLIER = 1  # the stream reader's cadence, in chunks, see `stream_reader`
+    BUFFER_CARRYOVER_MULTIPLIER = 20  # the stream reader's carryover, in chunks, see `stream_reader`
+
+    def __init__(
+        self,
+        threshold: float = 0.99,
+        n_clones: int = 1,
+        shedding_policy: str = "none",
+        max_lag_sec: float = 0.1,
+        worker: str = "thread",
+        bands: split.T_BANDS | None = None,
+        hpss: bool = False,
+        sr: int | None = None,
+        chroma_backend: str = process.chroma.DEFAULT_BACKEND,
+    ):
         """Module that parses the OS's default input stream and animate it's notes on a circular sheet.
 
-        Uses a thread to process the stream for faster processing.
+        Uses a thread to process the stream for faster processing. With `worker="process"`, the analysis runs in a
+        worker process instead (see `StreamAnalysisProcess`), such that it uses another core and doesn't compete with
+        the render loop for the GIL.
 
         Args:
             threshold: the energy threshold for considering a note as active; between 0 and 1
             n_clones: number of times to clone the song to produce multiple sheets in the visualization
+            shedding_policy: how to keep the latency bounded when the analysis falls behind; see `stream_reader`
+            max_lag_sec: the lag of the analysis above which the shedding policy applies
+            worker: "thread" or "process"; where to run the analysis
+            bands: split the notes into these octave bands (see `split.BANDS`), each shown on its own sheet; all bands
+                are folded from one shared CQT
+            hpss: separate the harmonic and the percussive part of the stream (see `callbacks.StreamingHPSSCallback`),
+                each shown on its own sheet
+            sr: the sampling rate to analyze the stream at, e.g. 22050 to halve the cost of the analysis (see
+                `callbacks.ResamplingCallback`); the frames keep their 512 samples, hence get coarser in time; the
+                capture rate if None
+            chroma_backend: the chroma backend, see `process.get_cqt_plan`; "auto" benchmarks the backends during the
+                setup and picks the fastest one for the buffers of the stream
         """
         assert threshold > 0 and threshold <= 1, "threshold must be between 0 and 1"
         assert n_clones > 0, "n_clones must be greater than 0"
+        assert (
+            shedding_policy in stream.SHEDDING_POLICIES
+        ), f"shedding_policy must be one of {stream.SHEDDING_POLICIES}"
+        assert worker in ("thread", "process"), "worker must be 'thread' or 'process'"
+        assert bands is None or not hpss, "octave bands and harmonic/percussive separation can't be combined"
+        assert sr is None or sr > 0, "sr must be greater than 0"
 
         self.threshold = threshold
         self.n_clones = n_clones  # !TBD: Currently not used. Implement?
+        self.shedding_policy = shedding_policy
+        self.max_lag_sec = max_lag_sec
+        self.worker = worker
+        self.bands = bands
+        self.hpss = hpss
+        self.sr = sr
+        self.chroma_backend = chroma_backend
         self.thread: threading.Thread
         self.close_request_event: threading.Event
-        self.queue: Queue
+        self.queue: NoteBatchQueue
+        self.analysis: StreamAnalysisProcess
+        self.stats = StreamStats()  # health of the audio stream, updated by the capture and the reader thread
+
+    @property
+    def n_sheets(self) -> int:
+        "Number of sheets on the canvas: one, one per octave band, or one per harmonic and percussive part."
+        if self.hpss:
+            return 2
+        return 1 if self.bands is None else len(self.bands)
+
+    @property
+    def lag_sec(self) -> float:
+        "Seconds of captured audio the analysis is behind real time."
+        return self.stats.lag_sec
 
     @abstractmethod
-    def start_subprocess(self):
-        "Start the thread that reads the stream and adds notes to the queue."
+    def make_callback(self) -> stream.T_CALLBACK_PROCESS_BUFFER:
+        "Create the callback that extracts the notes from each buffer of the stream."
         pass
 
+    def make_stream_callback(self) -> stream.T_CALLBACK_PROCESS_BUFFER:
+        "Create the callback of the stream reader: the note callback, or one per part of the separated stream."
+        callback = self.make_callback()
+        if self.hpss:
+            callback = callbacks.StreamingHPSSCallback(callback, self.make_callback())
+        if self.sr is not None and self.sr != stream.RATE:
+            callback = callbacks.ResamplingCallback(callback, self.sr)
+        if self.NOTE_EVENTS:  # outermost, as the note ids of all sheets are known here
+            callback = callbacks.NoteEventsCallback(
+                callback, min_extend_sec=MIN_EXTEND_SEC, skip_unchanged_closes=True
+            )
+        return callback
+
+    def start_subprocess(self):
+        "Start the thread (or process) that reads the stream and adds notes to the queue."
+        if self.worker == "process":
+            self.analysis = StreamAnalysisProcess(
+                self.make_stream_callback(),
+                self.BUFFER_REPLENISH_MULTIPLIER,
+                self.BUFFER_CARRYOVER_MULTIPLIER,
+                shedding_policy=self.shedding_policy,
+                max_lag_sec=self.max_lag_sec,
+                stats=self.stats,
+            )
+            self.analysis.start()
+            return
+
+        self.queue = NoteBatchQueue()  # queue for notes, one batch per buffer
+        self.close_request_event = threading.Event()
+        self.thread = threading.Thread(
+            target=stream_reader,
+            args=(
+                self.make_stream_callback(),
+                self.queue,
+                self.close_request_event,
+                self.BUFFER_REPLENISH_MULTIPLIER,
+                self.BUFFER_CARRYOVER_MULTIPLIER,
+                "callback",  # capture_mode
+                self.stats,
+                self.shedding_policy,
+                self.max_lag_sec,
+            ),
+        )
+        self.thread.start()
+
     def stop_subprocess(self):
+        if self.worker == "process":
+            self.analysis.stop()
+            return
+
         if self.thread.is_alive():
             self.close_request_event.set()
             self.thread.join(timeout=2)  # maximum time in seconds to wait for subprocess to terminate itself
@@ -46,10 +163,19 @@ class CircularSheetStream(BaseModule, ABC):
         # self.thread.close()
 
     def _setup(self, g: Game):
-        self.canvas = circular_sheet.Canvas(g.screen, n_sheets=1, note_pool=circular_sheet.DotNotePool)
+        self._warm_up()
+        self.canvas = circular_sheet.Canvas(g.screen, n_sheets=self.n_sheets, note_pool=circular_sheet.DotNotePool)
+
+    def _warm_up(self):
+        "Prepare the CQT kernels before the clock starts, so that the first buffers stay within the real-time budget."
+        if self.chroma_backend != process.chroma.AUTO_BACKEND:
+            process.warm_up_cqt_plans(self.sr or stream.RATE, backend=self.chroma_backend)
+        # a throwaway callback on silence, which picks the fastest chroma backend with "auto" like the analysis will
+        self.make_stream_callback()(np.zeros(stream.RATE, dtype=np.int16), stream.RATE, 0.0, 0, 0.0)
 
     def _teardown(self, g: Game):
         self.stop_subprocess()
+        logger.info("stream stats: %s", self.stats)
 
     def _pre_run(self, g: Game, clock: float):
         self.start_subprocess()
@@ -63,19 +189,27 @@ class CircularSheetStream(BaseModule, ABC):
         conclusion: float
         energy: float
 
-        # read all pending notes from the queue and add to canvas
-        while not self.queue.empty():
-            try:
-                note, onset, conclusion, energy = self.queue.get_nowait()
-                self.canvas.add_note(0, int(note), onset, conclusion, energy)
-            except Empty:
-                pass
+        # read all pending notes from the queue (or the worker process) and add to canvas
+        notes = self.analysis.drain() if self.worker == "process" else self.queue.drain()
+        sheet_ids = np.zeros(len(notes), dtype=int)
+        if self.n_sheets > 1:
+            sheet_ids, notes = split.split_band_notes(notes)
+        if self.NOTE_EVENTS:
+            for sheet_id, (note, onset, conclusion, energy, note_uid, event) in zip(
+                sheet_ids.tolist(), notes.tolist()
+            ):
+                self.canvas.update_note(
+                    int(sheet_id), int(note_uid), int(note), onset, conclusion, energy, final=event == NOTE_CLOSE
+                )
+        else:
+            for sheet_id, (note, onset, conclusion, energy) in zip(sheet_ids.tolist(), notes.tolist()):
+                self.canvas.add_note(int(sheet_id), int(note), onset, conclusion, energy)
 
         # draw canvas
         self.canvas.draw(clock)
 
     def _should_terminate(self, g: Game, clock: float) -> bool:
-        if not self.thread.is_alive():
+        if not (self.analysis.is_alive() if self.worker == "process" else self.thread.is_alive()):
             logger.warn("notes_producer subprocess died; signaling game to terminate")
             return True
         return False
@@ -83,34 +217,83 @@ class CircularSheetStream(BaseModule, ABC):
 
 class DotNotesOnCircularSheetStream(CircularSheetStream):
 
-    def start_subprocess(self):
-        self.queue = Queue()  # queue for notes
-        self.close_request_event = threading.Event()
-        self.thread = threading.Thread(
-            target=stream_reader,
-            args=(callbacks.extract_node_onsets_callback, self.queue, self.close_request_event, 5, 20),
-            # buffer_replenish_multiplier, buffer_carryover_multiplier
+    def make_callback(self) -> stream.T_CALLBACK_PROCESS_BUFFER:
+        return callbacks.StreamingNoteOnsetsCallback(
+            threshold=self.threshold, bands=self.bands, backend=self.chroma_backend
         )
-        self.thread.start()
 
 
 class SimpleArcNotesOnCircularSheetStream(CircularSheetStream):
 
-    def start_subprocess(self):
-        self.queue = Queue()  # queue for notes
-        self.close_request_event = threading.Event()
-        self.thread = threading.Thread(
-            target=stream_reader,
-            args=(callbacks.extract_note_durations_callback, self.queue, self.close_request_event, 1, 20),
-            # buffer_replenish_multiplier, buffer_carryover_multiplier
+    NOTE_EVENTS = True
+
+    def make_callback(self) -> stream.T_CALLBACK_PROCESS_BUFFER:
+        return callbacks.StreamingNoteDurationsCallback(
+            threshold=self.threshold, bands=self.bands, backend=self.chroma_backend
         )
-        self.thread.start()
 
     def _setup(self, g: Game):
-        self.canvas = circular_sheet.Canvas(g.screen, n_sheets=1, note_pool=circular_sheet.SimpleArcNotePool)
+        self._warm_up()
+        self.canvas = circular_sheet.Canvas(
+            g.screen, n_sheets=self.n_sheets, note_pool=circular_sheet.SimpleArcNotePool
+        )
 
 
 class ArcNotesOnCircularSheetStream(CircularSheetStream):
 
+    NOTE_EVENTS = True
+
+    def make_callback(self) -> stream.T_CALLBACK_PROCESS_BUFFER:
+        return callbacks.StreamingNoteDurationsCallback(
+            threshold=self.threshold, bands=self.bands, backend=self.chroma_backend
+        )
+
     def _setup(self, g: Game):
-        self.canvas = circular_sheet.Canvas(g.screen, n_sheets=1, note_pool=circular_sheet.ArcNotePool)
+        self._warm_up()
+        self.canvas = circular_sheet.Canvas(g.screen, n_sheets=self.n_sheets, note_pool=circular_sheet.ArcNotePool)
+
+
+class MixedNotesOnCircularSheetStream(CircularSheetStream):
+    "Note onsets as dots and note durations as arcs, each on its own sheet, analyzed from one capture."
+
+    NOTE_EVENTS = True
+    BUFFER_CARRYOVER_MULTIPLIER = 0  # the scheduler keeps the samples each analyzer needs
+
+    ONSETS_REPLENISH_MULTIPLIER = 1  # low latency for the onsets
+    DURATIONS_REPLENISH_MULTIPLIER = 4  # the durations are only extended, hence less urgent
+
+    @property
+    def n_sheets(self) -> int:
+        "Number of sheets on the canvas: one for the onsets, one for the durations."
+        return 2
+
+    def make_callback(self) -> stream.T_CALLBACK_PROCESS_BUFFER:
+        "Create the scheduler running both analyzers on one capture, sharing their CQT frames."
+        assert self.bands is None and not self.hpss, "octave bands and harmonic/percussive separation aren't supported"
+        shared_cqt = callbacks.SharedStreamingCQT(backend=self.chroma_backend)
+        return callbacks.AnalysisScheduler(
+            [
+                (
+                    callbacks.StreamingNoteOnsetsCallback(
+                        threshold=self.threshold, backend=self.chroma_backend, shared_cqt=shared_cqt
+                    ),
+                    self.ONSETS_REPLENISH_MULTIPLIER,
+                    0,
+                ),
+                (
+                    callbacks.StreamingNoteDurationsCallback(
+                        threshold=self.threshold, backend=self.chroma_backend, shared_cqt=shared_cqt
+                    ),
+                    self.DURATIONS_REPLENISH_MULTIPLIER,
+                    0,
+                ),
+            ]
+        )
+
+    def _setup(self, g: Game):
+        self._warm_up()
+        self.canvas = circular_sheet.Canvas(
+            g.screen,
+            n_sheets=self.n_sheets,
+            note_pool=[circular_sheet.DotNotePool, circular_sheet.SimpleArcNotePool],
+        )
@@ -1,8 +1,12 @@
+import logging
+
 import pygame
 
 from circle_dance.game import Game
 from circle_dance.game.modules import BaseModule
 
+logger = logging.getLogger(__name__)
+
 
 class MusicPlayer(BaseModule):
 
@@ -43,6 +47,13 @@ class MusicPlayer(BaseModule):
     def _update(self, g: Game, clock: float):
         pass
 
+    def _seek(self, g: Game, clock: float):
+        """Continue playing from the new clock time."""
+        try:
+            pygame.mixer.music.play(start=clock)
+        except pygame.error as e:  # not all formats support positioning
+            logger.warning("cannot seek in %s: %s", self.fn, e)
+
     def _should_terminate(self, g: Game, clock: float) -> bool:
         """Check if the game should terminate because the music has finished."""
         return not pygame.mixer.music.get_busy()
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+
+import librosa
+import numpy.typing as npt
+import pygame
+
+from circle_dance.game import Game
+from circle_dance.game.modules import BaseModule
+from circle_dance.game.modules.circular_sheet_file import CircularSheet
+from circle_dance.game.modules.music_player import MusicPlayer
+
+logger = logging.getLogger(__name__)
+
+
+class Playlist(BaseModule):
+
+    def __init__(self, fns: list[str], sheet: CircularSheet, music_player: MusicPlayer):
+        """Playlist module.
+
+        Plays songs one after the other in the same game, on the same canvas. While a song plays, the next song is
+        analyzed in a background thread (see `CircularSheet.extract_song`) and queued in the mixer, which continues
+        with it without a gap. At the end of the song, the sheet switches to the prefetched notes (see
+        `CircularSheet.switch_song`) and the game clock starts over. If the next song is still being analyzed, the
+        sheet keeps drawing the previous song until it's done, and then catches up with the mixer. Songs that fail to
+        analyze, e.g. unsupported files, are skipped; the playlist ends early if none of the remaining songs can be
+        analyzed.
+
+        Register its callbacks after the ones of the sheet and the music player, which must be set up with the first
+        song.
+
+        Args:
+            fns: the song files, in playing order
+            sheet: the sheet module visualizing the songs
+            music_player: the music player module playing the songs
+        """
+        assert len(fns) > 0, "at least one song is required"
+
+        self.fns = fns
+        self.sheet = sheet
+        self.music_player = music_player
+
+        self.index = 0  # position of the current song in the playlist
+        self.duration = 0.0  # duration of the current song in seconds
+
+        # prefetch of the next song
+        self.thread: threading.Thread | None = None
+        self.next_index: int | None = None  # position of the prefetched song; None if no song could be analyzed
+        self.next_notes: npt.NDArray | None = None
+        self.next_duration = 0.0
+        self.queued_index: int | None = None  # position of the song queued in the mixer
+        self.warned_late = False  # whether the late analysis of the next song has been logged
+
+    def _prefetch(self, start: int):
+        "Analyze the next song that can be analyzed, from position `start` on; run in a background thread."
+        for index in range(start, len(self.fns)):
+            fn = self.fns[index]
+            t = time.perf_counter()
+            try:
+                duration = librosa.get_duration(path=fn)
+                notes = self.sheet.extract_song(fn)
+            except Exception:
+                logger.exception("failed to analyze %s; skipping it", fn)
+                continue
+            logger.info("prefetched %d notes of %s in %.2fs", len(notes), fn, time.perf_counter() - t)
+            self.next_duration = duration
+            self.next_notes = notes
+            self.next_index = index
+            return
+
+    def _start_prefetch(self):
+        "Start analyzing the songs after the current one, if any."
+        if self.index + 1 >= len(self.fns):
+            return
+        self.next_index = None
+        self.next_notes = None
+        self.thread = threading.Thread(target=self._prefetch, args=(self.index + 1,), daemon=True)
+        self.thread.start()
+
+    def _queue(self, index: int):
+        "Queue a song in the mixer, to continue with it without a gap."
+        try:
+            pygame.mixer.music.queue(self.fns[index])
+            self.queued_index = index
+        except pygame.error as e:
+            logger.warning("cannot queue %s: %s", self.fns[index], e)
+            self.queued_index = None
+
+    def _setup(self, g: Game):
+        """Start prefetching the second song."""
+        self.duration = librosa.get_duration(path=self.fns[0])
+        self._start_prefetch()
+
+    def _teardown(self, g: Game):
+        pass  # a running analysis can't be interrupted; its daemon thread ends with the game
+
+    def _pre_run(self, g: Game, clock: float):
+        """Queue the second song in the mixer, as the music player has just started the first one."""
+        if len(self.fns) > 1:
+            self._queue(1)
+
+    def _post_run(self, g: Game, clock: float):
+        pass
+
+    def _update(self, g: Game, clock: float):
+        """Switch to the next song once the current one has ended."""
+        if self.thread is None:
+            return
+        if clock < self.duration:
+            if not self.thread.is_alive() and self.next_index is not None and self.next_index != self.queued_index:
+                self._queue(self.next_index)  # a song was skipped, and the mixer hasn't continued yet
+            return
+
+        # keep drawing the previous song until the next one is analyzed; the overshoot keeps the clocks in sync
+        if self.thread.is_alive():
+            if not self.warned_late:
+                logger.warning("analysis of the next song not finished at the end of the previous song; waiting")
+                self.warned_late = True
+            return
+        self.thread.join()
+        self.thread = None
+        self.warned_late = False
+        if self.next_index is None or self.next_notes is None:
+            logger.warning("none of the remaining songs could be analyzed; ending the playlist")
+            pygame.mixer.music.stop()
+            return
+
+        # the mixer has already continued with the queued song, unless that song was skipped after it was queued
+        overshoot = clock - self.duration
+        if self.next_index != self.queued_index:
+            pygame.mixer.music.load(self.fns[self.next_index])
+            pygame.mixer.music.play()
+            overshoot = 0.0
+        self.index = self.next_index
+        self.duration = self.next_duration
+        self.music_player.fn = self.fns[self.index]
+        self.sheet.switch_song(self.fns[self.index], self.next_notes)
+        g.seek(overshoot, notify=False)
+        logger.info("playing %s (%d/%d)", self.fns[self.index], self.index + 1, len(self.fns))
+
+        self._start_prefetch()
+        if self.index + 1 < len(self.fns):
+            self._queue(self.index + 1)
+
+    def _should_terminate(self, g: Game, clock: float) -> bool:
+        """Termination is left to the music player, which plays until the last song has finished."""
+        return False
@@ -9,7 +9,11 @@ from circle_dance.visualize.types import T_COLOR
 
 class Canvas(Drawable):
     def __init__(
-        self, surface: pygame.Surface, n_sheets: int, note_pool: type[NotePool], bg_color: T_COLOR = config.BLACK
+        self,
+        surface: pygame.Surface,
+        n_sheets: int,
+        note_pool: type[NotePool] | list[type[NotePool]],
+        bg_color: T_COLOR = config.BLACK,
     ):
         """The main circular sheet visualization canvas.
 
@@ -18,12 +22,15 @@ class Canvas(Drawable):
         Args:
             surface: surface to draw on
             n_sheets: no of circular sheets to display and support
-            note_pool: NotePool implementation to use for the sheets
+            note_pool: NotePool implementation to use for the sheets, or one per sheet
             bg_color: background color of the canvas
         """
         super().__init__(surface)
 
         assert n_sheets > 0, "At least one sheet must be drawn."
+        if not isinstance(note_pool, list):
+            note_pool = [note_pool] * n_sheets
+        assert len(note_pool) == n_sheets, "One NotePool implementation per sheet is required."
 
         self.bg_color = bg_color
         self.radius_outer = (
@@ -55,7 +62,7 @@ class Canvas(Drawable):
                     config.n_sheet_lines,
                     dist_between_sheet_lines,
                     config.sheet_colors[i],
-                    note_pool,
+                    note_pool[i],
                 )
             )
 
@@ -75,3 +82,21 @@ class Canvas(Drawable):
     def add_note(self, sheet_id: int, note: int, onset: float, conclusion: float, energy: float):
         "Add a note to an underlying sheet."
         self.sheets[sheet_id].note_pool.add_note(note, onset, conclusion, energy)
+
+    def update_note(
+        self,
+        sheet_id: int,
+        note_uid: int,
+        note: int,
+        onset: float,
+        conclusion: float,
+        energy: float,
+        final: bool = False,
+    ):
+        "Add or update a note of an underlying sheet by its id, see `NotePool.update_note`."
+        self.sheets[sheet_id].note_pool.update_note(note_uid, note, onset, conclusion, energy, final)
+
+    def clear_notes(self):
+        "Remove all notes from all sheets, e.g. before seeking."
+        for sheet in self.sheets:
+            sheet.note_pool.clear()
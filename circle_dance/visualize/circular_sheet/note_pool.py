@@ -44,6 +44,7 @@ class NotePool(Drawable, ABC):
         self.note_base_radius = note_base_radius  # self.radius_outer
 
         self.notes: list[Note] = []
+        self.open_notes: dict[int, Note] = {}  # notes that may still be updated, by note id; see `update_note`
 
     @abstractmethod
     def add_note(self, note: int, onset: float, conclusion: float, energy: float):
@@ -60,13 +61,52 @@ class NotePool(Drawable, ABC):
         """
         pass
 
+    def update_note(
+        self, note_uid: int, note: int, onset: float, conclusion: float, energy: float, final: bool = False
+    ) -> None:
+        """Add the note with the given id, or update the conclusion of the open note with that id.
+
+        Unlike `add_note`, this doesn't search the pool for the note to extend, but looks it up by id, e.g. the note
+        ids of the note events of `circle_dance.audio.read.NoteTracker`.
+
+        Args:
+            note_uid: id of the note, unique among the open notes
+            note: note id, aka a number between 0 and 12
+            onset: onset time of the note, in seconds
+            conclusion: conclusion time of the note, in seconds
+            energy: chroma energy of the note, a value between 0 and 1
+            final: whether the conclusion is final, i.e. the note is no longer updated and its id may be reused
+        """
+        n = self.open_notes.pop(note_uid, None) if final else self.open_notes.get(note_uid)
+        if n is not None:
+            n.extend(conclusion)
+            return
+
+        # a new note, or one whose earlier events were dropped
+        n = self._make_note(note, onset, conclusion, energy)
+        self.notes.append(n)
+        if not final:
+            self.open_notes[note_uid] = n
+
     def draw(self, t: float) -> None:
         self._remove_dead_notes(t)
         for note in self.notes:
             note.draw(t)
 
+    def clear(self):
+        "Remove all notes."
+        self.notes = []
+        self.open_notes = {}
+
+    @abstractmethod
+    def _make_note(self, note: int, onset: float, conclusion: float, energy: float) -> Note:
+        "Create the note of this note pool's type; see `add_note` for the arguments."
+        pass
+
     def _remove_dead_notes(self, t: float):
         self.notes = [n for n in self.notes if n.is_alive(t)]
+        if self.open_notes:  # incl. the ones never finalized, e.g. with closes skipped or dropped
+            self.open_notes = {uid: n for uid, n in self.open_notes.items() if n.is_alive(t)}
 
     def _get_note_radius(self, note: int):
         "Compute the appropriate radius location of the note."
@@ -78,22 +118,23 @@ class NotePool(Drawable, ABC):
 class DotNotePool(NotePool):
 
     def add_note(self, note: int, onset: float, conclusion: float, energy: float):
+        self.notes.append(self._make_note(note, onset, conclusion, energy))
+
+    def _make_note(self, note: int, onset: float, conclusion: float, energy: float) -> Note:
         # compute note location from onset and base radius
         radius = self._get_note_radius(note)
         angle = utils.get_angle_at_time(onset)  # note position of circle according to it's onset
         x = self.surface.get_width() // 2 + radius * math.cos(angle)
         y = self.surface.get_height() // 2 + radius * math.sin(angle)
 
-        self.notes.append(
-            DotNote(
-                self.surface,
-                x,
-                y,
-                self.note_size,
-                self.note_color,
-                onset,
-                config.rotation_period - 1,
-            )
+        return DotNote(
+            self.surface,
+            x,
+            y,
+            self.note_size,
+            self.note_color,
+            onset,
+            config.rotation_period - 1,
         )
 
 
@@ -119,10 +160,12 @@ class ArcNotePool(NotePool):
                 return
 
         # otherwise add a new ArcNote
-        self.notes.append(
-            ArcNote(
-                self.surface_notes, radius, 1, self.note_size, onset, conclusion, config.rotation_period - 1, self.arr
-            )
+        self.notes.append(self._make_note(note, onset, conclusion, energy))
+
+    def _make_note(self, note: int, onset: float, conclusion: float, energy: float) -> Note:
+        radius = self._get_note_radius(note)
+        return ArcNote(
+            self.surface_notes, radius, 1, self.note_size, onset, conclusion, config.rotation_period - 1, self.arr
         )
 
     def draw(self, t: float) -> None:
@@ -198,16 +241,17 @@ class SimpleArcNotePool(NotePool):
                 return
 
         # otherwise add a new ArcNote
-        self.notes.append(
-            SimpleArcNote(
-                self.surface,
-                radius,
-                self.note_size,
-                self.note_color,
-                onset,
-                conclusion,
-                config.rotation_period - 1,
-            )
+        self.notes.append(self._make_note(note, onset, conclusion, energy))
+
+    def _make_note(self, note: int, onset: float, conclusion: float, energy: float) -> Note:
+        return SimpleArcNote(
+            self.surface,
+            self._get_note_radius(note),
+            self.note_size,
+            self.note_color,
+            onset,
+            conclusion,
+            config.rotation_period - 1,
         )
 
 
@@ -226,14 +270,15 @@ class ArcNotePool_Legacy(NotePool):
                 return
 
         # otherwise add a new ArcNote
-        self.notes.append(
-            ArcNote_Legacy(
-                self.surface,
-                radius,
-                self.note_size,
-                self.note_color,
-                onset,
-                conclusion,
-                config.rotation_period - 1,
-            )
+        self.notes.append(self._make_note(note, onset, conclusion, energy))
+
+    def _make_note(self, note: int, onset: float, conclusion: float, energy: float) -> Note:
+        return ArcNote_Legacy(
+            self.surface,
+            self._get_note_radius(note),
+            self.note_size,
+            self.note_color,
+            onset,
+            conclusion,
+            config.rotation_period - 1,
         )
@@ -29,6 +29,16 @@ class Note(Drawable, ABC):
         """
         pass
 
+    def extend(self, conclusion: float) -> None:
+        """Move the conclusion of the note, e.g. while it is still sounding.
+
+        Notes without a duration stay as they are.
+
+        Args:
+            conclusion: time when the note is no longer heard; seconds
+        """
+        pass
+
 
 class DotNote(Note):
     def __init__(
@@ -123,6 +133,9 @@ class ArcNote(Note):
     def is_alive(self, t: float) -> bool:
         return t - self.conclusion < self.lifetime
 
+    def extend(self, conclusion: float) -> None:
+        self.conclusion = conclusion
+
     def draw(self, t: float) -> None:
         """Draw an arc line representing a note with duration.
 
@@ -206,6 +219,9 @@ class SimpleArcNote(Note):
     def is_alive(self, t: float) -> bool:
         return self.onset + self.lifetime >= t
 
+    def extend(self, conclusion: float) -> None:
+        self.conclusion = conclusion
+
     def draw(self, t: float) -> None:
         """Draw an arc line representing a note with duration.
 
@@ -277,6 +293,9 @@ class ArcNote_Legacy(Note):
     def is_alive(self, t: float) -> bool:
         return self.onset + self.lifetime >= t
 
+    def extend(self, conclusion: float) -> None:
+        self.conclusion = conclusion
+
     def draw(self, t: float) -> None:
         """Draw an arc line representing a note with duration.
 
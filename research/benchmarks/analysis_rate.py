@@ -0,0 +1,89 @@
+# benchmark: cost and timing of the analysis at lower sampling rates
+# reports per path and analysis rate the real-time factor, and how many notes match the ones at the native rate
+#
+# usage: python research/benchmarks/analysis_rate.py [--song file.mp3] [--seconds 120] [--rates 22050 16000]
+
+import argparse
+import os
+import tempfile
+import time
+
+import librosa
+import numpy as np
+import soundfile as sf
+from utils import load_song
+
+from circle_dance.audio import process
+from circle_dance.audio.read import callbacks, extract_notes_from_file
+
+
+def matched(notes, reference, tol_sec: float) -> float:
+    "Fraction of the notes with a note of the same id in the reference whose onset is at most `tol_sec` apart."
+    if len(notes) == 0:
+        return 1.0
+    hits = 0
+    for note_id in np.unique(notes[:, 0]):
+        onsets = reference[reference[:, 0] == note_id, 1]
+        if len(onsets) > 0:
+            distances = np.abs(notes[notes[:, 0] == note_id, 1][:, None] - onsets[None, :])
+            hits += int(np.sum(distances.min(axis=1) <= tol_sec))
+    return hits / len(notes)
+
+
+def measure(name: str, seconds: float, run, reference=None, tol_sec: float = 0.03):
+    "Run the analysis once to warm up, then report its real-time factor and the notes matching the reference."
+    run()
+    t = time.perf_counter()
+    notes = run()
+    runtime = time.perf_counter() - t
+    match = "" if reference is None else f", {100 * matched(notes, reference, tol_sec):5.1f}% matched"
+    print(f"{name:<40} rtf {runtime / seconds:6.3f}, {len(notes):5d} notes{match}")
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis at lower sampling rates.")
+    parser.add_argument("--song", type=str, default=None, help="Song file; synthesizes a dense melody if not given.")
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--rates", type=int, nargs="+", default=[22050, 16000])
+    args = parser.parse_args()
+
+    y, sr = load_song(args.song, duration=args.seconds)
+    y = y[: int(args.seconds * sr)]
+    seconds = len(y) / sr
+    thr = args.threshold
+
+    # `play`: the whole song at once, resampled on load
+    for notes in process.multi.NOTES:
+        reference = measure(f"play {notes}, {sr}Hz", seconds, lambda: process.extract_notes(y, sr, notes, thr))
+        for rate in args.rates:
+
+            def run():
+                return process.extract_notes(
+                    librosa.resample(y, orig_sr=sr, target_sr=rate, res_type="polyphase"), rate, notes, thr
+                )
+
+            measure(f"play {notes}, {rate}Hz", seconds, run, reference)
+
+    # `play --streaming` and `listen`: int16 blocks of the file, resampled block by block
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "song.wav")
+        sf.write(fn, y, sr, subtype="PCM_16")
+
+        for name, make in [
+            ("durations", lambda: callbacks.StreamingNoteDurationsCallback(threshold=thr)),
+            ("onsets", lambda: callbacks.StreamingNoteOnsetsCallback(threshold=thr)),
+        ]:
+            reference = measure(f"streaming {name}, {sr}Hz", seconds, lambda: extract_notes_from_file(make(), fn))
+            for rate in args.rates:
+                measure(
+                    f"streaming {name}, {rate}Hz",
+                    seconds,
+                    lambda: extract_notes_from_file(callbacks.ResamplingCallback(make(), rate), fn),
+                    reference,
+                )
+
+
+if __name__ == "__main__":
+    main()
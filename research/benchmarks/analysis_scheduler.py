@@ -0,0 +1,91 @@
+# benchmark: note onsets every chunk and note durations every 4 chunks, as two streams vs. one scheduled stream
+# reports the real-time factor of each setup, how many of the separately analyzed notes the scheduler reproduces,
+# and how many of the onset notes agree with the chroma of the whole song at the same onsets
+#
+# usage: python research/benchmarks/analysis_scheduler.py [song.mp3] [--seconds 60] [--durations-replenish 4]
+
+import argparse
+import time
+
+import numpy as np
+from utils import load_song, simulate_stream
+
+from circle_dance.audio import process
+from circle_dance.audio.read import callbacks
+
+
+def run(callback, y: np.ndarray, sr: int, replenish: int, carryover: int) -> tuple[np.ndarray, float]:
+    "All notes of the stream, and the seconds it took."
+    t = time.perf_counter()
+    notes = simulate_stream(callback, y, sr, replenish, carryover)
+    return np.concatenate(notes), time.perf_counter() - t
+
+
+def n_same(notes: np.ndarray, reference: np.ndarray) -> int:
+    "Number of reference notes with the same id and onset in the notes."
+    rounded = set(map(tuple, np.round(notes[:, :2], 3).tolist()))
+    return sum(note in rounded for note in map(tuple, np.round(reference[:, :2], 3).tolist()))
+
+
+def n_correct(onsets: np.ndarray, chroma: np.ndarray, sr: int, threshold: float) -> int:
+    "Number of onset notes that are also notes of the whole song's chroma at the same onset frames."
+    frames = np.unique(np.round(onsets[:, 1] * sr / 512).astype(int))
+    reference = process.chromagram_to_note_onsets(chroma, frames, sr, threshold=threshold)
+    rounded = set(map(tuple, np.round(reference[:, :2], 3).tolist()))
+    return sum(note in rounded for note in map(tuple, np.round(onsets[:, :2], 3).tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis scheduler.")
+    parser.add_argument("filename", nargs="?", help="Song to analyze; a synthetic song is used if omitted.")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--durations-replenish", type=int, default=4)
+    args = parser.parse_args()
+
+    y, sr = load_song(args.filename, duration=args.seconds)
+    y = y[: int(args.seconds * sr)]
+    seconds = len(y) / sr
+    y_int16 = (y / np.abs(y).max() * np.iinfo(np.int16).max).astype(np.int16)  # as the stream sees it
+    chroma = process.get_cqt_plan(sr).chroma(y_int16.astype(np.float32) / -np.iinfo(np.int16).min)
+
+    # two streams, one per analyzer
+    onsets, t_onsets = run(callbacks.StreamingNoteOnsetsCallback(threshold=args.threshold), y, sr, 1, 0)
+    durations, t_durations = run(
+        callbacks.StreamingNoteDurationsCallback(threshold=args.threshold), y, sr, args.durations_replenish, 0
+    )
+    print(
+        f"{'two streams':<24} rtf {(t_onsets + t_durations) / seconds:.4f} "
+        f"(onsets {t_onsets / seconds:.4f}, durations {t_durations / seconds:.4f}), "
+        f"{len(onsets)} onsets ({n_correct(onsets, chroma, sr, args.threshold)} correct), "
+        f"{len(durations)} durations"
+    )
+
+    # one stream, scheduling both analyzers, with and without sharing the CQT frames
+    for shared in [False, True]:
+        shared_cqt = callbacks.SharedStreamingCQT() if shared else None
+        scheduler = callbacks.AnalysisScheduler(
+            [
+                (callbacks.StreamingNoteOnsetsCallback(threshold=args.threshold, shared_cqt=shared_cqt), 1, 0),
+                (
+                    callbacks.StreamingNoteDurationsCallback(threshold=args.threshold, shared_cqt=shared_cqt),
+                    args.durations_replenish,
+                    0,
+                ),
+            ]
+        )
+        notes, runtime = run(scheduler, y, sr, scheduler.replenish_multiplier, 0)
+        scheduled_onsets = notes[notes[:, 0] < 12]
+        scheduled_durations = notes[notes[:, 0] >= 12]
+        scheduled_durations[:, 0] -= 12
+        name = "scheduler, shared CQT" if shared else "scheduler"
+        print(
+            f"{name:<24} rtf {runtime / seconds:.4f}, "
+            f"{len(scheduled_onsets)} onsets ({n_same(scheduled_onsets, onsets)} same, "
+            f"{n_correct(scheduled_onsets, chroma, sr, args.threshold)} correct), "
+            f"{len(scheduled_durations)} durations ({n_same(scheduled_durations, durations)} same)"
+        )
+
+
+if __name__ == "__main__":
+    main()
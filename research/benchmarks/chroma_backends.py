@@ -0,0 +1,62 @@
+# benchmark: the chroma backends per buffer size and sampling rate, and the backend "auto" picks
+# also reports how closely each backend's chroma follows the audioflux CQT's over the whole song
+#
+# usage: python research/benchmarks/chroma_backends.py [song.mp3] [--rates 44100 22050]
+
+import argparse
+import time
+
+import librosa
+import numpy as np
+from utils import load_song
+
+from circle_dance.audio import process
+from circle_dance.audio.process.chroma import BACKENDS, DEFAULT_BACKEND
+
+BUFFER_SAMPLES = [4096, 12288, 44100, 2**18]  # a stream block, a `StreamingCQT` segment, a second, a long segment
+
+
+def runtime(plan: process.ChromaPlan, y: np.ndarray, repeats: int = 5) -> float:
+    "Best time of `repeats` chromagrams of `y`, after one to warm up."
+    plan.chroma(y)
+    best = float("inf")
+    for _ in range(repeats):
+        t = time.perf_counter()
+        plan.chroma(y)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chroma backends.")
+    parser.add_argument("filename", nargs="?", help="Song to analyze; a synthetic song is used if omitted.")
+    parser.add_argument("--rates", type=int, nargs="+", default=[44100, 22050])
+    args = parser.parse_args()
+
+    y, sr = load_song(args.filename, duration=60.0)
+    backends = list(BACKENDS)
+
+    for rate in args.rates:
+        y_rate = y if rate == sr else librosa.resample(y, orig_sr=sr, target_sr=rate, res_type="polyphase")
+        print(f"{rate}Hz: runtime per buffer in ms, and the backend auto picks")
+        print(f"{'samples':>8} | " + " | ".join(f"{backend:>9}" for backend in backends) + " | auto")
+        for n_samples in BUFFER_SAMPLES:
+            runtimes = [
+                runtime(process.get_cqt_plan(rate, backend=backend), y_rate[:n_samples]) for backend in backends
+            ]
+            fastest = process.fastest_chroma_backend(rate, n_samples)
+            print(f"{n_samples:8d} | " + " | ".join(f"{1000 * t:9.2f}" for t in runtimes) + f" | {fastest}")
+
+        # agreement of the chromagrams of the whole song with the default backend's
+        reference = process.get_cqt_plan(rate, backend=DEFAULT_BACKEND).chroma(y_rate)
+        for backend in backends:
+            chroma = process.get_cqt_plan(rate, backend=backend).chroma(y_rate)
+            active = (reference.max(axis=0) > 0) & (chroma.max(axis=0) > 0)
+            same_peak = np.mean(reference[:, active].argmax(axis=0) == chroma[:, active].argmax(axis=0))
+            deviation = np.mean(np.abs(reference - chroma))
+            print(f"{backend:>9}: same top chroma in {100 * same_peak:5.1f}% of frames, deviation {deviation:.3f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmark: peak memory and time of extracting the notes of a long recording
+# loading the whole song with librosa vs. the block-based file reader with the streaming callbacks
+# also checks that both extract notes up to the end of the song
+#
+# usage: python research/benchmarks/file_reader.py [--song file.wav] [--duration 600] [--callback onsets]
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+import soundfile as sf
+from utils import load_song
+
+from circle_dance.audio.process import extract_note_durations, extract_note_onsets
+from circle_dance.audio.read import AudioFileReader, callbacks, extract_notes_from_file
+
+
+def measure(f) -> tuple[float, float, np.ndarray]:
+    "Returns the peak traced memory in MB, the runtime in seconds, and the notes."
+    tracemalloc.start()
+    t = time.perf_counter()
+    notes = f()
+    runtime = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, runtime, notes
+
+
+def n_found(notes: np.ndarray, reference: np.ndarray, tolerance_sec: float) -> int:
+    "Number of reference notes with a note of the same id and about the same onset in the notes."
+    return sum(
+        bool(np.any((notes[:, 0] == note) & (np.abs(notes[:, 1] - onset) <= tolerance_sec)))
+        for note, onset in reference[:, :2]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark whole-song loading vs. the block-based file reader.")
+    parser.add_argument("--song", type=str, default=None, help="Song file; writes a synthetic WAV if not given.")
+    parser.add_argument("--duration", type=float, default=600.0, help="Duration of the synthetic song in seconds.")
+    parser.add_argument("--callback", choices=["durations", "onsets"], default="onsets")
+    parser.add_argument("--threshold", type=float, default=0.75)
+    args = parser.parse_args()
+
+    fn = args.song
+    if fn is None:
+        y, sr = load_song(None, duration=args.duration)
+        fn = os.path.join(tempfile.mkdtemp(), "song.wav")
+        sf.write(fn, y / np.abs(y).max(), sr, subtype="PCM_16")
+        del y
+
+    with AudioFileReader(fn) as reader:
+        print(f"{fn}: {reader.duration:.0f}s at {reader.sr}Hz, {reader.channels} channel(s), backend {reader.backend}")
+        duration = reader.duration
+
+    def whole_song():
+        y, sr = librosa.load(fn, sr=None)
+        if args.callback == "onsets":
+            return extract_note_onsets(y, sr, threshold=args.threshold)
+        return extract_note_durations(y, sr, thr=args.threshold)
+
+    def block_based():
+        callback = {
+            "onsets": callbacks.StreamingNoteOnsetsCallback,
+            "durations": callbacks.StreamingNoteDurationsCallback,
+        }[args.callback](threshold=args.threshold)
+        return extract_notes_from_file(callback, fn)
+
+    results = {}
+    for name, f in (("whole song", whole_song), ("block based", block_based)):
+        peak, runtime, results[name] = measure(f)
+        last_sec = np.nanmax(results[name][:, 1:3]) if len(results[name]) > 0 else 0.0
+        print(
+            f"{name:>12}: peak memory {peak:7.1f}MB, runtime {runtime:6.1f}s, {len(results[name])} notes, "
+            f"last note until {last_sec:.3f}s"
+        )
+
+    # the block-based extraction must also find the notes at the very end of the song
+    whole, block = results["whole song"], results["block based"]
+    end = whole[whole[:, 1] >= duration - 1.0]
+    found = n_found(block, end, tolerance_sec=0.05)
+    print(
+        f"{'end of song':>12}: {found}/{len(end)} notes of the last second found"
+        + ("" if found == len(end) else ", MISSING NOTES")
+    )
+
+
+if __name__ == "__main__":
+    main()
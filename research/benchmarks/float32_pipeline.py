@@ -0,0 +1,81 @@
+# benchmark: memory and throughput of the analysis paths of `play` and `listen`
+# reports per path the real-time factor and the peak of the memory allocated during the analysis
+#
+# usage: python research/benchmarks/float32_pipeline.py [--song file.mp3] [--seconds 120]
+
+import argparse
+import functools
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+from utils import load_song
+
+from circle_dance.audio import process
+from circle_dance.audio.read import callbacks, extract_notes_from_file
+
+
+def measure(name: str, seconds: float, run) -> None:
+    "Run the analysis once to warm up, then report its real-time factor and its peak memory."
+    run()
+    tracemalloc.start()
+    t = time.perf_counter()
+    notes = run()
+    runtime = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<42} rtf {runtime / seconds:6.3f}, peak {peak / 2**20:7.1f}MB, {len(notes)} notes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory and throughput of the analysis paths.")
+    parser.add_argument("--song", type=str, default=None, help="Song file; synthesizes a dense melody if not given.")
+    parser.add_argument("--seconds", type=float, default=120.0)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    args = parser.parse_args()
+
+    y, sr = load_song(args.song, duration=args.seconds)
+    y = y[: int(args.seconds * sr)]
+    seconds = len(y) / sr
+    thr = args.threshold
+
+    # `play`: the whole song at once, as loaded by librosa (float32), and the same samples as float64
+    y64 = y.astype(np.float64)
+    measure("play durations, float32", seconds, lambda: process.extract_note_durations(y, sr, thr=thr))
+    measure("play durations, float64", seconds, lambda: process.extract_note_durations(y64, sr, thr=thr))
+    measure("play onsets, float32", seconds, lambda: process.extract_note_onsets(y, sr, threshold=thr))
+    measure("play onsets, float64", seconds, lambda: process.extract_note_onsets(y64, sr, threshold=thr))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fn = os.path.join(tmp, "song.wav")
+        sf.write(fn, y, sr, subtype="PCM_16")
+
+        # `play --streaming`: int16 blocks of the file through the streaming callbacks
+        for name, make in [
+            ("durations", callbacks.StreamingNoteDurationsCallback),
+            ("onsets", callbacks.StreamingNoteOnsetsCallback),
+        ]:
+            measure(
+                f"play --streaming {name}",
+                seconds,
+                lambda: extract_notes_from_file(make(threshold=thr), fn),
+            )
+
+        # `listen`: buffers of one new chunk and 20 chunks of carryover, like the live stream
+        live = dict(buffer_replenish_multiplier=1, buffer_carryover_multiplier=20)
+        for name, make in [
+            (
+                "listen durations, per buffer",
+                lambda: functools.partial(callbacks.extract_note_durations_callback, threshold=thr),
+            ),
+            ("listen durations, streaming", lambda: callbacks.StreamingNoteDurationsCallback(threshold=thr)),
+            ("listen onsets, streaming", lambda: callbacks.StreamingNoteOnsetsCallback(threshold=thr)),
+        ]:
+            measure(name, seconds, lambda: extract_notes_from_file(make(), fn, **live))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmark: post-processing of `extract_note_durations` on a full song
+# compares the former label-loop implementation with the run-length one
+#
+# usage: python research/benchmarks/note_durations.py [song.mp3] [--threshold 0.75]
+
+import argparse
+import time
+
+import librosa
+import numpy as np
+import scipy
+from utils import load_song
+
+from circle_dance.audio.process import chromagram_to_note_durations, get_cqt_plan
+
+
+def chromagram_to_note_durations_legacy(chromagram, sr, thr=0.9, slide_length=512):
+    "The former implementation, pairing the label starts and ends in Python and masking each label separately."
+    chrom_bin_time_delta = slide_length / sr
+    structure_element = np.asarray([[False, False, False], [True, True, True], [False, False, False]])
+    n_chromas, n_chroma_bins = chromagram.shape
+    chroms_bin_start_times = librosa.frames_to_time(range(n_chroma_bins), sr=sr, hop_length=slide_length)
+
+    chroma_thr = chromagram > thr
+    start_and_end = chroma_thr ^ scipy.ndimage.binary_erosion(chroma_thr, structure=structure_element)
+    labels, label_count = scipy.ndimage.label(chroma_thr, structure=structure_element)
+
+    if label_count == 0:
+        return np.empty((0, 4))
+
+    labels_start_end = labels[start_and_end]
+    times_start_end = np.tile(chroms_bin_start_times, (n_chromas, 1))[start_and_end]
+
+    i = 0
+    durations = []
+    while i < len(labels_start_end):
+        if i + 1 < len(labels_start_end) and labels_start_end[i] == labels_start_end[i + 1]:
+            durations.append((times_start_end[i], times_start_end[i + 1]))
+            i += 2
+        else:
+            durations.append((times_start_end[i], times_start_end[i]))
+            i += 1
+    durations_arr = np.asarray(durations)
+    durations_arr[:, 1] += chrom_bin_time_delta
+
+    note_ids = []
+    chroma_energies = []
+    for lid in range(label_count):
+        lmask = labels == (lid + 1)
+        note_ids.append(np.where(lmask)[0][0])
+        chroma_energies.append(chromagram[lmask].mean())
+
+    return np.hstack([np.asarray(note_ids).reshape(-1, 1), durations_arr, np.asarray(chroma_energies).reshape(-1, 1)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the note duration post-processing on a full song.")
+    parser.add_argument("filename", nargs="?", help="Song to analyze; a synthetic song is used if omitted.")
+    parser.add_argument("-t", "--threshold", type=float, default=0.75)
+    args = parser.parse_args()
+
+    y, sr = load_song(args.filename)
+    chromagram = get_cqt_plan(sr).chroma(y)
+    print(f"song: {len(y) / sr:.1f}s, chromagram: {chromagram.shape}")
+
+    t0 = time.perf_counter()
+    notes_legacy = chromagram_to_note_durations_legacy(chromagram, sr, thr=args.threshold)
+    t1 = time.perf_counter()
+    notes = chromagram_to_note_durations(chromagram, sr, thr=args.threshold)
+    t2 = time.perf_counter()
+
+    assert notes.shape == notes_legacy.shape, "implementations disagree on the number of notes"
+    assert np.allclose(notes, notes_legacy, atol=1e-6), "implementations disagree on the notes"
+
+    print(f"notes: {len(notes)}")
+    print(f"legacy:     {t1 - t0:.4f}s")
+    print(f"run-length: {t2 - t1:.4f}s ({(t1 - t0) / (t2 - t1):.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmark: note durations of a live stream as note rows per buffer vs. note events tracked across buffers
+# reports the rows queued per second of audio, and the time the note pool spends adding them, by search vs. by id
+#
+# usage: python research/benchmarks/note_events.py [song.mp3] [--seconds 60] [--min-extend 0 0.05 0.1]
+
+import argparse
+import time
+
+import pygame
+from utils import load_song, simulate_stream
+
+from circle_dance.audio.read import NoteTracker, callbacks
+from circle_dance.audio.read.note_events import NOTE_CLOSE
+from circle_dance.visualize import circular_sheet
+
+CHUNK = 1024
+
+
+def pool_runtime(batches: list, sr: int, events: bool) -> float:
+    "Seconds the note pool spends on the batches, one per buffer with the dead notes removed in between like a frame."
+    pool = circular_sheet.SimpleArcNotePool(pygame.Surface((800, 800)), 300, 10, (255, 255, 255))
+    runtime = 0.0
+    for i, batch in enumerate(batches):
+        t = time.perf_counter()
+        if events:
+            for note, onset, conclusion, energy, note_uid, event in batch.tolist():
+                pool.update_note(int(note_uid), int(note), onset, conclusion, energy, final=event == NOTE_CLOSE)
+        else:
+            for note, onset, conclusion, energy in batch.tolist():
+                pool.add_note(int(note), onset, conclusion, energy)
+        runtime += time.perf_counter() - t
+        pool._remove_dead_notes((i + 1) * CHUNK / sr)
+    return runtime
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the note events of the streaming note durations.")
+    parser.add_argument("filename", nargs="?", help="Song to analyze; a synthetic song is used if omitted.")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--min-extend", type=float, nargs="+", default=[0.0, 0.05, 0.1])
+    args = parser.parse_args()
+
+    y, sr = load_song(args.filename, duration=args.seconds)
+    y = y[: int(args.seconds * sr)]
+    seconds = len(y) / sr
+
+    # the live stream's buffers: one new chunk, 20 chunks carryover
+    rows = simulate_stream(callbacks.StreamingNoteDurationsCallback(threshold=args.threshold), y, sr, 1, 20)
+    runtime = pool_runtime(rows, sr, events=False)
+    n_rows = sum(len(batch) for batch in rows)
+    print(f"{'note rows':<32} {n_rows / seconds:7.1f} rows/s, pool {1000 * runtime / seconds:6.2f}ms/s")
+
+    for skip_unchanged_closes in [False, True]:
+        for min_extend_sec in args.min_extend:
+            tracker = NoteTracker(min_extend_sec=min_extend_sec, skip_unchanged_closes=skip_unchanged_closes)
+            events = [tracker.update(batch) for batch in rows]
+            runtime = pool_runtime(events, sr, events=True)
+            n_events = sum(len(batch) for batch in events)
+            name = f"events, extend {min_extend_sec}s" + (", skip" if skip_unchanged_closes else "")
+            print(
+                f"{name:<32} {n_events / seconds:7.1f} rows/s, pool {1000 * runtime / seconds:6.2f}ms/s, "
+                f"{100 * n_events / n_rows:5.1f}% of the rows"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# microbenchmark: note hand-off from the stream thread to the game loop, per-note `queue.Queue` vs. `NoteBatchQueue`
+# a producer thread puts one (N, 4) batch per buffer, the consumer drains once per frame at 60fps
+# reports the time spent in put and drain per second of audio
+#
+# usage: python research/benchmarks/note_handoff.py [--notes-per-buffer 1 4 16] [--seconds 5]
+
+import argparse
+import queue
+import threading
+import time
+from queue import Empty, Full
+
+import numpy as np
+
+from circle_dance.audio.read import NoteBatchQueue
+
+BUFFER_SEC = 1024 / 44100
+FRAME_SEC = 1 / 60
+
+
+def put_per_note(q: queue.Queue, items: np.ndarray) -> None:
+    "The former hand-off in `stream_reader`."
+    for item in items:
+        if q.full():
+            try:
+                q.get_nowait()
+            except Empty:
+                pass
+        try:
+            q.put_nowait(item)
+        except Full:
+            pass
+
+
+def drain_per_note(q: queue.Queue) -> int:
+    "The former drain in `CircularSheetStream._update`."
+    n = 0
+    while not q.empty():
+        try:
+            q.get_nowait()
+            n += 1
+        except Empty:
+            pass
+    return n
+
+
+def run(batched: bool, notes_per_buffer: int, seconds: float) -> tuple[float, float, int]:
+    "Returns the seconds spent in put and in drain, and the number of received notes."
+    q: queue.Queue | NoteBatchQueue = NoteBatchQueue() if batched else queue.Queue()
+    batch = np.random.default_rng(0).random((notes_per_buffer, 4))
+    n_buffers = int(seconds / BUFFER_SEC)
+    t_put = 0.0
+
+    def produce():
+        nonlocal t_put
+        for i in range(n_buffers):
+            t = time.perf_counter()
+            q.put(batch) if batched else put_per_note(q, batch)
+            t_put += time.perf_counter() - t
+            time.sleep(BUFFER_SEC)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    t_drain = 0.0
+    n_received = 0
+    while producer.is_alive() or not q.empty():
+        t = time.perf_counter()
+        n_received += len(q.drain()) if batched else drain_per_note(q)
+        t_drain += time.perf_counter() - t
+        time.sleep(FRAME_SEC)
+    producer.join()
+    return t_put, t_drain, n_received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the note hand-off between stream thread and game loop.")
+    parser.add_argument("--notes-per-buffer", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for n in args.notes_per_buffer:
+        for batched in (False, True):
+            t_put, t_drain, n_received = run(batched, n, args.seconds)
+            print(
+                f"{n:3d} notes/buffer, {'batched ' if batched else 'per note'}: "
+                f"put {t_put / args.seconds * 1000:6.2f}ms/s, drain {t_drain / args.seconds * 1000:6.2f}ms/s, "
+                f"{n_received} notes"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmark: whole-song analysis in one process vs. segmented in a process pool
+# reports the runtime per number of processes, and whether the notes match the single-process result
+#
+# usage: python research/benchmarks/parallel_analysis.py [--song file.mp3] [--seconds 600] [--jobs 1 2 4 8]
+
+import argparse
+import time
+
+import numpy as np
+from utils import load_song
+
+from circle_dance.audio import process
+
+
+def compare(reference: np.ndarray, notes: np.ndarray, hop_sec: float) -> str:
+    "Describe how the notes deviate from the reference."
+    if reference.shape != notes.shape:
+        return f"{len(notes)} notes instead of {len(reference)}"
+    if np.any(reference[:, 0] != notes[:, 0]):
+        return "different note ids"
+    onset_diff = np.abs(reference[:, 1] - notes[:, 1]).max(initial=0)
+    return f"max onset difference {onset_diff / hop_sec:.1f} hops"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the segmented analysis in a process pool.")
+    parser.add_argument("--song", type=str, default=None, help="Song file; synthesizes a dense melody if not given.")
+    parser.add_argument("--seconds", type=float, default=600.0)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--segment-sec", type=float, default=30.0)
+    args = parser.parse_args()
+
+    y, sr = load_song(args.song, duration=args.seconds)
+    hop_sec = 512 / sr
+
+    for name, extract, extract_parallel in [
+        ("durations", process.extract_note_durations, process.extract_note_durations_parallel),
+        ("onsets", process.extract_note_onsets, process.extract_note_onsets_parallel),
+    ]:
+        t = time.perf_counter()
+        reference = extract(y, sr)
+        print(f"{name:>9}, single process: {time.perf_counter() - t:6.2f}s, {len(reference)} notes")
+
+        for n_jobs in args.jobs:
+            t = time.perf_counter()
+            notes = extract_parallel(y, sr, n_jobs=n_jobs, segment_sec=args.segment_sec)
+            print(
+                f"{name:>9}, {n_jobs:2d} processes: {time.perf_counter() - t:6.2f}s, "
+                f"{compare(reference, notes, hop_sec)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
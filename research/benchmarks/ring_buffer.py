@@ -0,0 +1,76 @@
+# microbenchmark: stream reader buffer handling, `np.append` + slicing vs. the preallocated ring buffer
+# reports the allocations and copied samples per second of audio, as well as the time spent
+#
+# usage: python research/benchmarks/ring_buffer.py [--replenish 1] [--carryover 20]
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from circle_dance.audio.read import RingBuffer
+
+CHUNK = 1024
+RATE = 44100
+
+
+def append_buffer(chunks, replenish: int, carryover: int) -> tuple[int, int]:
+    "The former buffer handling; returns the number of allocations and copied samples."
+    n_allocations = n_copied = 0
+    buffer = np.array([], dtype=np.int16)
+    for i in range(0, len(chunks), replenish):
+        for data in chunks[i : i + replenish]:
+            buffer = np.append(buffer, np.frombuffer(data, dtype=np.int16))
+            n_allocations += 1
+            n_copied += len(buffer)
+        buffer = buffer[-CHUNK * carryover :]
+    return n_allocations, n_copied
+
+
+def ring_buffer(chunks, replenish: int, carryover: int) -> tuple[int, int]:
+    "The ring buffer handling; returns the number of allocations and copied samples."
+    n_copied = 0
+    buffer = RingBuffer(CHUNK * (replenish + carryover))
+    for i in range(0, len(chunks), replenish):
+        for data in chunks[i : i + replenish]:
+            buffer.write(np.frombuffer(data, dtype=np.int16))
+            n_copied += 2 * CHUNK  # mirrored write
+        buffer.view(min(len(buffer), CHUNK * (replenish + carryover)))
+    return 0, n_copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stream reader's buffer handling.")
+    parser.add_argument("--replenish", type=int, default=1)
+    parser.add_argument("--carryover", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_chunks = int(args.seconds * RATE / CHUNK)
+    chunks = [rng.integers(-(2**15), 2**15, CHUNK, dtype=np.int16).tobytes() for _ in range(n_chunks)]
+    seconds = n_chunks * CHUNK / RATE
+
+    print("buffer       | allocations/s | copied samples/s | peak traced memory | time per second of audio")
+    for name, handler in [("np.append", append_buffer), ("ring buffer", ring_buffer)]:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        n_allocations, n_copied = handler(chunks, args.replenish, args.carryover)
+        t1 = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # time again without tracing overhead
+        t0 = time.perf_counter()
+        handler(chunks, args.replenish, args.carryover)
+        t1 = time.perf_counter()
+
+        print(
+            f"{name:12s} | {n_allocations / seconds:13.0f} | {n_copied / seconds:16.0f} | {peak / 1024:15.0f}KiB |"
+            f" {(t1 - t0) / seconds * 1e6:20.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmark: chromagram of the live stream buffers, recomputed per buffer vs. computed incrementally
+#
+# usage: python research/benchmarks/streaming_chroma.py [song.mp3]
+
+import argparse
+import time
+
+import numpy as np
+from utils import load_song
+
+from circle_dance.audio.process import StreamingCQT, fold_chroma, get_cqt_plan
+
+CHUNK = 1024
+CARRYOVER = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the incremental chromagram on simulated stream buffers.")
+    parser.add_argument("filename", nargs="?", help="Song to stream; a synthetic song is used if omitted.")
+    args = parser.parse_args()
+
+    y, sr = load_song(args.filename, duration=30.0)
+    plan = get_cqt_plan(sr)
+
+    print("replenish | per buffer: full CQT | incremental | speed-up | max chroma deviation")
+    for replenish in [1, 2, 5]:
+        buffer_samples = CHUNK * (replenish + CARRYOVER)
+        streaming = StreamingCQT(sr, buffer_samples // plan.slide_length + 1)
+
+        t_full = t_incremental = 0.0
+        deviation = 0.0
+        n_buffers = 0
+        for end in range(CHUNK * replenish, len(y), CHUNK * replenish):
+            t0 = time.perf_counter()
+            streaming.update(y[end - CHUNK * replenish : end])
+            chroma_incremental = streaming.chroma()
+            t1 = time.perf_counter()
+            chroma_full = fold_chroma(plan.cqt(y[max(0, end - buffer_samples) : end]))
+            t2 = time.perf_counter()
+
+            if end >= buffer_samples:  # compare the new frames, once the buffer is full
+                n_new = CHUNK * replenish // plan.slide_length
+                deviation = max(
+                    deviation, np.abs(chroma_full[:, -n_new:] - chroma_incremental[:, -n_new:]).max(initial=0)
+                )
+                t_incremental += t1 - t0
+                t_full += t2 - t1
+                n_buffers += 1
+
+        print(
+            f"{replenish:9d} | {t_full / n_buffers * 1000:17.2f}ms | {t_incremental / n_buffers * 1000:9.2f}ms |"
+            f" {t_full / t_incremental:7.1f}x | {deviation:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
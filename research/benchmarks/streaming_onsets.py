@@ -0,0 +1,62 @@
+# benchmark: live note onsets, detected per buffer vs. detected incrementally
+# reports the CPU time per second of audio and how often the same onset is reported more than once
+#
+# usage: python research/benchmarks/streaming_onsets.py [song.mp3] [--threshold 0.75]
+
+import argparse
+import time
+
+from utils import load_song, simulate_stream
+
+from circle_dance.audio.read import callbacks
+
+
+def count_repeated_onsets(notes, sr: int, hop_length: int = 512) -> int:
+    "Count the reported onsets that lie within one frame of an onset of the same note reported by an earlier buffer."
+    seen: dict[int, list[float]] = {}
+    repeated = 0
+    for buffer_notes in notes:
+        new: dict[int, list[float]] = {}
+        for note, onset, _, _ in buffer_notes:
+            if any(abs(onset - t) <= hop_length / sr for t in seen.get(int(note), [])):
+                repeated += 1
+            new.setdefault(int(note), []).append(onset)
+        for note, onsets in new.items():
+            seen.setdefault(note, []).extend(onsets)
+    return repeated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the incremental onset detection on a simulated stream.")
+    parser.add_argument("filename", nargs="?", help="Song to stream; a synthetic song is used if omitted.")
+    parser.add_argument("-t", "--threshold", type=float, default=0.75)
+    args = parser.parse_args()
+
+    y, sr = load_song(args.filename, duration=30.0)
+    duration = len(y) / sr
+
+    def per_buffer(*cb_args):
+        return callbacks.extract_node_onsets_callback(*cb_args, threshold=args.threshold)
+
+    # warm up librosa's lazily compiled functions
+    simulate_stream(per_buffer, y[: sr * 2], sr, 5, 20)
+    simulate_stream(callbacks.StreamingNoteOnsetsCallback(threshold=args.threshold), y[: sr * 2], sr, 5, 20)
+
+    print("callback                | replenish | CPU per sec of audio | notes | repeated notes")
+    for name, callback, replenish in [
+        ("per buffer", per_buffer, 5),
+        ("incremental", callbacks.StreamingNoteOnsetsCallback(threshold=args.threshold), 5),
+        ("incremental", callbacks.StreamingNoteOnsetsCallback(threshold=args.threshold), 1),
+    ]:
+        t0 = time.process_time()
+        notes = simulate_stream(callback, y, sr, replenish, 20)
+        cpu = time.process_time() - t0
+        n_notes = sum(len(n) for n in notes)
+        print(
+            f"{name:23s} | {replenish:9d} | {cpu / duration * 1000:18.1f}ms | {n_notes:5d} |"
+            f" {count_repeated_onsets(notes, sr):14d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# shared benchmark utilities
+# note: the benchmarks are run as scripts, hence import this module as `utils`
+
+import librosa
+import numpy as np
+
+
+def load_song(fn: str | None, duration: float = 240.0):
+    "Load a song, or synthesize a dense one with a random melody over white noise if no file is given."
+    if fn is not None:
+        return librosa.load(fn, sr=None)
+    sr = 44100
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sr * duration)) / sr
+    freqs = librosa.midi_to_hz(rng.integers(36, 96, size=int(duration * 8)))  # a new note every 1/8 sec
+    y = np.sin(2 * np.pi * np.repeat(freqs, len(t) // len(freqs) + 1)[: len(t)] * t)
+    y += 0.3 * rng.standard_normal(len(t))
+    return y.astype(np.float32), sr
+
+
+def simulate_stream(callback, y, sr: int, replenish: int, carryover: int, chunk: int = 1024) -> list:
+    "Feed a signal through a stream callback buffer by buffer, like `stream_reader` does, and collect its results."
+    y = (y / np.abs(y).max() * np.iinfo(np.int16).max).astype(np.int16)
+    buffer = np.array([], dtype=np.int16)
+    stream_clock = 0.0
+    results = []
+    for start in range(0, len(y) - chunk * replenish + 1, chunk * replenish):
+        carryover_samples = len(buffer)
+        buffer = np.append(buffer, y[start : start + chunk * replenish])
+        results.append(callback(buffer, sr, stream_clock, carryover_samples, carryover_samples / sr))
+        stream_clock += len(buffer) / sr - carryover_samples / sr
+        buffer = buffer[-chunk * carryover :]
+    return results
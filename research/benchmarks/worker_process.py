@@ -0,0 +1,126 @@
+# benchmark: render loop responsiveness while the stream is analyzed in a thread vs. in a worker process
+# a real-time paced feeder stands in for the input device, a pure Python loop for the pygame render loop
+# reports the render loop's frame times and the analysis lag
+#
+# usage: python research/benchmarks/worker_process.py [--song file.mp3] [--seconds 10] [--callback durations]
+
+import argparse
+import multiprocessing
+import queue
+import threading
+import time
+
+import numpy as np
+from utils import load_song
+
+from circle_dance.audio.read import SharedRingBuffer, StreamStats, callbacks
+from circle_dance.audio.read.stream import CHUNK, RATE, analysis_loop
+from circle_dance.audio.read.worker import analysis_worker
+
+FRAME_SEC = 1 / 60
+
+
+def feed(y: np.ndarray, ring, close_request_event) -> None:
+    "Write the signal into the ring chunk by chunk, in real time, like the capture callback does."
+    t0 = time.perf_counter()
+    for i, start in enumerate(range(0, len(y) - CHUNK + 1, CHUNK)):
+        if close_request_event.is_set():
+            return
+        wait = t0 + (i + 1) * CHUNK / RATE - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        ring.write(y[start : start + CHUNK])
+
+
+def render(seconds: float, poll=lambda: None) -> np.ndarray:
+    "Busy pure Python frames at 60fps, collecting the notes each frame; returns the frame times."
+    frame_times = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        t = time.perf_counter()
+        poll()
+        sum(i * i for i in range(20000))  # stand-in for drawing, holds the GIL
+        frame_times.append(time.perf_counter() - t)
+        time.sleep(max(0.0, FRAME_SEC - frame_times[-1]))
+    return np.array(frame_times)
+
+
+def run(mode: str, make_callback, y: np.ndarray, seconds: float) -> tuple[np.ndarray, StreamStats]:
+    stats = StreamStats()
+    if mode == "none":
+        return render(seconds), stats
+
+    ring = SharedRingBuffer(RATE * 5)
+    if mode == "thread":
+        close_request_event = threading.Event()
+        notes: queue.Queue = queue.Queue()
+        poll = lambda: [notes.get_nowait() for _ in range(notes.qsize())]  # noqa: E731
+        worker = threading.Thread(
+            target=analysis_loop,
+            args=(
+                make_callback(),
+                notes.put,
+                close_request_event,
+                lambda: ring.read(CHUNK, timeout=0.1),
+                lambda: ring.n_available,
+                ring.skip,
+                1,
+                20,
+                stats,
+            ),
+        )
+    else:
+        close_request_event = multiprocessing.Event()
+        notes_conn, worker_conn = multiprocessing.Pipe(duplex=False)
+        poll = lambda: [notes_conn.recv() for _ in iter(notes_conn.poll, False)]  # noqa: E731
+        ready_event = multiprocessing.Event()
+        worker = multiprocessing.Process(
+            target=analysis_worker,
+            args=(make_callback(), ring, worker_conn, close_request_event, ready_event, 1, 20),
+        )
+    worker.start()
+    if mode == "process":
+        ready_event.wait()
+    feeder = threading.Thread(target=feed, args=(y, ring, close_request_event))
+    feeder.start()
+
+    frame_times = render(seconds, poll)
+    stats.lag_sec = ring.n_available / RATE
+
+    close_request_event.set()
+    feeder.join()
+    while worker.is_alive():
+        poll()
+        worker.join(timeout=0.01)
+    ring.close()
+    ring.unlink()
+    return frame_times, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the render loop while analyzing in a thread or process.")
+    parser.add_argument("--song", type=str, default=None, help="Song file; synthesizes a dense melody if not given.")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--callback", choices=["durations", "onsets", "onsets-per-buffer"], default="durations")
+    args = parser.parse_args()
+
+    y, sr = load_song(args.song, duration=args.seconds + 5)
+    assert sr == RATE, f"the stream runs at {RATE}Hz"
+    y = (y / np.abs(y).max() * np.iinfo(np.int16).max).astype(np.int16)
+    make_callback = {
+        "durations": callbacks.StreamingNoteDurationsCallback,
+        "onsets": callbacks.StreamingNoteOnsetsCallback,
+        "onsets-per-buffer": lambda: callbacks.extract_node_onsets_callback,  # heavy, analyzes the whole buffer
+    }[args.callback]
+
+    for mode in ("none", "thread", "process"):
+        frame_times, stats = run(mode, make_callback, y, args.seconds)
+        print(
+            f"{mode:>8}: {len(frame_times) / args.seconds:5.1f} fps, "
+            f"frame time mean {frame_times.mean() * 1000:5.2f}ms, p99 {np.percentile(frame_times, 99) * 1000:5.2f}ms, "
+            f"lag at end {stats.lag_sec * 1000:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()